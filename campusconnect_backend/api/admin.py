@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     User, StudentProfile, TeacherProfile, Module, Enrollment, 
     CourseSession, CourseResource, Grade, Announcement, 
-    ChatMessage, Notification
+    ChatMessage, Conversation, ChannelMessage, Notification, NotificationPreference, Task
 )
 
 
@@ -177,7 +177,7 @@ class GradeAdmin(admin.ModelAdmin):
     """
     Administration pour les notes
     """
-    list_display = ['student', 'module', 'grade_type', 'grade', 'max_grade', 'graded_by', 'graded_date']
+    list_display = ['student', 'module', 'grade_type', 'grade', 'max_grade', 'score_percentage', 'graded_by', 'graded_date']
     list_filter = ['grade_type', 'graded_date', 'module', 'graded_by']
     search_fields = [
         'student__username', 'student__email', 'student__first_name', 'student__last_name',
@@ -212,7 +212,7 @@ class AnnouncementAdmin(admin.ModelAdmin):
         'module__code', 'module__name'
     ]
     raw_id_fields = ['author', 'module']
-    readonly_fields = ['published_date', 'created_at', 'updated_at']
+    readonly_fields = ['published_date', 'expired_at', 'created_at', 'updated_at']
     date_hierarchy = 'published_date'
     
     fieldsets = (
@@ -223,7 +223,7 @@ class AnnouncementAdmin(admin.ModelAdmin):
             'fields': ('module', 'target_audience', 'priority')
         }),
         ('Affichage', {
-            'fields': ('is_pinned', 'is_active', 'expiry_date')
+            'fields': ('is_pinned', 'is_active', 'publish_at', 'expiry_date', 'expired_at')
         }),
         ('Dates', {
             'fields': ('published_date', 'created_at', 'updated_at')
@@ -264,18 +264,48 @@ class ChatMessageAdmin(admin.ModelAdmin):
     message_preview.short_description = 'Message'
 
 
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    """
+    Administration pour les conversations (compteurs maintenus automatiquement)
+    """
+    list_display = ['user_low', 'user_high', 'last_activity', 'unread_low', 'unread_high']
+    search_fields = ['user_low__username', 'user_high__username']
+    raw_id_fields = ['user_low', 'user_high', 'last_message']
+    readonly_fields = ['last_message', 'last_activity', 'unread_low', 'unread_high', 'created_at']
+    date_hierarchy = 'last_activity'
+
+
+@admin.register(ChannelMessage)
+class ChannelMessageAdmin(admin.ModelAdmin):
+    """
+    Administration pour les messages des salons de module (modération)
+    """
+    list_display = ['channel', 'seq', 'sender', 'message_preview', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['channel__module__code', 'sender__username', 'message']
+    raw_id_fields = ['channel', 'sender']
+    readonly_fields = ['channel', 'seq', 'sender', 'created_at']
+    date_hierarchy = 'created_at'
+    
+    def message_preview(self, obj):
+        """Aperçu du message"""
+        return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
+    message_preview.short_description = 'Message'
+
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     """
     Administration pour les notifications
     """
-    list_display = ['recipient', 'notification_type', 'title', 'is_read', 'created_at']
+    list_display = ['recipient', 'notification_type', 'title', 'count', 'is_read', 'created_at']
     list_filter = ['notification_type', 'is_read', 'created_at', 'recipient']
     search_fields = [
         'recipient__username', 'recipient__email', 'title', 'content'
     ]
-    raw_id_fields = ['recipient', 'related_module', 'related_grade', 'related_announcement']
-    readonly_fields = ['created_at', 'read_at']
+    raw_id_fields = ['recipient', 'related_module', 'related_grade', 'related_announcement', 'related_session', 'related_user']
+    readonly_fields = ['created_at', 'read_at', 'count']
     date_hierarchy = 'created_at'
     
     fieldsets = (
@@ -283,12 +313,58 @@ class NotificationAdmin(admin.ModelAdmin):
             'fields': ('recipient', 'notification_type', 'title', 'content', 'link')
         }),
         ('Relations', {
-            'fields': ('related_module', 'related_grade', 'related_announcement')
+            'fields': ('related_module', 'related_grade', 'related_announcement', 'related_session', 'related_user')
         }),
         ('Statut', {
-            'fields': ('is_read', 'read_at')
+            'fields': ('is_read', 'read_at', 'count')
         }),
         ('Dates', {
             'fields': ('created_at',)
         }),
     )
+
+
+@admin.register(NotificationPreference)
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    """
+    Administration pour les préférences de notification
+    """
+    list_display = ['user', 'muted_type_list', 'muted_module_ids', 'updated_at']
+    search_fields = ['user__username', 'user__email']
+    raw_id_fields = ['user']
+    readonly_fields = ['muted_types', 'muted_modules', 'updated_at']
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """
+    Administration pour les tâches d'arrière-plan (suivi et relance des échecs)
+    """
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at', 'created_at']
+    list_filter = ['status', 'name', 'created_at']
+    search_fields = ['name', 'last_error']
+    readonly_fields = ['locked_at', 'locked_by', 'last_error', 'finished_at', 'created_at', 'updated_at']
+    date_hierarchy = 'created_at'
+    actions = ['retry_tasks']
+    
+    fieldsets = (
+        ('Tâche', {
+            'fields': ('name', 'args', 'kwargs')
+        }),
+        ('Exécution', {
+            'fields': ('status', 'attempts', 'max_attempts', 'run_at', 'locked_at', 'locked_by', 'finished_at')
+        }),
+        ('Erreur', {
+            'fields': ('last_error',)
+        }),
+        ('Dates', {
+            'fields': ('created_at', 'updated_at')
+        }),
+    )
+    
+    @admin.action(description='Relancer les tâches en échec sélectionnées')
+    def retry_tasks(self, request, queryset):
+        from .tasks import retry_failed_tasks
+        
+        retried = retry_failed_tasks(queryset)
+        self.message_user(request, f'{retried} tâche(s) relancée(s).')
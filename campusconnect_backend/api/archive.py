@@ -0,0 +1,196 @@
+"""
+Archivage à froid des anciens messages de chat et notifications.
+
+Les lignes archivées sont écrites, déjà sérialisées, dans des fichiers JSONL compressés
+(gzip) par propriétaire et par mois : ARCHIVE_ROOT/<type>/<propriétaire>/<AAAA-MM>.jsonl.gz
+(propriétaire = conversation pour les messages, destinataire pour les notifications),
+puis supprimées des tables par lots. Chaque fichier est trié (du plus récent au plus
+ancien) et dédoublonné à l'écriture : une lecture s'arrête dès sa page remplie.
+La pagination par clé relit ces fichiers lorsque l'utilisateur remonte au-delà des
+lignes encore en base (voir api/pagination.py). Les éléments archivés ne sont pas
+couverts par la recherche plein texte (voir has_archive). Les notifications archivées
+sont supprimées à la fin de leur durée de conservation (voir purge_archive).
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ChatMessage, Conversation, Notification
+from .serializers import ChatThreadMessageSerializer, NotificationSerializer
+
+MESSAGES_ARCHIVE = 'messages'
+NOTIFICATIONS_ARCHIVE = 'notifications'
+
+
+def archive_root():
+    return Path(getattr(settings, 'ARCHIVE_ROOT', Path(settings.BASE_DIR) / 'archive'))
+
+
+def archive_month(created_at):
+    """Mois d'archivage (UTC) d'une date"""
+    return created_at.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def archive_path(kind, owner_id, month):
+    return archive_root() / kind / str(owner_id) / f'{month}.jsonl.gz'
+
+
+def _item_key(item):
+    """Position d'un élément archivé : (created_at, id)"""
+    return parse_datetime(item['created_at']), item['id']
+
+
+def _iter_archive_file(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+        for line in archive_file:
+            yield json.loads(line)
+
+
+def write_archive(kind, records):
+    """
+    Ajouter des enregistrements aux fichiers d'archive.
+    records : dictionnaire (propriétaire, mois) -> liste d'éléments sérialisés.
+    Le fichier du mois est réécrit trié du plus récent au plus ancien et dédoublonné
+    (un lot peut être écrit deux fois si sa suppression a échoué), via un fichier
+    temporaire remplacé atomiquement.
+    """
+    for (owner_id, month), items in records.items():
+        path = archive_path(kind, owner_id, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        month_items = {item['id']: item for item in _iter_archive_file(path)} if path.exists() else {}
+        month_items.update((item['id'], item) for item in items)
+
+        temporary_path = path.with_name(f'{path.name}.tmp')
+        with gzip.open(temporary_path, 'wt', encoding='utf-8') as archive_file:
+            for item in sorted(month_items.values(), key=_item_key, reverse=True):
+                archive_file.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+        os.replace(temporary_path, path)
+
+
+def read_archive(kind, owner_id, before=None, limit=50):
+    """
+    Lire les éléments archivés d'un propriétaire, du plus récent au plus ancien,
+    strictement antérieurs à la position before=(created_at, id) si elle est fournie
+    """
+    directory = archive_root() / kind / str(owner_id)
+    if limit <= 0 or not directory.is_dir():
+        return []
+
+    before_month = archive_month(before[0]) if before else None
+    items = []
+    for path in sorted(directory.glob('*.jsonl.gz'), reverse=True):
+        month = path.name.split('.', 1)[0]
+        if before_month and month > before_month:
+            continue
+
+        # Fichier trié à l'écriture : décompression arrêtée dès la page remplie
+        for item in _iter_archive_file(path):
+            if before is None or _item_key(item) < before:
+                items.append(item)
+                if len(items) >= limit:
+                    return items
+    return items
+
+
+def purge_archive(kind, older_than, predicate, dry_run=False):
+    """
+    Supprimer des archives les éléments créés avant older_than pour lesquels
+    predicate(élément) est vrai. Seuls les fichiers des mois concernés sont relus ;
+    chacun est réécrit via un fichier temporaire, ou supprimé s'il devient vide
+    (ainsi que le répertoire du propriétaire, voir has_archive).
+    Retourne la liste des éléments supprimés (ou qui le seraient avec dry_run).
+    """
+    root = archive_root() / kind
+    if not root.is_dir():
+        return []
+
+    last_month = archive_month(older_than)
+    removed = []
+    for path in sorted(root.glob('*/*.jsonl.gz')):
+        if path.name.split('.', 1)[0] > last_month:
+            continue
+
+        kept = []
+        purged = []
+        for item in _iter_archive_file(path):
+            if _item_key(item)[0] < older_than and predicate(item):
+                purged.append(item)
+            else:
+                kept.append(item)
+        removed.extend(purged)
+        if dry_run or not purged:
+            continue
+
+        if kept:
+            temporary_path = path.with_name(f'{path.name}.tmp')
+            with gzip.open(temporary_path, 'wt', encoding='utf-8') as archive_file:
+                for item in kept:
+                    archive_file.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+            os.replace(temporary_path, path)
+        else:
+            path.unlink()
+            if not any(path.parent.iterdir()):
+                path.parent.rmdir()
+    return removed
+
+
+def has_archive(kind, owner_ids):
+    """Vérifier si au moins un des propriétaires a des éléments archivés"""
+    root = archive_root() / kind
+    return any((root / str(owner_id)).is_dir() for owner_id in owner_ids)
+
+
+def archive_queryset(queryset, kind, owner_field, serializer_class, batch_size=1000):
+    """
+    Archiver puis supprimer par lots les lignes d'un queryset.
+    Chaque lot est écrit dans les archives avant d'être supprimé de la base.
+    Retourne le nombre de lignes archivées.
+    """
+    model = queryset.model
+    archived = 0
+    while True:
+        batch = list(queryset.order_by('pk')[:batch_size])
+        if not batch:
+            return archived
+
+        records = defaultdict(list)
+        for instance, item in zip(batch, serializer_class(batch, many=True).data):
+            records[(getattr(instance, owner_field), archive_month(instance.created_at))].append(item)
+        write_archive(kind, records)
+
+        with transaction.atomic():
+            model.objects.filter(pk__in=[instance.pk for instance in batch]).delete()
+        archived += len(batch)
+
+
+def archive_chat_messages(older_than, batch_size=1000):
+    """
+    Archiver les messages lus envoyés avant older_than. Restent en base : les messages
+    non lus (compteurs des conversations) et le dernier message de chaque conversation
+    (sa suppression viderait Conversation.last_message dans la boîte de réception).
+    """
+    queryset = ChatMessage.objects.filter(
+        created_at__lt=older_than,
+        is_read=True,
+        conversation__isnull=False
+    ).exclude(
+        pk__in=Conversation.objects.filter(last_message__isnull=False).values('last_message_id')
+    )
+    return archive_queryset(queryset, MESSAGES_ARCHIVE, 'conversation_id', ChatThreadMessageSerializer, batch_size)
+
+
+def archive_notifications(older_than, batch_size=1000):
+    """Archiver les notifications lues créées avant older_than"""
+    queryset = Notification.objects.filter(
+        created_at__lt=older_than,
+        is_read=True
+    ).select_related('recipient', 'related_module')
+    return archive_queryset(queryset, NOTIFICATIONS_ARCHIVE, 'recipient_id', NotificationSerializer, batch_size)
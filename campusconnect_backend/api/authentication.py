@@ -0,0 +1,75 @@
+"""
+Authentification JWT sans accès à la base pour les lectures.
+
+JWTAuthentication charge la ligne User à chaque requête, alors que le jeton d'accès
+contient déjà username, role et email (voir CustomTokenObtainPairSerializer.get_token).
+TokenClaimsJWTAuthentication construit, pour les méthodes sûres (GET, HEAD, OPTIONS),
+un utilisateur léger à partir de ces claims ; les écritures chargent toujours le modèle
+complet. À activer vue par vue (authentication_classes) : ces vues ne doivent utiliser
+que request.user.id, username, role et email, et filtrer avec *_id=request.user.id.
+
+Contrepartie : un changement de rôle ou une désactivation du compte n'est pris en compte
+en lecture qu'à l'expiration du jeton d'accès (SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']).
+"""
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+# Claims nécessaires pour se passer de la base
+TOKEN_USER_CLAIMS = ('username', 'role', 'email')
+
+
+class TokenClaimsUser(TokenUser):
+    """
+    Utilisateur construit à partir des claims du jeton d'accès (aucune requête)
+    """
+    @cached_property
+    def id(self):
+        # Le claim est une chaîne : le convertir comme la clé primaire du modèle User
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        return self.token.get('role', '')
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    # Propriétés, comme sur le modèle User : une méthode serait toujours vraie dans un test
+    @property
+    def is_student(self):
+        return self.role == 'student'
+
+    @property
+    def is_teacher(self):
+        return self.role == 'teacher'
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+
+class TokenClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authentification JWT : utilisateur léger issu du jeton pour les méthodes sûres,
+    modèle User complet pour les écritures et pour les jetons sans les claims nécessaires
+    """
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS:
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if not all(claim in validated_token for claim in TOKEN_USER_CLAIMS):
+            return self.get_user(validated_token), validated_token
+        return TokenClaimsUser(validated_token), validated_token
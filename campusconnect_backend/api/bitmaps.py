@@ -0,0 +1,34 @@
+"""
+Bitmaps compacts stockés en bytes (bit n = octet n // 8, bit n % 8)
+"""
+
+
+def test_bit(bitmap, index):
+    """Vérifier si le bit index est positionné"""
+    byte = index >> 3
+    return byte < len(bitmap) and bool(bitmap[byte] & (1 << (index & 7)))
+
+
+def set_bit(bitmap, index):
+    """Retourner une copie du bitmap avec le bit index positionné (agrandi si nécessaire)"""
+    byte = index >> 3
+    data = bytearray(bitmap)
+    if byte >= len(data):
+        data.extend(b'\x00' * (byte + 1 - len(data)))
+    data[byte] |= 1 << (index & 7)
+    return bytes(data)
+
+
+def clear_bit(bitmap, index):
+    """Retourner une copie du bitmap avec le bit index remis à zéro"""
+    byte = index >> 3
+    if byte >= len(bitmap):
+        return bytes(bitmap)
+    data = bytearray(bitmap)
+    data[byte] &= ~(1 << (index & 7)) & 0xFF
+    return bytes(data.rstrip(b'\x00'))
+
+
+def count_bits(bitmap):
+    """Nombre de bits positionnés"""
+    return int.from_bytes(bitmap, 'little').bit_count()
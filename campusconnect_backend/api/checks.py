@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_notification_retention(app_configs, **kwargs):
+    """
+    Une seule politique pour les notifications lues : archivage après ARCHIVE_AFTER_DAYS,
+    puis suppression des archives à la fin de NOTIFICATION_RETENTION_DAYS. Une durée de
+    conservation plus courte que l'âge d'archivage supprimerait des notifications avant
+    leur archivage.
+    """
+    archive_after = getattr(settings, 'ARCHIVE_AFTER_DAYS', 180)
+    return [
+        Error(
+            f"NOTIFICATION_RETENTION_DAYS['{notification_type}'] ({days} j) est inférieure "
+            f"à ARCHIVE_AFTER_DAYS ({archive_after} j).",
+            hint="Conserver chaque type au moins jusqu'à son archivage.",
+            id='api.E001',
+        )
+        for notification_type, days in getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {}).items()
+        if days < archive_after
+    ]
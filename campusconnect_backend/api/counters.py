@@ -0,0 +1,93 @@
+"""
+Compteurs de non lus par utilisateur (notifications, messages), stockés dans
+UnreadCounter : une ligne par utilisateur, lue par clé primaire.
+
+Les compteurs sont incrémentés à la création et décrémentés à la lecture par des
+UPDATE atomiques (F()) exécutés dans la transaction de l'écriture : les mises à jour
+concurrentes des serveurs web, de runworker et des commandes planifiées ne se perdent
+pas, et un rollback annule aussi la mise à jour du compteur. La commande
+reconcile_unread_counters corrige d'éventuelles dérives (modifications directes en base).
+"""
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import ChatMessage, Notification, UnreadCounter
+
+# Noms des colonnes de UnreadCounter
+NOTIFICATIONS = 'notifications'
+MESSAGES = 'messages'
+
+
+def cache_is_shared():
+    """Le cache par défaut est-il commun à tous les processus ?"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def unread_queryset(kind):
+    """Lignes non lues d'un type de compteur (source de vérité en base)"""
+    if kind == NOTIFICATIONS:
+        return Notification.objects.filter(is_read=False)
+    return ChatMessage.objects.filter(is_read=False)
+
+
+def count_unread(kind, user_id):
+    return unread_queryset(kind).filter(recipient_id=user_id).count()
+
+
+def get_unread_count(kind, user_id):
+    """Nombre de non lus (une lecture par clé primaire), initialisé en base au besoin"""
+    count = UnreadCounter.objects.filter(user_id=user_id).values_list(kind, flat=True).first()
+    if count is None:
+        counter = UnreadCounter(
+            user_id=user_id,
+            notifications=count_unread(NOTIFICATIONS, user_id),
+            messages=count_unread(MESSAGES, user_id)
+        )
+        UnreadCounter.objects.bulk_create([counter], ignore_conflicts=True)
+        count = getattr(counter, kind)
+    return count
+
+
+def increment_unread(kind, user_ids, delta=1):
+    """Incrémenter les compteurs de plusieurs utilisateurs (dans la transaction courante)"""
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    # Utilisateurs créés depuis la migration 0024 : compteur créé à zéro au premier incrément
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+    UnreadCounter.objects.filter(user_id__in=user_ids).update(**{kind: F(kind) + delta})
+
+
+def decrement_unread(kind, user_id, delta=1):
+    """Décrémenter le compteur d'un utilisateur (dans la transaction courante), sans passer sous zéro"""
+    if delta:
+        UnreadCounter.objects.filter(user_id=user_id).update(**{kind: Greatest(F(kind) - delta, 0)})
+
+
+def reconcile_unread_counters(kind, user_ids):
+    """
+    Comparer les compteurs de ces utilisateurs aux valeurs en base
+    et corriger ceux qui ont dérivé. Retourne le nombre de compteurs corrigés.
+    """
+    actual = dict(
+        unread_queryset(kind)
+        .filter(recipient_id__in=user_ids)
+        .values('recipient_id')
+        .annotate(unread=Count('id'))
+        .values_list('recipient_id', 'unread')
+    )
+    drifted = [
+        counter
+        for counter in UnreadCounter.objects.filter(user_id__in=user_ids).only('user_id', kind)
+        if getattr(counter, kind) != actual.get(counter.user_id, 0)
+    ]
+    for counter in drifted:
+        setattr(counter, kind, actual.get(counter.user_id, 0))
+    UnreadCounter.objects.bulk_update(drifted, [kind])
+    return len(drifted)
@@ -0,0 +1,134 @@
+"""
+Fils d'annonces précalculés : un fil par module et un fil général, stockés en cache
+déjà sérialisés (épinglées d'abord, puis par date de publication décroissante).
+Le fil d'un étudiant est obtenu par fusion (k-way merge) des fils de ses modules
+et du fil général. Chaque fil est limité à ANNOUNCEMENT_FEED_SIZE annonces : au-delà,
+les lectures se font en base (voir student_feed). Chaque fil conserve aussi le nombre
+total d'annonces actives de son périmètre, qui donne le total paginé sans COUNT.
+"""
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Announcement, Enrollment
+from .serializers import AnnouncementSerializer
+
+GENERAL_FEED = 'general'
+FEED_CACHE_KEY = 'announcements:feed:v2:{scope}'
+
+
+def feed_size():
+    """Nombre maximal d'annonces conservées par fil"""
+    return getattr(settings, 'ANNOUNCEMENT_FEED_SIZE', 200)
+
+
+def _feed_cache_key(scope):
+    return FEED_CACHE_KEY.format(scope=scope)
+
+
+def feed_scope(module_id):
+    """Identifiant du fil d'une annonce : id du module, ou fil général"""
+    return module_id if module_id is not None else GENERAL_FEED
+
+
+def build_feed(scope):
+    """
+    Construire le fil d'un module (ou le fil général) à partir de la base :
+    {'total': nombre d'annonces actives du périmètre, 'entries': [...]}.
+    Chaque entrée contient sa clé de tri et l'annonce sérialisée.
+    """
+    # Les annonces expirées sont désactivées par la commande expire_announcements
+    # (qui invalide les fils concernés) : seul is_active est lu, comme en base
+    queryset = Announcement.objects.filter(is_active=True)
+    if scope == GENERAL_FEED:
+        queryset = queryset.filter(module__isnull=True)
+    else:
+        queryset = queryset.filter(module_id=scope)
+    announcements = list(
+        queryset
+        .select_related('author', 'module')
+        .order_by('-is_pinned', '-published_date', '-id')
+        [:feed_size()]
+    )
+    return {
+        'total': len(announcements) if len(announcements) < feed_size() else queryset.count(),
+        'entries': [
+            {
+                # Ordre croissant de la clé = épinglées d'abord, puis plus récentes d'abord
+                'sort_key': (0 if announcement.is_pinned else 1, -announcement.published_date.timestamp(), -announcement.id),
+                'data': AnnouncementSerializer(announcement).data,
+            }
+            for announcement in announcements
+        ],
+    }
+
+
+def get_feeds(scopes):
+    """Récupérer plusieurs fils depuis le cache, en reconstruisant ceux qui manquent"""
+    keys = {_feed_cache_key(scope): scope for scope in scopes}
+    cached = cache.get_many(keys.keys())
+    feeds = {keys[key]: feed for key, feed in cached.items()}
+
+    missing = {}
+    for key, scope in keys.items():
+        if scope not in feeds:
+            feeds[scope] = build_feed(scope)
+            missing[key] = feeds[scope]
+    if missing:
+        cache.set_many(missing, getattr(settings, 'ANNOUNCEMENT_FEED_TIMEOUT', 300))
+    return feeds
+
+
+def warm_feeds(scopes):
+    """Reconstruire et remettre en cache des fils immédiatement (écriture directe)"""
+    cache.set_many(
+        {_feed_cache_key(scope): build_feed(scope) for scope in set(scopes)},
+        getattr(settings, 'ANNOUNCEMENT_FEED_TIMEOUT', 300)
+    )
+
+
+def invalidate_feeds(scopes):
+    """Invalider des fils après le commit de la modification d'une annonce"""
+    keys = [_feed_cache_key(scope) for scope in set(scopes)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def merge_feeds(feeds):
+    """
+    Fusionner des fils déjà triés (k-way merge).
+    Retourne (annonces sérialisées, total des fils).
+    Un fil tronqué (total supérieur à ses entrées) n'est exact que jusqu'à sa dernière
+    entrée : la liste s'arrête alors à cette position et contient moins que le total.
+    """
+    feeds = list(feeds)
+    truncated = [feed['entries'][-1]['sort_key'] for feed in feeds if feed['total'] > len(feed['entries'])]
+    window_end = min(truncated) if truncated else None
+
+    announcements = []
+    for entry in heapq.merge(*(feed['entries'] for feed in feeds), key=lambda entry: entry['sort_key']):
+        if window_end is not None and entry['sort_key'] > window_end:
+            break
+        announcements.append(entry['data'])
+    return announcements, sum(feed['total'] for feed in feeds)
+
+
+def student_feed(user_id, module_id=None):
+    """
+    Fil d'annonces d'un étudiant : ses modules (inscriptions actives) et le fil général.
+    Si module_id est fourni, seul le fil de ce module est retourné (s'il y est inscrit).
+    Retourne (annonces, total), voir merge_feeds.
+    """
+    module_ids = list(
+        Enrollment.objects
+        .filter(student_id=user_id, is_active=True)
+        .values_list('module_id', flat=True)
+    )
+    if module_id is not None:
+        scopes = [module_id] if module_id in module_ids else []
+    else:
+        scopes = module_ids + [GENERAL_FEED]
+    feeds = get_feeds(scopes)
+    return merge_feeds(feeds[scope] for scope in scopes)
@@ -0,0 +1,344 @@
+"""
+Traitements en masse sur les notes (import de fichiers CSV / XLSX, classements)
+"""
+import csv
+import io
+import tempfile
+import uuid
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import DenseRank, PercentRank
+
+from .counters import cache_is_shared
+from .models import Enrollment, Grade
+
+GRADE_IMPORT_REPORT_DIR = 'grade_imports'
+RANKING_CACHE_KEY = 'grades:ranking:module:{module_id}'
+GRADE_IMPORT_REPORT_HEADER = ['ligne', 'etudiant', 'erreur']
+
+
+class GradeImportError(Exception):
+    """Erreur bloquante lors de la lecture d'un fichier de notes"""
+
+
+def _normalize_header(value):
+    return str(value or '').strip().lower()
+
+
+def _iter_csv_rows(uploaded_file):
+    """Lire un CSV ligne par ligne sans le charger en mémoire (séparateur , ou ;)"""
+    uploaded_file.seek(0)
+    stream = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
+    try:
+        first_line = stream.readline()
+        delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+        header = [_normalize_header(value) for value in next(csv.reader([first_line], delimiter=delimiter), [])]
+        for values in csv.reader(stream, delimiter=delimiter):
+            yield header, values
+    except UnicodeDecodeError:
+        raise GradeImportError("Le fichier CSV doit être encodé en UTF-8.")
+    finally:
+        stream.detach()
+
+
+def _iter_xlsx_rows(uploaded_file):
+    """Lire la première feuille d'un classeur XLSX en mode lecture seule (flux)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise GradeImportError("L'import XLSX nécessite le paquet openpyxl.")
+
+    uploaded_file.seek(0)
+    try:
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    except Exception:
+        raise GradeImportError("Le fichier XLSX est illisible.")
+
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_normalize_header(value) for value in next(rows, [])]
+        for values in rows:
+            yield header, ['' if value is None else str(value) for value in values]
+    finally:
+        workbook.close()
+
+
+def iter_grade_rows(uploaded_file):
+    """
+    Itérer sur les lignes d'un fichier de notes sous forme de dictionnaires
+    (colonne -> valeur), avec leur numéro de ligne dans le fichier
+    """
+    extension = uploaded_file.name.rsplit('.', 1)[-1].lower() if '.' in uploaded_file.name else ''
+    if extension == 'csv':
+        rows = _iter_csv_rows(uploaded_file)
+    elif extension == 'xlsx':
+        rows = _iter_xlsx_rows(uploaded_file)
+    else:
+        raise GradeImportError("Format non supporté : seuls les fichiers .csv et .xlsx sont acceptés.")
+
+    for line_number, (header, values) in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in values):
+            continue
+        yield line_number, {
+            column: str(value).strip()
+            for column, value in zip(header, values)
+            if column
+        }
+
+
+def _parse_decimal(value):
+    try:
+        value = Decimal(value.replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        return None
+    return value if value.is_finite() else None
+
+
+def _precision_error(field_name, value):
+    """
+    Message d'erreur si value ne tient pas dans le DecimalField field_name de Grade
+    (max_digits / decimal_places), None sinon
+    """
+    field = Grade._meta.get_field(field_name)
+    integer_digits = field.max_digits - field.decimal_places
+    sign, digits, exponent = value.normalize().as_tuple()
+    decimals = max(-exponent, 0)
+    whole_digits = max(len(digits) + exponent, 0)
+    if decimals > field.decimal_places or whole_digits > integer_digits:
+        return (
+            f"{field.verbose_name} invalide : au plus {integer_digits} chiffre(s) avant la virgule "
+            f"et {field.decimal_places} après."
+        )
+    return None
+
+
+def report_storage():
+    """
+    Stockage des rapports d'import : hors de MEDIA_ROOT (ils contiennent des identifiants
+    d'étudiants), servis uniquement par l'API après contrôle des droits
+    """
+    return FileSystemStorage(
+        location=getattr(settings, 'PRIVATE_MEDIA_ROOT', Path(settings.BASE_DIR) / 'private')
+    )
+
+
+def report_path(module_id, report_id):
+    """Chemin d'un rapport d'import dans report_storage()"""
+    return f'{GRADE_IMPORT_REPORT_DIR}/{module_id}/{report_id}.csv'
+
+
+def build_student_lookup(module):
+    """
+    Construire en deux requêtes les dictionnaires numéro étudiant -> id et
+    nom d'utilisateur -> id des étudiants inscrits au module
+    """
+    enrollments = Enrollment.objects.filter(module=module, is_active=True)
+    by_username = dict(enrollments.values_list('student__username', 'student_id'))
+    by_student_id = dict(
+        enrollments
+        .filter(student__student_profile__isnull=False)
+        .values_list('student__student_profile__student_id', 'student_id')
+    )
+    return by_student_id, by_username
+
+
+def import_grades(uploaded_file, module, graded_by, grade_type='exam', max_grade=Decimal('20.00'),
+                  batch_size=None):
+    """
+    Importer les notes d'un fichier CSV / XLSX pour un module.
+
+    Colonnes reconnues : student_id ou username (obligatoire), grade (obligatoire),
+    max_grade, grade_type, comment. Les lignes valides sont insérées par lots
+    (bulk_create) et les lignes rejetées sont écrites dans un rapport CSV privé.
+
+    Retourne un dictionnaire {'created', 'errors', 'error_report'} (identifiant du rapport).
+    """
+    batch_size = batch_size or getattr(settings, 'GRADE_IMPORT_BATCH_SIZE', 1000)
+    grade_types = dict(Grade.GRADE_TYPE_CHOICES)
+    by_student_id, by_username = build_student_lookup(module)
+
+    created = 0
+    error_count = 0
+    batch = []
+
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8', newline='') as report:
+        writer = csv.writer(report)
+        writer.writerow(GRADE_IMPORT_REPORT_HEADER)
+
+        def reject(line_number, student, message):
+            nonlocal error_count
+            error_count += 1
+            writer.writerow([line_number, student, message])
+
+        with transaction.atomic():
+            for line_number, row in iter_grade_rows(uploaded_file):
+                student_key = row.get('student_id') or row.get('username') or ''
+                if row.get('student_id'):
+                    student_pk = by_student_id.get(row['student_id'])
+                else:
+                    student_pk = by_username.get(row.get('username'))
+                if not student_key:
+                    reject(line_number, '', "Colonne student_id ou username manquante.")
+                    continue
+                if student_pk is None:
+                    reject(line_number, student_key, "Étudiant introuvable ou non inscrit au module.")
+                    continue
+
+                row_max_grade = max_grade
+                if row.get('max_grade'):
+                    row_max_grade = _parse_decimal(row['max_grade'])
+                    if row_max_grade is None or row_max_grade <= 0:
+                        reject(line_number, student_key, "Note maximale invalide.")
+                        continue
+                    error = _precision_error('max_grade', row_max_grade)
+                    if error:
+                        reject(line_number, student_key, error)
+                        continue
+
+                value = _parse_decimal(row.get('grade', ''))
+                if value is None:
+                    reject(line_number, student_key, "Note manquante ou invalide.")
+                    continue
+                if value < 0:
+                    reject(line_number, student_key, "La note ne peut pas être négative.")
+                    continue
+                if value > row_max_grade:
+                    reject(line_number, student_key, f"La note ne peut pas dépasser {row_max_grade}.")
+                    continue
+                error = _precision_error('grade', value)
+                if error:
+                    reject(line_number, student_key, error)
+                    continue
+
+                row_grade_type = row.get('grade_type') or grade_type
+                if row_grade_type not in grade_types:
+                    reject(line_number, student_key, f"Type de note inconnu : {row_grade_type}.")
+                    continue
+
+                batch.append(Grade(
+                    student_id=student_pk,
+                    module=module,
+                    grade_type=row_grade_type,
+                    grade=value,
+                    max_grade=row_max_grade,
+                    comment=row.get('comment') or None,
+                    graded_by=graded_by
+                ))
+                if len(batch) >= batch_size:
+                    Grade.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+
+            if batch:
+                Grade.objects.bulk_create(batch)
+                created += len(batch)
+
+            # bulk_create ne déclenche pas les signaux : recalcul groupé des notes finales
+            if created:
+                Enrollment.objects.filter(module=module).refresh_final_grades()
+
+        report_id = None
+        if error_count:
+            report.seek(0)
+            report_id = uuid.uuid4().hex
+            report_storage().save(report_path(module.id, report_id), File(report))
+
+    return {
+        'created': created,
+        'errors': error_count,
+        'error_report': report_id,
+    }
+
+
+# ==================== CLASSEMENTS ====================
+
+def _ranking_cache_key(module_id):
+    return RANKING_CACHE_KEY.format(module_id=module_id)
+
+
+def compute_module_ranking(module_id):
+    """
+    Calculer le classement d'un module à partir des notes finales (Enrollment.grade, sur 20).
+    Rangs denses et percentiles sont calculés en SQL par des fonctions de fenêtrage,
+    sur l'ensemble du module et par promotion (filière, année).
+    """
+    cohort = [F('student__student_profile__major'), F('student__student_profile__year')]
+    rows = (
+        Enrollment.objects
+        .filter(module_id=module_id, is_active=True, grade__isnull=False)
+        .annotate(
+            module_rank=Window(DenseRank(), order_by=F('grade').desc()),
+            module_percentile=Window(PercentRank(), order_by=F('grade').asc()),
+            module_size=Window(Count('id')),
+            cohort_rank=Window(DenseRank(), partition_by=cohort, order_by=F('grade').desc()),
+            cohort_percentile=Window(PercentRank(), partition_by=cohort, order_by=F('grade').asc()),
+            cohort_size=Window(Count('id'), partition_by=cohort),
+        )
+        .order_by('module_rank', 'student__username')
+        .values(
+            'student_id', 'student__username', 'student__student_profile__major',
+            'student__student_profile__year', 'grade', 'module_rank', 'module_percentile',
+            'module_size', 'cohort_rank', 'cohort_percentile', 'cohort_size',
+        )
+    )
+    return [
+        {
+            'student': row['student_id'],
+            'student_username': row['student__username'],
+            'major': row['student__student_profile__major'],
+            'year': row['student__student_profile__year'],
+            'grade': row['grade'],
+            'module_rank': row['module_rank'],
+            'module_percentile': round(row['module_percentile'] * 100, 1),
+            'module_size': row['module_size'],
+            'cohort_rank': row['cohort_rank'],
+            'cohort_percentile': round(row['cohort_percentile'] * 100, 1),
+            'cohort_size': row['cohort_size'],
+        }
+        for row in rows
+    ]
+
+
+def get_module_rankings(module_ids):
+    """
+    Récupérer les classements (instantanés en cache) de plusieurs modules,
+    en ne recalculant que ceux absents du cache
+    """
+    if not cache_is_shared():
+        # Un cache local ne verrait pas les invalidations faites par les autres processus
+        return {module_id: compute_module_ranking(module_id) for module_id in module_ids}
+
+    keys = {_ranking_cache_key(module_id): module_id for module_id in module_ids}
+    cached = cache.get_many(keys.keys())
+    rankings = {keys[key]: ranking for key, ranking in cached.items()}
+
+    missing = {}
+    for key, module_id in keys.items():
+        if module_id not in rankings:
+            rankings[module_id] = compute_module_ranking(module_id)
+            missing[key] = rankings[module_id]
+    if missing:
+        cache.set_many(missing, getattr(settings, 'RANKING_CACHE_TIMEOUT', 3600))
+    return rankings
+
+
+def get_module_ranking(module_id):
+    """Classement d'un module (instantané en cache)"""
+    return get_module_rankings([module_id])[module_id]
+
+
+def invalidate_module_rankings(module_ids):
+    """
+    Invalider les instantanés de classement après une modification des notes
+    (après le commit, pour ne pas remettre en cache un état non validé)
+    """
+    keys = [_ranking_cache_key(module_id) for module_id in module_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
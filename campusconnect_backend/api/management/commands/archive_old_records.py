@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.archive import archive_chat_messages, archive_notifications
+
+
+class Command(BaseCommand):
+    """
+    Archivage périodique des anciens messages de chat et notifications lus
+    (à planifier, par exemple chaque nuit via cron)
+    """
+    help = "Déplace les messages et notifications lus les plus anciens vers des archives JSONL compressées"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'ARCHIVE_AFTER_DAYS', 180),
+            help='Âge minimal (en jours) des lignes à archiver (défaut : settings.ARCHIVE_AFTER_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de lignes archivées puis supprimées par lot (défaut : 1000)'
+        )
+        parser.add_argument(
+            '--only',
+            choices=['messages', 'notifications'],
+            help='Archiver uniquement les messages ou uniquement les notifications'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days doit être supérieur ou égal à 1.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être supérieur ou égal à 1.")
+        older_than = timezone.now() - timedelta(days=options['days'])
+
+        if options['only'] in (None, 'messages'):
+            archived = archive_chat_messages(older_than, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{archived} message(s) archivé(s).'))
+        if options['only'] in (None, 'notifications'):
+            archived = archive_notifications(older_than, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{archived} notification(s) archivée(s).'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Announcement
+
+
+class Command(BaseCommand):
+    """
+    Balayage périodique des annonces expirées (à planifier, par exemple toutes les minutes via cron)
+    """
+    help = "Désactive par lots les annonces dont la date d'expiration est passée"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre d\'annonces désactivées par requête UPDATE (défaut : 500)'
+        )
+
+    def handle(self, *args, **options):
+        expired = Announcement.objects.expire_due(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{expired} annonce(s) expirée(s) désactivée(s).'))
@@ -0,0 +1,79 @@
+import asyncio
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.pubsub import get_pubsub, user_channel
+from api.realtime import WEBSOCKET_PATH, websocket_application
+
+
+class Command(BaseCommand):
+    """
+    Mesure locale du coût des connexions WebSocket : l'application ASGI est pilotée
+    en mémoire (sans serveur ni réseau), toutes les connexions sur une seule boucle asyncio.
+    Mesure la mémoire allouée par connexion inactive et la durée d'une diffusion
+    à toutes les connexions (même canal utilisateur).
+    """
+    help = "Ouvre N connexions WebSocket en mémoire et mesure mémoire et durée de diffusion"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Utilisateur actif dont le jeton authentifie les connexions')
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=5000,
+            help='Nombre de connexions simultanées (défaut : 5000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['connections'] < 1:
+            raise CommandError("--connections doit être supérieur ou égal à 1.")
+        user = get_user_model().objects.filter(username=options['username'], is_active=True).first()
+        if user is None:
+            raise CommandError(f"Utilisateur actif introuvable : {options['username']}")
+
+        asyncio.run(self.run(user, str(AccessToken.for_user(user)), options['connections']))
+
+    async def connect(self, token):
+        """Ouvrir une connexion ; retourne (tâche, file client -> serveur, file serveur -> client)"""
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        scope = {
+            'type': 'websocket',
+            'path': WEBSOCKET_PATH,
+            'query_string': b'',
+            'headers': [(b'authorization', f'Bearer {token}'.encode())],
+        }
+        await inbox.put({'type': 'websocket.connect'})
+        task = asyncio.ensure_future(websocket_application(scope, inbox.get, outbox.put))
+        event = await outbox.get()
+        if event['type'] != 'websocket.accept':
+            raise CommandError(f'Connexion refusée : {event}')
+        return task, inbox, outbox
+
+    async def run(self, user, token, count):
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        connections = [await self.connect(token) for _ in range(count)]
+        connect_time = time.perf_counter() - started
+        per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / count
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        delivered = get_pubsub().publish(user_channel(user.pk), {'type': 'loadtest', 'data': {}})
+        for _, _, outbox in connections:
+            await outbox.get()
+        broadcast_time = time.perf_counter() - started
+
+        for task, inbox, _ in connections:
+            await inbox.put({'type': 'websocket.disconnect'})
+        await asyncio.gather(*(task for task, _, _ in connections))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} connexion(s) ouvertes en {connect_time:.2f} s, '
+            f'environ {per_connection / 1024:.1f} Ko par connexion ; '
+            f'diffusion à {delivered} abonné(s) en {broadcast_time:.3f} s.'
+        ))
@@ -0,0 +1,48 @@
+import os
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import Announcement
+from api.notifications import fan_out_announcement
+from api.tasks import claim_tasks, execute_task
+
+
+class Command(BaseCommand):
+    """
+    Publication des annonces programmées (à planifier, par exemple toutes les minutes via cron)
+    """
+    help = "Publie les annonces dont la date publish_at est atteinte, pré-chauffe les fils et notifie les destinataires"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre d\'annonces activées par requête UPDATE (défaut : 500)'
+        )
+
+    def handle(self, *args, **options):
+        published = Announcement.objects.publish_due(batch_size=options['batch_size'])
+        
+        # Les diffusions sont en file d'attente (api.tasks) ; sans runworker (backend 'thread'),
+        # les exécuter ici, y compris celles laissées en attente par une exécution interrompue
+        if getattr(settings, 'BACKGROUND_TASK_BACKEND', 'thread') == 'database':
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(published)} annonce(s) publiée(s), diffusion confiée au worker.'
+            ))
+            return
+        
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:publish_announcements'
+        executed = failed = 0
+        while tasks := claim_tasks(worker_id, limit=options['batch_size'], names=[fan_out_announcement]):
+            for task in tasks:
+                if execute_task(task):
+                    executed += 1
+                else:
+                    failed += 1
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(published)} annonce(s) publiée(s), {executed} diffusion(s) effectuée(s), {failed} en échec.'
+        ))
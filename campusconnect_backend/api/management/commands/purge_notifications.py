@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import Notification
+from api.notifications import purge_read_notifications
+
+
+class Command(BaseCommand):
+    """
+    Purge périodique des notifications lues selon settings.NOTIFICATION_RETENTION_DAYS :
+    archives (voir archive_old_records) et lignes pas encore archivées
+    (à planifier, par exemple chaque nuit via cron)
+    """
+    help = "Supprime par lots les notifications lues au-delà de leur durée de conservation"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            dest='notification_type',
+            choices=[value for value, _ in Notification.NOTIFICATION_TYPE_CHOICES],
+            help='Purger uniquement ce type de notification'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de notifications supprimées en base par requête DELETE (défaut : 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher ce qui serait supprimé sans rien supprimer'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être supérieur ou égal à 1.")
+        retention = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {})
+        notification_type = options['notification_type']
+        if notification_type:
+            if notification_type not in retention:
+                raise CommandError(f"Aucune durée de conservation définie pour le type {notification_type}.")
+            retention = {notification_type: retention[notification_type]}
+
+        now = timezone.now()
+        total_rows = 0
+        total_bytes = 0
+        for notification_type, days in retention.items():
+            rows, reclaimed = purge_read_notifications(
+                notification_type,
+                now - timedelta(days=days),
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run']
+            )
+            total_rows += rows
+            total_bytes += reclaimed
+            if rows:
+                self.stdout.write(f'  {notification_type} (> {days} j) : {rows} notification(s), ~{reclaimed} octet(s)')
+
+        verb = 'seraient supprimée(s)' if options['dry_run'] else 'supprimée(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_rows} notification(s) {verb}, environ {total_bytes} octet(s) libéré(s).'
+        ))
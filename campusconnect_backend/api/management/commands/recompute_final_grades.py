@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Enrollment, Module
+
+
+class Command(BaseCommand):
+    """
+    Recalculer les notes finales des inscriptions (par exemple après un changement
+    de settings.GRADE_TYPE_WEIGHTS)
+    """
+    help = "Recalcule Enrollment.grade à partir des notes, en une seule requête UPDATE"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module',
+            help='Code du module à recalculer (par défaut : tous les modules)'
+        )
+
+    def handle(self, *args, **options):
+        enrollments = Enrollment.objects.all()
+        
+        module_code = options.get('module')
+        if module_code:
+            try:
+                module = Module.objects.get(code=module_code.upper())
+            except Module.DoesNotExist:
+                raise CommandError(f"Le module {module_code} n'existe pas.")
+            enrollments = enrollments.filter(module=module)
+        
+        updated = enrollments.refresh_final_grades()
+        self.stdout.write(self.style.SUCCESS(f'{updated} inscription(s) recalculée(s).'))
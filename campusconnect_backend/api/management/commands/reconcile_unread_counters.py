@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.counters import MESSAGES, NOTIFICATIONS, reconcile_unread_counters
+from api.notifications import iter_id_batches
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Réconciliation périodique des compteurs de non lus (UnreadCounter) avec la base
+    (à planifier, par exemple toutes les heures via cron)
+    """
+    help = "Corrige les compteurs de notifications et messages non lus qui ont dérivé"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre d\'utilisateurs vérifiés par lot (défaut : 1000)'
+        )
+
+    def handle(self, *args, **options):
+        drifted = {NOTIFICATIONS: 0, MESSAGES: 0}
+        users = User.objects.filter(is_active=True)
+        for user_ids in iter_id_batches(users, batch_size=options['batch_size']):
+            for kind in drifted:
+                drifted[kind] += reconcile_unread_counters(kind, user_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{drifted[NOTIFICATIONS]} compteur(s) de notifications et "
+            f"{drifted[MESSAGES]} compteur(s) de messages corrigé(s)."
+        ))
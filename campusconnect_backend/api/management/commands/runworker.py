@@ -0,0 +1,99 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.tasks import claim_tasks, execute_task, release_stale_tasks
+
+
+class Command(BaseCommand):
+    """
+    Worker de la file d'attente en base (BACKGROUND_TASK_BACKEND = 'database').
+    Plusieurs workers peuvent tourner en parallèle, sur une ou plusieurs machines.
+    """
+    help = "Exécute les tâches d'arrière-plan stockées en base"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+            help='Nombre de threads exécutant des tâches (défaut : settings.BACKGROUND_TASK_WORKERS)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Attente (secondes) quand la file est vide (défaut : 1)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exécuter les tâches dues puis s\'arrêter (cron, tests)'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError("--concurrency doit être supérieur ou égal à 1.")
+
+        self.stop = threading.Event()
+        self.counts = {'succeeded': 0, 'failed': 0}
+        self.counts_lock = threading.Lock()
+        worker_prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        if not options['once']:
+            # Arrêt propre : les tâches en cours se terminent avant la sortie
+            signal.signal(signal.SIGINT, lambda *_: self.stop.set())
+            signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+
+        released = release_stale_tasks()
+        if released:
+            self.stdout.write(f'{released} tâche(s) abandonnée(s) remise(s) en attente.')
+
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{worker_prefix}:{index}', options['poll_interval'], options['once']),
+                name=f'runworker-{index}'
+            )
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'Worker démarré ({concurrency} thread(s)).')
+
+        # Le thread principal reste disponible pour les signaux et relâche
+        # périodiquement les tâches des workers arrêtés brutalement
+        release_interval = min(getattr(settings, 'TASK_LOCK_TIMEOUT', 600) / 2, 60)
+        next_release = time.monotonic() + release_interval
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+            if time.monotonic() >= next_release:
+                release_stale_tasks()
+                next_release = time.monotonic() + release_interval
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.counts['succeeded']} tâche(s) exécutée(s), {self.counts['failed']} échec(s)."
+        ))
+
+    def work(self, worker_id, poll_interval, once):
+        """Boucle d'un thread : réserver une tâche, l'exécuter, recommencer"""
+        while not self.stop.is_set():
+            tasks = claim_tasks(worker_id, limit=1)
+            if not tasks:
+                if once:
+                    return
+                self.stop.wait(poll_interval)
+                continue
+            for task in tasks:
+                result = 'succeeded' if execute_task(task) else 'failed'
+                with self.counts_lock:
+                    self.counts[result] += 1
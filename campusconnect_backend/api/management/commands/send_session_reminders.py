@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.notifications import send_session_reminders
+
+
+class Command(BaseCommand):
+    """
+    Rappels des sessions à venir (à planifier, par exemple toutes les 5 minutes via cron).
+    Une session n'est rappelée qu'une fois, même si la commande est relancée.
+    """
+    help = "Notifie les étudiants inscrits des sessions commençant prochainement"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes',
+            type=int,
+            default=getattr(settings, 'SESSION_REMINDER_LEAD_MINUTES', 30),
+            help='Rappeler les sessions commençant dans ce nombre de minutes (défaut : settings.SESSION_REMINDER_LEAD_MINUTES)'
+        )
+
+    def handle(self, *args, **options):
+        if options['minutes'] < 1:
+            raise CommandError("--minutes doit être supérieur ou égal à 1.")
+
+        sessions, notified = send_session_reminders(options['minutes'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{sessions} session(s) rappelée(s), {notified} notification(s) créée(s).'
+        ))
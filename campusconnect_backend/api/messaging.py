@@ -0,0 +1,105 @@
+"""
+Historique des conversations : pagination par clé (keyset) sur (created_at, id)
+à l'intérieur d'un fil, pour un coût constant quelle que soit la profondeur,
+lecture groupée d'un fil jusqu'à un message donné et boîte de réception
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import MESSAGES_ARCHIVE
+from .models import ChatMessage, Conversation
+from .pagination import keyset_page, page_size
+from .serializers import ChatThreadMessageSerializer
+
+THREAD_MESSAGE_FIELDS = ['id', 'sender_id', 'message', 'is_read', 'read_at', 'created_at']
+
+
+class ConversationInbox:
+    """
+    Conversations d'un utilisateur, la plus récente d'abord (last_activity, id).
+    Un filtre user_low OU user_high ne peut pas être servi par un seul parcours d'index
+    ordonné : chaque côté est lu dans l'ordre de son index (user_low, -last_activity, -id)
+    ou (user_high, ...), limité à la fin de la page demandée, puis les deux flux sont
+    fusionnés. S'utilise comme un queryset avec LimitOffsetPagination (count() et découpage).
+    """
+    
+    def __init__(self, user_id):
+        conversations = (
+            Conversation.objects
+            .select_related('user_low', 'user_high', 'last_message__sender', 'last_message__recipient')
+            .order_by('-last_activity', '-id')
+        )
+        self.sides = [
+            conversations.filter(user_low_id=user_id),
+            conversations.filter(user_high_id=user_id),
+        ]
+    
+    def count(self):
+        return sum(side.count() for side in self.sides)
+    
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('ConversationInbox ne prend en charge que les tranches [début:fin].')
+        sides = self.sides if index.stop is None else [side[:index.stop] for side in self.sides]
+        merged = heapq.merge(
+            *sides,
+            key=lambda conversation: (conversation.last_activity, conversation.id),
+            reverse=True
+        )
+        return list(islice(merged, index.start, index.stop))
+    
+    def __iter__(self):
+        return iter(self[:])
+
+
+def thread_page_size(limit=None):
+    """Taille de page demandée, bornée par CHAT_THREAD_MAX_PAGE_SIZE"""
+    return page_size(
+        limit,
+        getattr(settings, 'CHAT_THREAD_PAGE_SIZE', 50),
+        getattr(settings, 'CHAT_THREAD_MAX_PAGE_SIZE', 200)
+    )
+
+
+def thread_page(conversation_id, before=None, limit=None):
+    """
+    Page de l'historique d'un fil (messages sérialisés), du plus récent au plus ancien,
+    strictement avant le curseur before (si fourni). Les messages archivés sont relus
+    de façon transparente. Retourne (messages, curseur de la page suivante ou None).
+    """
+    return keyset_page(
+        ChatMessage.objects.filter(conversation_id=conversation_id).only(*THREAD_MESSAGE_FIELDS),
+        ChatThreadMessageSerializer,
+        thread_page_size(limit),
+        before=before,
+        archive=(MESSAGES_ARCHIVE, conversation_id)
+    )
+
+
+def mark_thread_read(conversation, reader_id, up_to_created_at, up_to_id=None):
+    """
+    Marquer comme lus, en un seul UPDATE, les messages reçus par reader_id dans le fil
+    jusqu'au message (up_to_created_at, up_to_id) inclus, ou jusqu'à la date
+    up_to_created_at si aucun identifiant n'est fourni. Le compteur de non lus de la
+    conversation est décrémenté dans la même transaction. Retourne le nombre de messages marqués.
+    """
+    if up_to_id is None:
+        position = Q(created_at__lte=up_to_created_at)
+    else:
+        position = Q(created_at__lt=up_to_created_at) | Q(created_at=up_to_created_at, id__lte=up_to_id)
+
+    sender_id = conversation.other_user_id(reader_id)
+    with transaction.atomic():
+        marked = (
+            ChatMessage.objects
+            .filter(conversation=conversation, recipient_id=reader_id, is_read=False)
+            .filter(position)
+            .update(is_read=True, read_at=timezone.now())
+        )
+        Conversation.record_read(reader_id, sender_id, marked)
+    return marked
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:58
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_chatmessage_notification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="grade",
+            name="score_percentage",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(
+                        max_grade__gt=0,
+                        then=models.ExpressionWrapper(
+                            django.db.models.expressions.CombinedExpression(
+                                django.db.models.expressions.CombinedExpression(
+                                    models.F("grade"), "*", models.Value(100.0)
+                                ),
+                                "/",
+                                models.F("max_grade"),
+                            ),
+                            output_field=models.DecimalField(
+                                decimal_places=2, max_digits=7
+                            ),
+                        ),
+                    ),
+                    default=models.Value(0),
+                    output_field=models.DecimalField(decimal_places=2, max_digits=7),
+                ),
+                help_text="Note en pourcentage, calculée et stockée par la base de données",
+                output_field=models.DecimalField(decimal_places=2, max_digits=7),
+                verbose_name="Pourcentage",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="grade",
+            index=models.Index(
+                fields=["module", "score_percentage"],
+                name="api_grade_module__6f8a3e_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_grade_score_percentage"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="enrollment",
+            name="grade",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                help_text="Note finale (sur 20), recalculée automatiquement à partir des notes du module",
+                max_digits=5,
+                null=True,
+                verbose_name="Note",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_enrollment_final_grade"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="announcement",
+            index=models.Index(
+                condition=models.Q(("expiry_date__isnull", False), ("is_active", True)),
+                fields=["expiry_date"],
+                name="api_announcement_expiry_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_announcement_expiry_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="announcement",
+            name="publish_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Date de mise en ligne (optionnel) ; l'annonce reste inactive jusque-là",
+                null=True,
+                verbose_name="Publication programmée",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="announcement",
+            index=models.Index(
+                condition=models.Q(("publish_at__isnull", False)),
+                fields=["publish_at"],
+                name="api_announcement_publish_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_enrollment_ordinals(apps, schema_editor):
+    """Numéroter les inscriptions existantes de chaque module par ordre de création"""
+    Enrollment = apps.get_model("api", "Enrollment")
+    counters = {}
+    batch = []
+    for enrollment in Enrollment.objects.order_by("module_id", "id").only(
+        "id", "module_id"
+    ):
+        counters[enrollment.module_id] = counters.get(enrollment.module_id, 0) + 1
+        enrollment.ordinal = counters[enrollment.module_id]
+        batch.append(enrollment)
+    Enrollment.objects.bulk_update(batch, ["ordinal"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_announcement_publish_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnnouncementReadState",
+            fields=[
+                (
+                    "announcement",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="read_state",
+                        serialize=False,
+                        to="api.announcement",
+                        verbose_name="Annonce",
+                    ),
+                ),
+                (
+                    "read_bitmap",
+                    models.BinaryField(default=b"", verbose_name="Bitmap de lecture"),
+                ),
+                (
+                    "read_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de lectures"
+                    ),
+                ),
+                (
+                    "audience_size",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Nombre de destinataires, enregistré lors de la diffusion",
+                        null=True,
+                        verbose_name="Taille du public",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Date de modification"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Suivi de lecture",
+                "verbose_name_plural": "Suivis de lecture",
+            },
+        ),
+        migrations.AddField(
+            model_name="enrollment",
+            name="ordinal",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                help_text="Numéro dense de l'étudiant dans le module (index des bitmaps de lecture)",
+                null=True,
+                verbose_name="Numéro d'ordre",
+            ),
+        ),
+        migrations.RunPython(assign_enrollment_ordinals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="enrollment",
+            constraint=models.UniqueConstraint(
+                fields=("module", "ordinal"), name="unique_enrollment_ordinal"
+            ),
+        ),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    """Créer une conversation par paire d'utilisateurs ayant déjà échangé des messages"""
+    ChatMessage = apps.get_model("api", "ChatMessage")
+    Conversation = apps.get_model("api", "Conversation")
+
+    conversations = {}
+    messages = ChatMessage.objects.order_by("created_at", "id").values_list(
+        "id", "sender_id", "recipient_id", "is_read", "created_at"
+    )
+    for message_id, sender_id, recipient_id, is_read, created_at in messages.iterator():
+        pair = (min(sender_id, recipient_id), max(sender_id, recipient_id))
+        conversation = conversations.setdefault(
+            pair,
+            Conversation(
+                user_low_id=pair[0],
+                user_high_id=pair[1],
+                unread_low=0,
+                unread_high=0,
+            ),
+        )
+        conversation.last_message_id = message_id
+        conversation.last_activity = created_at
+        if not is_read:
+            if recipient_id == pair[0]:
+                conversation.unread_low += 1
+            else:
+                conversation.unread_high += 1
+
+    Conversation.objects.bulk_create(conversations.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_announcement_read_state"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Conversation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_activity",
+                    models.DateTimeField(verbose_name="Dernière activité"),
+                ),
+                (
+                    "unread_low",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Non lus (participant 1)"
+                    ),
+                ),
+                (
+                    "unread_high",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Non lus (participant 2)"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de création"
+                    ),
+                ),
+                (
+                    "last_message",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="api.chatmessage",
+                        verbose_name="Dernier message",
+                    ),
+                ),
+                (
+                    "user_high",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="conversations_as_high",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Participant 2",
+                    ),
+                ),
+                (
+                    "user_low",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="conversations_as_low",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Participant 1",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Conversation",
+                "verbose_name_plural": "Conversations",
+                "ordering": ["-last_activity"],
+                "indexes": [
+                    models.Index(
+                        fields=["user_low", "-last_activity"],
+                        name="api_convers_user_lo_20edbc_idx",
+                    ),
+                    models.Index(
+                        fields=["user_high", "-last_activity"],
+                        name="api_convers_user_hi_e433f4_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user_low", "user_high"),
+                        name="unique_conversation_pair",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def assign_conversations(apps, schema_editor):
+    """Rattacher les messages existants à la conversation de leurs participants"""
+    ChatMessage = apps.get_model("api", "ChatMessage")
+    Conversation = apps.get_model("api", "Conversation")
+
+    for conversation in Conversation.objects.iterator():
+        ChatMessage.objects.filter(
+            Q(
+                sender_id=conversation.user_low_id,
+                recipient_id=conversation.user_high_id,
+            )
+            | Q(
+                sender_id=conversation.user_high_id,
+                recipient_id=conversation.user_low_id,
+            )
+        ).update(conversation=conversation)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_conversation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="conversation",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Fil de discussion (renseigné automatiquement à partir des participants)",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="messages",
+                to="api.conversation",
+                verbose_name="Conversation",
+            ),
+        ),
+        migrations.RunPython(assign_conversations, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["conversation", "created_at", "id"],
+                name="api_chatmessage_thread_idx",
+            ),
+        ),
+    ]
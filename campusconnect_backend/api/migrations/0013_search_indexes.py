@@ -0,0 +1,135 @@
+from django.db import migrations
+
+# Index plein texte selon le moteur : tables virtuelles FTS5 (contenu externe,
+# synchronisées par triggers) sous SQLite, index GIN sur to_tsvector sous PostgreSQL.
+# Les autres moteurs se rabattent sur une recherche icontains (voir api/search.py).
+# Attention : sous SQLite, une migration qui reconstruit api_chatmessage ou
+# api_announcement (changement de type, champ NOT NULL, ...) supprime les triggers ;
+# elle doit les recréer puis relancer le 'rebuild' de la table FTS correspondante.
+
+SQLITE_FORWARD = [
+    # Messages de chat
+    """
+    CREATE VIRTUAL TABLE api_chatmessage_fts USING fts5(
+        message,
+        content='api_chatmessage',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER api_chatmessage_fts_insert AFTER INSERT ON api_chatmessage BEGIN
+        INSERT INTO api_chatmessage_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER api_chatmessage_fts_delete AFTER DELETE ON api_chatmessage BEGIN
+        INSERT INTO api_chatmessage_fts(api_chatmessage_fts, rowid, message)
+        VALUES ('delete', old.id, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER api_chatmessage_fts_update AFTER UPDATE OF message ON api_chatmessage BEGIN
+        INSERT INTO api_chatmessage_fts(api_chatmessage_fts, rowid, message)
+        VALUES ('delete', old.id, old.message);
+        INSERT INTO api_chatmessage_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    "INSERT INTO api_chatmessage_fts(api_chatmessage_fts) VALUES ('rebuild')",
+    # Annonces
+    """
+    CREATE VIRTUAL TABLE api_announcement_fts USING fts5(
+        title,
+        content,
+        content='api_announcement',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER api_announcement_fts_insert AFTER INSERT ON api_announcement BEGIN
+        INSERT INTO api_announcement_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER api_announcement_fts_delete AFTER DELETE ON api_announcement BEGIN
+        INSERT INTO api_announcement_fts(api_announcement_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER api_announcement_fts_update AFTER UPDATE OF title, content ON api_announcement BEGIN
+        INSERT INTO api_announcement_fts(api_announcement_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO api_announcement_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO api_announcement_fts(api_announcement_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_chatmessage_fts_insert",
+    "DROP TRIGGER IF EXISTS api_chatmessage_fts_delete",
+    "DROP TRIGGER IF EXISTS api_chatmessage_fts_update",
+    "DROP TABLE IF EXISTS api_chatmessage_fts",
+    "DROP TRIGGER IF EXISTS api_announcement_fts_insert",
+    "DROP TRIGGER IF EXISTS api_announcement_fts_delete",
+    "DROP TRIGGER IF EXISTS api_announcement_fts_update",
+    "DROP TABLE IF EXISTS api_announcement_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS api_chatmessage_search_idx ON api_chatmessage
+    USING GIN (to_tsvector('french', message))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS api_announcement_search_idx ON api_announcement
+    USING GIN (to_tsvector('french', title || ' ' || content))
+    """,
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS api_chatmessage_search_idx",
+    "DROP INDEX IF EXISTS api_announcement_search_idx",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return "ENABLE_FTS5" in {row[0] for row in cursor.fetchall()}
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite" and _sqlite_has_fts5(schema_editor.connection):
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRESQL_FORWARD)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_BACKWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRESQL_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_chatmessage_conversation"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
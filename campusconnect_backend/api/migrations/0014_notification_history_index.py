@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "created_at", "id"],
+                name="api_notification_history_idx",
+            ),
+        ),
+    ]
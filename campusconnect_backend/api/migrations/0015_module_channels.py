@@ -0,0 +1,168 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_notification_history_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ModuleChannel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_seq",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Dernier numéro de séquence"
+                    ),
+                ),
+                (
+                    "last_message_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Date du dernier message"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de création"
+                    ),
+                ),
+                (
+                    "module",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="channel",
+                        to="api.module",
+                        verbose_name="Module",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Salon de module",
+                "verbose_name_plural": "Salons de module",
+            },
+        ),
+        migrations.CreateModel(
+            name="ChannelMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "seq",
+                    models.PositiveBigIntegerField(verbose_name="Numéro de séquence"),
+                ),
+                ("message", models.TextField(verbose_name="Message")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date d'envoi"
+                    ),
+                ),
+                (
+                    "sender",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="channel_messages",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Expéditeur",
+                    ),
+                ),
+                (
+                    "channel",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="messages",
+                        to="api.modulechannel",
+                        verbose_name="Salon",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Message de salon",
+                "verbose_name_plural": "Messages de salon",
+                "ordering": ["channel", "-seq"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("channel", "seq"), name="unique_channel_message_seq"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ChannelMembership",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_read_seq",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="Numéro de séquence du dernier message lu",
+                        verbose_name="Dernier message lu",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Date de modification"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="channel_memberships",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Membre",
+                    ),
+                ),
+                (
+                    "channel",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memberships",
+                        to="api.modulechannel",
+                        verbose_name="Salon",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Position de lecture",
+                "verbose_name_plural": "Positions de lecture",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("channel", "user"), name="unique_channel_membership"
+                    )
+                ],
+            },
+        ),
+    ]
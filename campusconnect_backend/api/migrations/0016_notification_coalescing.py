@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_module_channels"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="count",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Nombre de messages regroupés dans la notification",
+                verbose_name="Nombre d'événements",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="related_user",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Expéditeur des messages pour une notification de message",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Utilisateur concerné",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("is_read", False), ("notification_type", "message")
+                ),
+                fields=("recipient", "related_user"),
+                name="unique_unread_message_notification",
+            ),
+        ),
+    ]
@@ -0,0 +1,128 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_notification_purge_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Task",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Chemin pointé de la fonction à exécuter (ex: api.notifications.fan_out_announcement)",
+                        max_length=255,
+                        verbose_name="Fonction",
+                    ),
+                ),
+                (
+                    "args",
+                    models.JSONField(
+                        blank=True, default=list, verbose_name="Arguments positionnels"
+                    ),
+                ),
+                (
+                    "kwargs",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Arguments nommés"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("running", "En cours"),
+                            ("succeeded", "Terminée"),
+                            ("failed", "En échec"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Tentatives"),
+                ),
+                (
+                    "max_attempts",
+                    models.PositiveIntegerField(
+                        default=5, verbose_name="Tentatives maximum"
+                    ),
+                ),
+                (
+                    "run_at",
+                    models.DateTimeField(
+                        help_text="Date à partir de laquelle la tâche peut être exécutée (reportée après un échec)",
+                        verbose_name="Exécution prévue",
+                    ),
+                ),
+                (
+                    "locked_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Prise en charge le"
+                    ),
+                ),
+                (
+                    "locked_by",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Prise en charge par"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="Dernière erreur"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Date de fin"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de création"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Date de modification"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tâche",
+                "verbose_name_plural": "Tâches",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["run_at", "id"],
+                        name="api_task_pending_idx",
+                    ),
+                    models.Index(
+                        fields=["status", "locked_at"],
+                        name="api_task_status_7d8408_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_task_queue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coursesession",
+            name="reminder_sent_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="Date d'envoi des rappels aux étudiants inscrits",
+                null=True,
+                verbose_name="Date du rappel",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="related_session",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="notifications",
+                to="api.coursesession",
+                verbose_name="Session concernée",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("notification_type", "session")),
+                fields=("recipient", "related_session"),
+                name="unique_session_reminder",
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_session_reminders"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationPreference",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="notification_preference",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Utilisateur",
+                    ),
+                ),
+                (
+                    "muted_types",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Masque de bits des types de notification masqués",
+                        verbose_name="Types masqués",
+                    ),
+                ),
+                (
+                    "muted_modules",
+                    models.BinaryField(
+                        default=b"",
+                        help_text="Bitmap des identifiants de modules masqués",
+                        verbose_name="Modules masqués",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Date de modification"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Préférences de notification",
+                "verbose_name_plural": "Préférences de notification",
+            },
+        ),
+    ]
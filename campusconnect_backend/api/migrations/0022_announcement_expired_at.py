@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_notification_preferences"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="announcement",
+            name="expired_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Renseignée quand l'annonce est désactivée par expiration (vide si désactivée manuellement)",
+                null=True,
+                verbose_name="Date d'expiration effective",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0022_announcement_expired_at"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="conversation",
+            name="api_convers_user_lo_20edbc_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="conversation",
+            name="api_convers_user_hi_e433f4_idx",
+        ),
+        migrations.AddIndex(
+            model_name="conversation",
+            index=models.Index(
+                fields=["user_low", "-last_activity", "-id"],
+                name="api_conv_low_activity_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="conversation",
+            index=models.Index(
+                fields=["user_high", "-last_activity", "-id"],
+                name="api_conv_high_activity_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_unread_counters(apps, schema_editor):
+    """Compteurs initiaux de tous les utilisateurs, calculés en base"""
+    User = apps.get_model("api", "User")
+    Notification = apps.get_model("api", "Notification")
+    ChatMessage = apps.get_model("api", "ChatMessage")
+    UnreadCounter = apps.get_model("api", "UnreadCounter")
+
+    def unread_by_recipient(model):
+        return dict(
+            model.objects.filter(is_read=False)
+            .values("recipient_id")
+            .annotate(unread=Count("id"))
+            .values_list("recipient_id", "unread")
+        )
+
+    notifications = unread_by_recipient(Notification)
+    messages = unread_by_recipient(ChatMessage)
+    UnreadCounter.objects.bulk_create(
+        (
+            UnreadCounter(
+                user_id=user_id,
+                notifications=notifications.get(user_id, 0),
+                messages=messages.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list("pk", flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_conversation_inbox_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnreadCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="unread_counter",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Utilisateur",
+                    ),
+                ),
+                (
+                    "notifications",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Notifications non lues"
+                    ),
+                ),
+                (
+                    "messages",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Messages non lus"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Compteurs de non lus",
+                "verbose_name_plural": "Compteurs de non lus",
+            },
+        ),
+        migrations.RunPython(populate_unread_counters, migrations.RunPython.noop),
+    ]
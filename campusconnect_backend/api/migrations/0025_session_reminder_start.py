@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:15
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_session_start(apps, schema_editor):
+    """Horaire des sessions pour les rappels existants"""
+    Notification = apps.get_model("api", "Notification")
+    reminders = Notification.objects.filter(
+        notification_type="session", related_session__isnull=False
+    ).values_list("pk", "related_session__date", "related_session__start_time")
+    for pk, date, start_time in reminders.iterator():
+        Notification.objects.filter(pk=pk).update(
+            session_start=timezone.make_aware(datetime.combine(date, start_time))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0024_unread_counters"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="notification",
+            name="unique_session_reminder",
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="session_start",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Horaire de la session au moment du rappel (un rappel par horaire)",
+                null=True,
+                verbose_name="Début de la session rappelée",
+            ),
+        ),
+        migrations.RunPython(populate_session_start, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("notification_type", "session")),
+                fields=("recipient", "related_session", "session_start"),
+                name="unique_session_reminder",
+            ),
+        ),
+    ]
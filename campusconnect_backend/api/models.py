@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import NullIf, Round
 
 
 class User(AbstractUser):
@@ -208,6 +211,45 @@ class Module(models.Model):
         return self.enrolled_students_count >= self.max_students
 
 
+class EnrollmentQuerySet(models.QuerySet):
+    """
+    QuerySet des inscriptions
+    """
+    def refresh_final_grades(self):
+        """
+        Recalculer la note finale (sur 20) de chaque inscription à partir de ses notes,
+        pondérées par type selon settings.GRADE_TYPE_WEIGHTS.
+        Un seul UPDATE avec sous-requête corrélée, quel que soit le nombre d'inscriptions.
+        Les classements en cache des modules concernés sont invalidés.
+        """
+        from .grading import invalidate_module_rankings
+        
+        weights = getattr(settings, 'GRADE_TYPE_WEIGHTS', {})
+        weight = Case(
+            *[When(grade_type=grade_type, then=Value(w)) for grade_type, w in weights.items()],
+            default=Value(1),
+            output_field=DecimalField(max_digits=7, decimal_places=2)
+        )
+        final_grade = (
+            Grade.objects
+            .filter(student=OuterRef('student'), module=OuterRef('module'))
+            .order_by()
+            .values('student')
+            .annotate(
+                final=Round(
+                    Sum(F('score_percentage') * weight) * 20.0 / (NullIf(Sum(weight), 0) * 100.0),
+                    2,
+                    output_field=DecimalField(max_digits=5, decimal_places=2)
+                )
+            )
+            .values('final')
+        )
+        module_ids = set(self.order_by().values_list('module_id', flat=True).distinct())
+        updated = self.update(grade=Subquery(final_grade))
+        invalidate_module_rankings(module_ids)
+        return updated
+
+
 class Enrollment(models.Model):
     """
     Modèle représentant l'inscription d'un étudiant à un module
@@ -240,7 +282,7 @@ class Enrollment(models.Model):
         blank=True,
         null=True,
         verbose_name='Note',
-        help_text='Note obtenue (sur 20)'
+        help_text='Note finale (sur 20), recalculée automatiquement à partir des notes du module'
     )
     notes = models.TextField(
         blank=True,
@@ -248,9 +290,18 @@ class Enrollment(models.Model):
         verbose_name='Notes',
         help_text='Notes additionnelles sur l\'inscription'
     )
+    ordinal = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='Numéro d\'ordre',
+        help_text='Numéro dense de l\'étudiant dans le module (index des bitmaps de lecture)'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
     
+    objects = EnrollmentQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Inscription'
         verbose_name_plural = 'Inscriptions'
@@ -261,6 +312,9 @@ class Enrollment(models.Model):
             models.Index(fields=['is_active']),
             models.Index(fields=['enrollment_date']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['module', 'ordinal'], name='unique_enrollment_ordinal'),
+        ]
     
     def __str__(self):
         status = "active" if self.is_active else "inactive"
@@ -270,7 +324,24 @@ class Enrollment(models.Model):
         # Vérifier que l'utilisateur est bien un étudiant
         if self.student.role != 'student':
             raise ValueError("Seuls les étudiants peuvent s'inscrire à un module")
-        super().save(*args, **kwargs)
+        if self.ordinal is None:
+            self._save_with_ordinal(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+    
+    def _save_with_ordinal(self, *args, **kwargs):
+        """
+        Attribuer le prochain numéro d'ordre du module (verrou sur la ligne du module
+        pour sérialiser les inscriptions concurrentes)
+        """
+        from django.db import transaction
+        from django.db.models import Max
+        
+        with transaction.atomic():
+            list(Module.objects.select_for_update().filter(pk=self.module_id).values_list('pk'))
+            last = Enrollment.objects.filter(module_id=self.module_id).aggregate(last=Max('ordinal'))['last']
+            self.ordinal = (last or 0) + 1
+            super().save(*args, **kwargs)
 
 
 class CourseSession(models.Model):
@@ -339,6 +410,13 @@ class CourseSession(models.Model):
         verbose_name='Description',
         help_text='Description ou notes sur la session'
     )
+    reminder_sent_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='Date du rappel',
+        help_text='Date d\'envoi des rappels aux étudiants inscrits'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
     
@@ -362,6 +440,32 @@ class CourseSession(models.Model):
         from django.core.exceptions import ValidationError
         if self.start_time and self.end_time and self.end_time <= self.start_time:
             raise ValidationError("L'heure de fin doit être après l'heure de début")
+    
+    @property
+    def starts_at(self):
+        """Début de la session (date et heure locales, avec fuseau)"""
+        from datetime import datetime
+        from django.utils import timezone
+        return timezone.make_aware(datetime.combine(self.date, self.start_time))
+    
+    def save(self, *args, **kwargs):
+        # La réservation du rappel est gérée par send_session_reminders : relue en base
+        # (une instance chargée avant l'envoi ne l'efface pas), remise à zéro si la
+        # session est déplacée pour que le rappel soit renvoyé au nouvel horaire
+        if self.pk is not None:
+            previous = (
+                CourseSession.objects
+                .filter(pk=self.pk)
+                .values_list('date', 'start_time', 'reminder_sent_at')
+                .first()
+            )
+            if previous:
+                moved = previous[:2] != (self.date, self.start_time)
+                self.reminder_sent_at = None if moved else previous[2]
+                update_fields = kwargs.get('update_fields')
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'reminder_sent_at'}
+        super().save(*args, **kwargs)
 
 
 class CourseResource(models.Model):
@@ -475,10 +579,59 @@ class CourseResource(models.Model):
         return f"{size:.2f} TB"
 
 
+class GradeQuerySet(models.QuerySet):
+    """
+    QuerySet des notes avec les annotations calculées par la base de données
+    """
+    def with_letter_grade(self):
+        """Annoter chaque note avec sa lettre (A, B, C, D, F) calculée en SQL"""
+        return self.annotate(
+            letter=Case(
+                *[
+                    When(score_percentage__gte=threshold, then=Value(letter))
+                    for letter, threshold in Grade.LETTER_GRADE_THRESHOLDS
+                ],
+                default=Value(Grade.FAILING_LETTER),
+                output_field=models.CharField(max_length=1),
+            )
+        )
+    
+    def with_letter(self, letter):
+        """
+        Filtrer sur une lettre en la traduisant en intervalle de pourcentage,
+        ce qui permet d'utiliser l'index sur score_percentage
+        """
+        letter = letter.upper()
+        bounds = dict(Grade.LETTER_GRADE_THRESHOLDS)
+        if letter == Grade.FAILING_LETTER:
+            return self.filter(score_percentage__lt=Grade.LETTER_GRADE_THRESHOLDS[-1][1])
+        if letter not in bounds:
+            return self.none()
+        queryset = self.filter(score_percentage__gte=bounds[letter])
+        letters = [item[0] for item in Grade.LETTER_GRADE_THRESHOLDS]
+        index = letters.index(letter)
+        if index > 0:
+            queryset = queryset.filter(score_percentage__lt=bounds[letters[index - 1]])
+        return queryset
+    
+    def failing(self):
+        """Notes en échec (lettre F)"""
+        return self.with_letter(Grade.FAILING_LETTER)
+
+
 class Grade(models.Model):
     """
     Modèle représentant une note attribuée à un étudiant pour un module
     """
+    # Seuils (en pourcentage) des lettres, du plus haut au plus bas
+    LETTER_GRADE_THRESHOLDS = [
+        ('A', 90),
+        ('B', 80),
+        ('C', 70),
+        ('D', 60),
+    ]
+    FAILING_LETTER = 'F'
+    
     GRADE_TYPE_CHOICES = [
         ('exam', 'Examen'),
         ('assignment', 'Devoir'),
@@ -536,6 +689,23 @@ class Grade(models.Model):
         limit_choices_to={'role__in': ['teacher', 'admin']},
         verbose_name='Noté par'
     )
+    score_percentage = models.GeneratedField(
+        expression=Case(
+            When(
+                max_grade__gt=0,
+                then=ExpressionWrapper(
+                    F('grade') * 100.0 / F('max_grade'),
+                    output_field=DecimalField(max_digits=7, decimal_places=2)
+                )
+            ),
+            default=Value(0),
+            output_field=DecimalField(max_digits=7, decimal_places=2)
+        ),
+        output_field=DecimalField(max_digits=7, decimal_places=2),
+        db_persist=True,
+        verbose_name='Pourcentage',
+        help_text='Note en pourcentage, calculée et stockée par la base de données'
+    )
     graded_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Date de notation'
@@ -543,6 +713,8 @@ class Grade(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
     
+    objects = GradeQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Note'
         verbose_name_plural = 'Notes'
@@ -551,6 +723,7 @@ class Grade(models.Model):
             models.Index(fields=['student', 'module']),
             models.Index(fields=['module', 'grade_type']),
             models.Index(fields=['graded_date']),
+            models.Index(fields=['module', 'score_percentage']),
         ]
     
     def __str__(self):
@@ -567,16 +740,109 @@ class Grade(models.Model):
     def letter_grade(self):
         """Retourne la note en lettre (A, B, C, D, F)"""
         percentage = self.percentage
-        if percentage >= 90:
-            return 'A'
-        elif percentage >= 80:
-            return 'B'
-        elif percentage >= 70:
-            return 'C'
-        elif percentage >= 60:
-            return 'D'
-        else:
-            return 'F'
+        for letter, threshold in self.LETTER_GRADE_THRESHOLDS:
+            if percentage >= threshold:
+                return letter
+        return self.FAILING_LETTER
+
+
+class AnnouncementQuerySet(models.QuerySet):
+    """
+    QuerySet des annonces
+    """
+    def visible_to(self, user):
+        """
+        Annonces visibles par un utilisateur selon son rôle :
+        étudiant -> annonces actives de ses modules et annonces générales,
+        enseignant -> annonces de ses modules, admin -> toutes
+        """
+        if user.role == 'student':
+            enrolled_modules = Module.objects.filter(
+                enrollments__student=user,
+                enrollments__is_active=True
+            )
+            # Les annonces expirées sont désactivées par la commande expire_announcements
+            return self.filter(
+                Q(module__in=enrolled_modules) | Q(module__isnull=True),
+                is_active=True
+            )
+        if user.role == 'teacher':
+            return self.filter(module__teacher=user)
+        if user.role == 'admin':
+            return self.all()
+        return self.none()
+    
+    def expire_due(self, batch_size=500):
+        """
+        Désactiver par lots les annonces actives dont la date d'expiration est passée,
+        en renseignant expired_at pour les distinguer d'une désactivation manuelle.
+        Chaque lot est un UPDATE sur une liste d'identifiants (index partiel sur expiry_date).
+        Retourne le nombre d'annonces désactivées.
+        """
+        from django.utils import timezone
+        from .feeds import feed_scope, invalidate_feeds
+        
+        now = timezone.now()
+        due = self.filter(is_active=True, expiry_date__lte=now).order_by('expiry_date', 'pk')
+        expired = 0
+        while True:
+            rows = list(due.values_list('pk', 'module_id')[:batch_size])
+            if not rows:
+                return expired
+            expired += Announcement.objects.filter(
+                pk__in=[pk for pk, _ in rows],
+                is_active=True
+            ).update(is_active=False, expired_at=now, updated_at=now)
+            # update() ne déclenche pas les signaux : invalider les fils concernés
+            invalidate_feeds([feed_scope(module_id) for _, module_id in rows])
+    
+    def publish_due(self, batch_size=500):
+        """
+        Publier par lots les annonces programmées dont la date publish_at est atteinte.
+        Chaque lot est une transaction :
+        - réservation des lignes : SELECT ... FOR UPDATE SKIP LOCKED si la base le permet,
+          sinon mise à jour conditionnelle (compare-and-set) annonce par annonce ; seules
+          les annonces effectivement basculées par cette exécution sont traitées, deux
+          exécutions simultanées ne publient donc jamais la même annonce ;
+        - activation (date de publication fixée à maintenant) ;
+        - reconstruction (pré-chauffage) des fils concernés avant le commit, pour que le pic
+          de lecture trouve un cache chaud dès la mise en ligne (avec le cache en base,
+          l'écriture du cache fait partie de la même transaction) ;
+        - mise en file (api.tasks.enqueue) de la diffusion des notifications : la tâche est
+          validée avec la publication et survit à un arrêt du processus.
+        Retourne la liste des identifiants publiés.
+        """
+        from django.db import connection, transaction
+        from django.utils import timezone
+        from .feeds import feed_scope, warm_feeds
+        from .notifications import fan_out_announcement
+        from .tasks import enqueue
+        
+        now = timezone.now()
+        due = self.filter(publish_at__lte=now).order_by('publish_at', 'pk')
+        release = {'is_active': True, 'publish_at': None, 'published_date': now, 'updated_at': now}
+        published = []
+        while True:
+            with transaction.atomic():
+                if connection.features.has_select_for_update_skip_locked:
+                    rows = list(due.select_for_update(skip_locked=True).values_list('pk', 'module_id')[:batch_size])
+                    if not rows:
+                        return published
+                    Announcement.objects.filter(pk__in=[pk for pk, _ in rows]).update(**release)
+                else:
+                    candidates = list(due.values_list('pk', 'module_id')[:batch_size])
+                    if not candidates:
+                        return published
+                    rows = [
+                        (pk, module_id)
+                        for pk, module_id in candidates
+                        if Announcement.objects.filter(pk=pk, publish_at__isnull=False).update(**release)
+                    ]
+                
+                warm_feeds(feed_scope(module_id) for _, module_id in rows)
+                for pk, _ in rows:
+                    enqueue(fan_out_announcement, pk)
+            published.extend(pk for pk, _ in rows)
 
 
 class Announcement(models.Model):
@@ -647,9 +913,23 @@ class Announcement(models.Model):
         verbose_name='Date d\'expiration',
         help_text='Date après laquelle l\'annonce ne sera plus visible'
     )
+    expired_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Date d\'expiration effective',
+        help_text='Renseignée quand l\'annonce est désactivée par expiration (vide si désactivée manuellement)'
+    )
+    publish_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Publication programmée',
+        help_text='Date de mise en ligne (optionnel) ; l\'annonce reste inactive jusque-là'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
     
+    objects = AnnouncementQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Annonce'
         verbose_name_plural = 'Annonces'
@@ -659,6 +939,18 @@ class Announcement(models.Model):
             models.Index(fields=['module', 'is_active']),
             models.Index(fields=['is_pinned', 'published_date']),
             models.Index(fields=['is_active', 'published_date']),
+            # Annonces encore actives à expirer (balayage périodique)
+            models.Index(
+                fields=['expiry_date'],
+                condition=Q(is_active=True, expiry_date__isnull=False),
+                name='api_announcement_expiry_idx'
+            ),
+            # File des annonces programmées
+            models.Index(
+                fields=['publish_at'],
+                condition=Q(publish_at__isnull=False),
+                name='api_announcement_publish_idx'
+            ),
         ]
     
     def __str__(self):
@@ -667,16 +959,122 @@ class Announcement(models.Model):
     
     @property
     def is_expired(self):
-        """Vérifie si l'annonce a expiré"""
-        if self.expiry_date:
-            from django.utils import timezone
-            return timezone.now() > self.expiry_date
-        return False
+        """Vérifie si l'annonce a été désactivée par expiration (voir expire_due)"""
+        return self.expired_at is not None
     
     @property
     def is_visible(self):
-        """Vérifie si l'annonce est visible (active et non expirée)"""
+        """Vérifie si l'annonce est visible (active, donc pas encore expirée)"""
         return self.is_active and not self.is_expired
+    
+    def audience(self):
+        """
+        Public de l'annonce (destinataires des notifications et lecteurs comptés) :
+        - annonce de module : étudiants inscrits (inscription active)
+        - annonce générale : tous les utilisateurs actifs
+        filtrés par public cible (target_audience) s'il est renseigné, hors auteur
+        """
+        audience = User.objects.filter(is_active=True).exclude(pk=self.author_id)
+        if self.module_id:
+            audience = audience.filter(
+                enrollments__module_id=self.module_id,
+                enrollments__is_active=True
+            )
+        if self.target_audience:
+            audience = audience.filter(role=self.target_audience)
+        return audience
+
+
+class AnnouncementReadState(models.Model):
+    """
+    Accusés de lecture d'une annonce, stockés sous forme de bitmap :
+    - annonce de module : bit = numéro d'ordre de l'inscription (Enrollment.ordinal)
+    - annonce générale : bit = identifiant de l'utilisateur
+    """
+    announcement = models.OneToOneField(
+        Announcement,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='read_state',
+        verbose_name='Annonce'
+    )
+    read_bitmap = models.BinaryField(
+        default=b'',
+        verbose_name='Bitmap de lecture'
+    )
+    read_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de lectures'
+    )
+    audience_size = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Taille du public',
+        help_text='Nombre de destinataires, enregistré lors de la diffusion'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
+    
+    class Meta:
+        verbose_name = 'Suivi de lecture'
+        verbose_name_plural = 'Suivis de lecture'
+    
+    def __str__(self):
+        return f"{self.announcement.title} : {self.read_count} lecture(s)"
+    
+    @property
+    def read_percentage(self):
+        """
+        Pourcentage du public ayant lu l'annonce. Les lecteurs sortis du public depuis
+        leur lecture (désinscription, compte désactivé) restent comptés : plafonné à 100.
+        """
+        if not self.audience_size:
+            return None
+        return min(round(self.read_count * 100 / self.audience_size, 1), 100.0)
+    
+    @staticmethod
+    def reader_index(announcement, user_id):
+        """
+        Position du lecteur dans le bitmap (None s'il ne fait pas partie du public de l'annonce,
+        voir Announcement.audience : auteur, hors public cible, inscription inactive...)
+        """
+        reader = announcement.audience().filter(pk=user_id)
+        if announcement.module_id is None:
+            return user_id if reader.exists() else None
+        # Même jointure que le filtre d'inscription : ordinal de l'inscription au module
+        return reader.values_list('enrollments__ordinal', flat=True).first()
+    
+    @classmethod
+    def mark_read(cls, announcement, user_id):
+        """
+        Enregistrer la lecture d'une annonce par un utilisateur.
+        Retourne True si la lecture est nouvelle.
+        """
+        from django.db import transaction
+        from .bitmaps import set_bit, test_bit
+        
+        index = cls.reader_index(announcement, user_id)
+        if index is None:
+            return False
+        
+        with transaction.atomic():
+            cls.objects.get_or_create(announcement=announcement)
+            state = cls.objects.select_for_update().get(pk=announcement.pk)
+            bitmap = bytes(state.read_bitmap)
+            if test_bit(bitmap, index):
+                return False
+            state.read_bitmap = set_bit(bitmap, index)
+            state.read_count += 1
+            state.save(update_fields=['read_bitmap', 'read_count', 'updated_at'])
+        return True
+    
+    @classmethod
+    def has_read(cls, announcement, user_id):
+        """Vérifier si un utilisateur a lu l'annonce"""
+        from .bitmaps import test_bit
+        
+        index = cls.reader_index(announcement, user_id)
+        bitmap = cls.objects.filter(pk=announcement.pk).values_list('read_bitmap', flat=True).first()
+        return index is not None and bitmap is not None and test_bit(bytes(bitmap), index)
 
 
 class ChatMessage(models.Model):
@@ -695,6 +1093,16 @@ class ChatMessage(models.Model):
         related_name='received_messages',
         verbose_name='Destinataire'
     )
+    conversation = models.ForeignKey(
+        'Conversation',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='messages',
+        verbose_name='Conversation',
+        help_text='Fil de discussion (renseigné automatiquement à partir des participants)'
+    )
     message = models.TextField(
         verbose_name='Message'
     )
@@ -720,18 +1128,341 @@ class ChatMessage(models.Model):
             models.Index(fields=['sender', 'recipient']),
             models.Index(fields=['recipient', 'is_read']),
             models.Index(fields=['created_at']),
+            # Historique d'un fil paginé par (created_at, id)
+            models.Index(fields=['conversation', 'created_at', 'id'], name='api_chatmessage_thread_idx'),
         ]
     
     def __str__(self):
         return f"{self.sender.username} -> {self.recipient.username}: {self.message[:50]}"
     
+    def save(self, *args, **kwargs):
+        """Rattacher le message à la conversation de ses deux participants"""
+        if self.conversation_id is None:
+            self.conversation = Conversation.get_or_create_for_users(self.sender_id, self.recipient_id)
+        super().save(*args, **kwargs)
+    
     def mark_as_read(self):
-        """Marquer le message comme lu"""
+        """
+        Marquer le message comme lu (et mettre à jour les compteurs de non lus).
+        Mise à jour conditionnelle : deux lectures simultanées ne décomptent qu'une fois.
+        """
         if not self.is_read:
+            from django.db import transaction
             from django.utils import timezone
             self.is_read = True
             self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+            with transaction.atomic():
+                if ChatMessage.objects.filter(pk=self.pk, is_read=False).update(is_read=True, read_at=self.read_at):
+                    Conversation.record_read(self.recipient_id, self.sender_id, 1)
+
+
+class Conversation(models.Model):
+    """
+    Conversation entre deux utilisateurs (paire ordonnée : user_low.id < user_high.id),
+    avec dernier message et compteurs de messages non lus par participant,
+    maintenus à chaque envoi et à chaque lecture
+    """
+    user_low = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='conversations_as_low',
+        verbose_name='Participant 1'
+    )
+    user_high = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='conversations_as_high',
+        verbose_name='Participant 2'
+    )
+    last_message = models.ForeignKey(
+        ChatMessage,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Dernier message'
+    )
+    last_activity = models.DateTimeField(
+        verbose_name='Dernière activité'
+    )
+    unread_low = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Non lus (participant 1)'
+    )
+    unread_high = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Non lus (participant 2)'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    
+    class Meta:
+        verbose_name = 'Conversation'
+        verbose_name_plural = 'Conversations'
+        ordering = ['-last_activity']
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='unique_conversation_pair'),
+        ]
+        indexes = [
+            # Boîte de réception : un parcours ordonné par côté (voir api.messaging.ConversationInbox)
+            models.Index(fields=['user_low', '-last_activity', '-id'], name='api_conv_low_activity_idx'),
+            models.Index(fields=['user_high', '-last_activity', '-id'], name='api_conv_high_activity_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_low.username} <-> {self.user_high.username}"
+    
+    @staticmethod
+    def pair(user_a_id, user_b_id):
+        """Paire ordonnée (plus petit id, plus grand id)"""
+        return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+    
+    @staticmethod
+    def unread_field(user_id, user_low_id):
+        """Nom du compteur de non lus d'un participant"""
+        return 'unread_low' if user_id == user_low_id else 'unread_high'
+    
+    def other_user(self, user_id):
+        return self.user_high if user_id == self.user_low_id else self.user_low
+    
+    def other_user_id(self, user_id):
+        return self.user_high_id if user_id == self.user_low_id else self.user_low_id
+    
+    def unread_for(self, user_id):
+        return self.unread_low if user_id == self.user_low_id else self.unread_high
+    
+    @classmethod
+    def for_users(cls, user_a_id, user_b_id):
+        """Conversation entre deux utilisateurs (None si aucun échange)"""
+        user_low_id, user_high_id = cls.pair(user_a_id, user_b_id)
+        return cls.objects.filter(user_low_id=user_low_id, user_high_id=user_high_id).first()
+    
+    @classmethod
+    def get_or_create_for_users(cls, user_a_id, user_b_id):
+        """Conversation entre deux utilisateurs, créée au premier message"""
+        from django.utils import timezone
+        
+        user_low_id, user_high_id = cls.pair(user_a_id, user_b_id)
+        conversation, _ = cls.objects.get_or_create(
+            user_low_id=user_low_id,
+            user_high_id=user_high_id,
+            defaults={'last_activity': timezone.now()}
+        )
+        return conversation
+    
+    @classmethod
+    def record_message(cls, message):
+        """
+        Mettre à jour la conversation après l'envoi d'un message : dernier message,
+        date d'activité et compteur de non lus du destinataire (UPDATE atomique)
+        """
+        from .counters import MESSAGES, increment_unread
+        
+        unread_field = cls.unread_field(message.recipient_id, min(message.sender_id, message.recipient_id))
+        cls.objects.filter(pk=message.conversation_id).update(**{
+            'last_message': message,
+            'last_activity': message.created_at,
+            unread_field: F(unread_field) + 1,
+        })
+        increment_unread(MESSAGES, [message.recipient_id])
+    
+    @classmethod
+    def record_read(cls, reader_id, sender_id, count):
+        """Décrémenter le compteur de non lus du lecteur après la lecture de count messages"""
+        from django.db.models.functions import Greatest
+        from .counters import MESSAGES, decrement_unread
+        
+        if count <= 0:
+            return
+        user_low_id, user_high_id = cls.pair(reader_id, sender_id)
+        unread_field = cls.unread_field(reader_id, user_low_id)
+        cls.objects.filter(user_low_id=user_low_id, user_high_id=user_high_id).update(**{
+            unread_field: Greatest(F(unread_field) - count, 0)
+        })
+        decrement_unread(MESSAGES, reader_id, count)
+
+
+class UnreadCounter(models.Model):
+    """
+    Compteurs de non lus d'un utilisateur (notifications, messages), dénormalisés :
+    mis à jour par UPDATE atomique (F()) dans la transaction de chaque écriture
+    (voir api.counters)
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter',
+        verbose_name='Utilisateur'
+    )
+    notifications = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Notifications non lues'
+    )
+    messages = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Messages non lus'
+    )
+    
+    class Meta:
+        verbose_name = 'Compteurs de non lus'
+        verbose_name_plural = 'Compteurs de non lus'
+    
+    def __str__(self):
+        return f"{self.user.username} : {self.notifications} notification(s), {self.messages} message(s)"
+
+
+class ModuleChannel(models.Model):
+    """
+    Salon de discussion d'un module (enseignant et étudiants inscrits).
+    Chaque message est stocké une seule fois avec un numéro de séquence croissant ;
+    les non lus d'un membre se déduisent de sa position de lecture (last_seq - last_read_seq).
+    """
+    module = models.OneToOneField(
+        Module,
+        on_delete=models.CASCADE,
+        related_name='channel',
+        verbose_name='Module'
+    )
+    last_seq = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Dernier numéro de séquence'
+    )
+    last_message_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Date du dernier message'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    
+    class Meta:
+        verbose_name = 'Salon de module'
+        verbose_name_plural = 'Salons de module'
+    
+    def __str__(self):
+        return f"Salon {self.module.code}"
+    
+    @classmethod
+    def for_module(cls, module):
+        """Salon du module, créé au premier accès"""
+        channel, _ = cls.objects.get_or_create(module=module)
+        return channel
+    
+    @staticmethod
+    def is_member(module, user):
+        """Enseignant du module, étudiant inscrit (inscription active) ou administrateur"""
+        if user.role == 'admin' or module.teacher_id == user.id:
+            return True
+        return Enrollment.objects.filter(module=module, student=user, is_active=True).exists()
+    
+    def post(self, sender, text):
+        """
+        Publier un message : incrément atomique du numéro de séquence puis une seule
+        insertion, quel que soit le nombre de membres du salon
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        
+        now = timezone.now()
+        with transaction.atomic():
+            ModuleChannel.objects.filter(pk=self.pk).update(last_seq=F('last_seq') + 1, last_message_at=now)
+            self.refresh_from_db(fields=['last_seq', 'last_message_at'])
+            message = ChannelMessage.objects.create(
+                channel=self,
+                seq=self.last_seq,
+                sender=sender,
+                message=text
+            )
+            # L'auteur a lu son propre message
+            ChannelMembership.advance(self, sender.id, self.last_seq)
+        return message
+
+
+class ChannelMessage(models.Model):
+    """
+    Message d'un salon de module (stocké une seule fois pour tous les membres)
+    """
+    channel = models.ForeignKey(
+        ModuleChannel,
+        on_delete=models.CASCADE,
+        related_name='messages',
+        verbose_name='Salon'
+    )
+    seq = models.PositiveBigIntegerField(
+        verbose_name='Numéro de séquence'
+    )
+    sender = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='channel_messages',
+        verbose_name='Expéditeur'
+    )
+    message = models.TextField(
+        verbose_name='Message'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date d\'envoi')
+    
+    class Meta:
+        verbose_name = 'Message de salon'
+        verbose_name_plural = 'Messages de salon'
+        ordering = ['channel', '-seq']
+        constraints = [
+            models.UniqueConstraint(fields=['channel', 'seq'], name='unique_channel_message_seq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.channel.module.code} #{self.seq} {self.sender.username}: {self.message[:50]}"
+
+
+class ChannelMembership(models.Model):
+    """
+    Position de lecture d'un membre dans un salon (un seul entier par membre)
+    """
+    channel = models.ForeignKey(
+        ModuleChannel,
+        on_delete=models.CASCADE,
+        related_name='memberships',
+        verbose_name='Salon'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='channel_memberships',
+        verbose_name='Membre'
+    )
+    last_read_seq = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Dernier message lu',
+        help_text='Numéro de séquence du dernier message lu'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
+    
+    class Meta:
+        verbose_name = 'Position de lecture'
+        verbose_name_plural = 'Positions de lecture'
+        constraints = [
+            models.UniqueConstraint(fields=['channel', 'user'], name='unique_channel_membership'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} @ {self.channel.module.code} : {self.last_read_seq}"
+    
+    @classmethod
+    def advance(cls, channel, user_id, seq):
+        """Avancer la position de lecture jusqu'à seq (elle ne recule jamais)"""
+        from django.db.models.functions import Greatest
+        from django.utils import timezone
+        
+        seq = max(0, min(seq, channel.last_seq))
+        membership, created = cls.objects.get_or_create(
+            channel=channel,
+            user_id=user_id,
+            defaults={'last_read_seq': seq}
+        )
+        if not created and membership.last_read_seq < seq:
+            cls.objects.filter(pk=membership.pk).update(
+                last_read_seq=Greatest(F('last_read_seq'), seq),
+                updated_at=timezone.now()
+            )
 
 
 class Notification(models.Model):
@@ -798,6 +1529,34 @@ class Notification(models.Model):
         related_name='notifications',
         verbose_name='Annonce concernée'
     )
+    related_session = models.ForeignKey(
+        CourseSession,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='notifications',
+        verbose_name='Session concernée'
+    )
+    session_start = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Début de la session rappelée',
+        help_text='Horaire de la session au moment du rappel (un rappel par horaire)'
+    )
+    related_user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Utilisateur concerné',
+        help_text='Expéditeur des messages pour une notification de message'
+    )
+    count = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Nombre d\'événements',
+        help_text='Nombre de messages regroupés dans la notification'
+    )
     is_read = models.BooleanField(
         default=False,
         verbose_name='Lu',
@@ -819,6 +1578,28 @@ class Notification(models.Model):
             models.Index(fields=['recipient', 'is_read']),
             models.Index(fields=['notification_type']),
             models.Index(fields=['created_at']),
+            # Historique paginé par (created_at, id)
+            models.Index(fields=['recipient', 'created_at', 'id'], name='api_notification_history_idx'),
+            # Purge des notifications lues par type et par ancienneté
+            models.Index(
+                fields=['notification_type', 'created_at'],
+                condition=Q(is_read=True),
+                name='api_notification_purge_idx'
+            ),
+        ]
+        constraints = [
+            # Une seule notification de message non lue par expéditeur
+            models.UniqueConstraint(
+                fields=['recipient', 'related_user'],
+                condition=Q(notification_type='message', is_read=False),
+                name='unique_unread_message_notification'
+            ),
+            # Un seul rappel par session, horaire et étudiant
+            models.UniqueConstraint(
+                fields=['recipient', 'related_session', 'session_start'],
+                condition=Q(notification_type='session'),
+                name='unique_session_reminder'
+            ),
         ]
     
     def __str__(self):
@@ -837,8 +1618,12 @@ class Notification(models.Model):
                        related_module=None, related_grade=None, related_announcement=None):
         """
         Méthode utilitaire pour créer une notification
+        (retourne None si le destinataire a masqué ce type ou ce module)
         """
-        return cls.objects.create(
+        from .counters import NOTIFICATIONS, increment_unread
+        from .notifications import publish_notifications
+        
+        notification = cls(
             recipient=user,
             notification_type=notification_type,
             title=title,
@@ -848,3 +1633,265 @@ class Notification(models.Model):
             related_grade=related_grade,
             related_announcement=related_announcement
         )
+        # Notification masquée par les préférences du destinataire : rien n'est écrit
+        if not NotificationPreference.filter_muted([notification]):
+            return None
+        notification.save()
+        publish_notifications([notification])
+        increment_unread(NOTIFICATIONS, [notification.recipient_id])
+        return notification
+    
+    @classmethod
+    def notify_message(cls, chat_message):
+        """
+        Notifier le destinataire d'un message de chat. Tant qu'une notification de message
+        non lue du même expéditeur existe, elle est mise à jour (compteur, date, lien)
+        au lieu d'en créer une nouvelle. Retourne None si le destinataire a masqué les messages.
+        """
+        from django.db import IntegrityError, transaction
+        from django.utils import timezone
+        from .counters import NOTIFICATIONS, increment_unread
+        from .notifications import publish_notifications
+        
+        if not NotificationPreference.filter_muted([cls(recipient_id=chat_message.recipient_id, notification_type='message')]):
+            return None
+        
+        sender = chat_message.sender
+        sender_name = sender.get_full_name() or sender.username
+        link = f"/messages/{chat_message.id}/"
+        pending = cls.objects.filter(
+            recipient_id=chat_message.recipient_id,
+            related_user=sender,
+            notification_type='message',
+            is_read=False
+        )
+        
+        with transaction.atomic():
+            notification = pending.select_for_update().first()
+            if notification is None:
+                try:
+                    # Point de sauvegarde : une création concurrente viole la contrainte d'unicité
+                    with transaction.atomic():
+                        notification = cls.objects.create(
+                            recipient_id=chat_message.recipient_id,
+                            related_user=sender,
+                            notification_type='message',
+                            title='Nouveau message',
+                            content=f"Vous avez reçu un message de {sender_name}",
+                            link=link
+                        )
+                except IntegrityError:
+                    notification = pending.select_for_update().get()
+                else:
+                    publish_notifications([notification])
+                    increment_unread(NOTIFICATIONS, [notification.recipient_id])
+                    return notification
+            
+            notification.count += 1
+            notification.title = 'Nouveaux messages'
+            notification.content = f"Vous avez reçu {notification.count} messages de {sender_name}"
+            notification.link = link
+            notification.created_at = timezone.now()
+            cls.objects.filter(pk=notification.pk).update(
+                count=F('count') + 1,
+                title=notification.title,
+                content=notification.content,
+                link=link,
+                created_at=notification.created_at
+            )
+        publish_notifications([notification])
+        return notification
+
+
+class NotificationPreference(models.Model):
+    """
+    Préférences de notification d'un utilisateur, stockées sous forme de masques :
+    - muted_types : bit n = n-ième type de Notification.NOTIFICATION_TYPE_CHOICES
+      (nouveaux types à ajouter en fin de liste pour ne pas décaler les bits)
+    - muted_modules : bitmap dont le bit n correspond au module d'identifiant n
+    Les notifications masquées ne sont jamais écrites en base.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_preference',
+        verbose_name='Utilisateur'
+    )
+    muted_types = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Types masqués',
+        help_text='Masque de bits des types de notification masqués'
+    )
+    muted_modules = models.BinaryField(
+        default=b'',
+        verbose_name='Modules masqués',
+        help_text='Bitmap des identifiants de modules masqués'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
+    
+    class Meta:
+        verbose_name = 'Préférences de notification'
+        verbose_name_plural = 'Préférences de notification'
+    
+    def __str__(self):
+        return f"Préférences de {self.user.username}"
+    
+    @staticmethod
+    def type_bit(notification_type):
+        """Bit d'un type de notification dans muted_types"""
+        for index, (value, _) in enumerate(Notification.NOTIFICATION_TYPE_CHOICES):
+            if value == notification_type:
+                return 1 << index
+        return 0
+    
+    @property
+    def muted_type_list(self):
+        """Types de notification masqués"""
+        return [
+            value for value, _ in Notification.NOTIFICATION_TYPE_CHOICES
+            if self.muted_types & self.type_bit(value)
+        ]
+    
+    @muted_type_list.setter
+    def muted_type_list(self, notification_types):
+        mask = 0
+        for notification_type in notification_types:
+            mask |= self.type_bit(notification_type)
+        self.muted_types = mask
+    
+    @property
+    def muted_module_ids(self):
+        """Identifiants des modules masqués"""
+        mask = int.from_bytes(bytes(self.muted_modules), 'little')
+        return [index for index in range(mask.bit_length()) if mask >> index & 1]
+    
+    @muted_module_ids.setter
+    def muted_module_ids(self, module_ids):
+        from .bitmaps import set_bit
+        
+        bitmap = b''
+        for module_id in module_ids:
+            bitmap = set_bit(bitmap, module_id)
+        self.muted_modules = bitmap
+    
+    @classmethod
+    def load_masks(cls, user_ids):
+        """
+        Masques des utilisateurs ayant des préférences, en une requête :
+        dictionnaire user_id -> (masque des types, masque des modules en entier)
+        """
+        rows = cls.objects.filter(user_id__in=user_ids).exclude(muted_types=0, muted_modules=b'')
+        return {
+            user_id: (muted_types, int.from_bytes(bytes(muted_modules), 'little'))
+            for user_id, muted_types, muted_modules in rows.values_list('user_id', 'muted_types', 'muted_modules')
+        }
+    
+    @classmethod
+    def filter_muted(cls, notifications):
+        """
+        Retirer d'une liste de notifications non sauvegardées celles que leur destinataire
+        a masquées (par type ou par module). Retourne la liste des notifications conservées.
+        """
+        masks = cls.load_masks({notification.recipient_id for notification in notifications})
+        if not masks:
+            return notifications
+        
+        type_bits = {}
+        kept = []
+        for notification in notifications:
+            mask = masks.get(notification.recipient_id)
+            if mask is not None:
+                muted_types, muted_modules = mask
+                if notification.notification_type not in type_bits:
+                    type_bits[notification.notification_type] = cls.type_bit(notification.notification_type)
+                if muted_types & type_bits[notification.notification_type]:
+                    continue
+                if notification.related_module_id is not None and muted_modules >> notification.related_module_id & 1:
+                    continue
+            kept.append(notification)
+        return kept
+
+
+class Task(models.Model):
+    """
+    Tâche d'arrière-plan stockée en base, exécutée par la commande runworker
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('succeeded', 'Terminée'),
+        ('failed', 'En échec'),
+    ]
+    
+    name = models.CharField(
+        max_length=255,
+        verbose_name='Fonction',
+        help_text='Chemin pointé de la fonction à exécuter (ex: api.notifications.fan_out_announcement)'
+    )
+    args = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Arguments positionnels'
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Arguments nommés'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Statut'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Tentatives'
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=5,
+        verbose_name='Tentatives maximum'
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Exécution prévue',
+        help_text='Date à partir de laquelle la tâche peut être exécutée (reportée après un échec)'
+    )
+    locked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Prise en charge le'
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Prise en charge par'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Dernière erreur'
+    )
+    finished_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Date de fin'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date de modification')
+    
+    class Meta:
+        verbose_name = 'Tâche'
+        verbose_name_plural = 'Tâches'
+        ordering = ['-created_at']
+        indexes = [
+            # File d'attente : tâches en attente par date d'exécution
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='pending'),
+                name='api_task_pending_idx'
+            ),
+            models.Index(fields=['status', 'locked_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} [{self.get_status_display()}]"
@@ -0,0 +1,283 @@
+"""
+Production des notifications en masse (diffusion des annonces, rappels de sessions),
+publication des événements temps réel correspondants et purge des anciennes notifications
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce, Length
+from django.utils import timezone
+
+from .archive import NOTIFICATIONS_ARCHIVE, purge_archive
+from .counters import NOTIFICATIONS, increment_unread
+from .models import (
+    Announcement, AnnouncementReadState, CourseSession, Enrollment, Notification,
+    NotificationPreference
+)
+from .pubsub import publish_to_users
+
+User = get_user_model()
+
+
+def _batch_size():
+    return getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500)
+
+
+def iter_id_batches(queryset, batch_size=None):
+    """
+    Parcourir les identifiants d'un queryset par lots, en pagination par clé
+    (pk > dernier pk vu), sans garder de curseur ouvert pendant les insertions
+    """
+    batch_size = batch_size or _batch_size()
+    queryset = queryset.order_by('pk')
+    last_pk = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def publish_notifications(notifications):
+    """
+    Publier, après le commit, un événement 'notification.created' sur le canal
+    de chaque destinataire (réveil des connexions temps réel et longues interrogations)
+    """
+    events = [
+        (notification.recipient_id, {
+            'id': notification.id,
+            'notification_type': notification.notification_type,
+            'title': notification.title,
+        })
+        for notification in notifications
+    ]
+
+    def publish():
+        for recipient_id, data in events:
+            publish_to_users([recipient_id], 'notification.created', data)
+
+    if events:
+        transaction.on_commit(publish)
+
+
+def publish_notifications_read(user_id):
+    """Publier, après le commit, un changement du nombre de notifications non lues"""
+    transaction.on_commit(lambda: publish_to_users([user_id], 'notification.read', {}))
+
+
+def create_notifications_in_batches(notifications, batch_size=None):
+    """
+    Insérer des notifications (itérable d'instances non sauvegardées) par lots de bulk_create.
+    Les préférences des destinataires de chaque lot sont chargées en une requête et les
+    notifications masquées sont retirées avant l'insertion.
+    Retourne le nombre de notifications créées.
+    """
+    batch_size = batch_size or _batch_size()
+    created = 0
+    batch = []
+
+    def insert(batch):
+        batch = NotificationPreference.filter_muted(batch)
+        if not batch:
+            return 0
+        batch = Notification.objects.bulk_create(batch)
+        publish_notifications(batch)
+        increment_unread(NOTIFICATIONS, [notification.recipient_id for notification in batch])
+        return len(batch)
+
+    for notification in notifications:
+        batch.append(notification)
+        if len(batch) >= batch_size:
+            created += insert(batch)
+            batch = []
+    if batch:
+        created += insert(batch)
+    return created
+
+
+def announcement_recipients(announcement):
+    """
+    Utilisateurs ciblés par une annonce (voir Announcement.audience)
+    """
+    return announcement.audience()
+
+
+def fan_out_announcement(announcement_id):
+    """
+    Créer une notification pour chaque destinataire d'une annonce, par lots.
+    Retourne le nombre de notifications créées.
+    """
+    announcement = Announcement.objects.select_related('module', 'author').filter(pk=announcement_id).first()
+    if announcement is None or not announcement.is_visible:
+        return 0
+
+    module_str = f" ({announcement.module.code})" if announcement.module else ""
+    author_name = announcement.author.get_full_name() or announcement.author.username
+    title = f"Nouvelle annonce{module_str}"
+    content = f"{author_name} a publié : {announcement.title}"
+    link = f"/announcements/{announcement.id}/"
+
+    created = audience_size = 0
+    for recipient_ids in iter_id_batches(announcement_recipients(announcement)):
+        audience_size += len(recipient_ids)
+        created += create_notifications_in_batches(
+            Notification(
+                recipient_id=recipient_id,
+                notification_type='announcement',
+                title=title,
+                content=content,
+                link=link,
+                related_module_id=announcement.module_id,
+                related_announcement_id=announcement.id
+            )
+            for recipient_id in recipient_ids
+        )
+
+    # Taille du public (notifications masquées comprises : les lectures sont comptées
+    # sur la même population), pour les pourcentages de lecture
+    AnnouncementReadState.objects.update_or_create(
+        announcement_id=announcement.id,
+        defaults={'audience_size': audience_size}
+    )
+    return created
+
+
+def session_window(start, end):
+    """
+    Condition sur (date, start_time) des sessions commençant entre start et end
+    (dates locales), sous forme d'intervalle pour utiliser l'index (date, start_time)
+    """
+    start = timezone.localtime(start)
+    end = timezone.localtime(end)
+    if start.date() == end.date():
+        return Q(date=start.date(), start_time__gte=start.time(), start_time__lte=end.time())
+    return (
+        Q(date=start.date(), start_time__gte=start.time())
+        | Q(date__gt=start.date(), date__lt=end.date())
+        | Q(date=end.date(), start_time__lte=end.time())
+    )
+
+
+def session_reminder(session, student_id):
+    """Notification de rappel (non sauvegardée) d'une session pour un étudiant"""
+    start = session.start_time.strftime('%H:%M')
+    label = session.title or session.get_session_type_display()
+    location = f" ({session.location})" if session.location else ""
+    return Notification(
+        recipient_id=student_id,
+        notification_type='session',
+        title=f"Rappel : {session.module.code} à {start}",
+        content=f"{label} commence à {start}{location}.",
+        link=f"/sessions/{session.id}/",
+        related_module_id=session.module_id,
+        related_session_id=session.id,
+        session_start=session.starts_at
+    )
+
+
+def send_session_reminders(lead_minutes=None, now=None):
+    """
+    Rappeler aux étudiants inscrits les sessions commençant dans les lead_minutes à venir.
+    Les sessions sont réservées par un UPDATE conditionnel (reminder_sent_at) : deux
+    exécutions, même simultanées, n'envoient jamais deux fois le rappel d'une session.
+    Une session déplacée est de nouveau rappelée (réservation remise à zéro par
+    CourseSession.save, un rappel par horaire : session_start).
+    Retourne (nombre de sessions, nombre de notifications créées).
+    """
+    lead_minutes = lead_minutes or getattr(settings, 'SESSION_REMINDER_LEAD_MINUTES', 30)
+    now = now or timezone.now()
+    window = session_window(now, now + timedelta(minutes=lead_minutes))
+
+    with transaction.atomic():
+        # La date de ce passage sert de jeton de réservation
+        claimed = CourseSession.objects.filter(window, reminder_sent_at__isnull=True).update(reminder_sent_at=now)
+        if not claimed:
+            return 0, 0
+        sessions = {
+            session.id: session
+            for session in CourseSession.objects.filter(window, reminder_sent_at=now).select_related('module')
+        }
+
+        # Destinataires de toutes les sessions en une seule jointure
+        students = defaultdict(list)
+        enrollments = Enrollment.objects.filter(
+            module_id__in={session.module_id for session in sessions.values()},
+            is_active=True,
+            student__is_active=True
+        ).values_list('module_id', 'student_id')
+        for module_id, student_id in enrollments:
+            students[module_id].append(student_id)
+
+        # Rappels déjà présents pour le même horaire (réservation remise à zéro à la main, par exemple)
+        already_sent = set(
+            Notification.objects.filter(
+                notification_type='session',
+                related_session_id__in=sessions.keys()
+            ).values_list('related_session_id', 'session_start', 'recipient_id')
+        )
+
+        created = create_notifications_in_batches(
+            session_reminder(session, student_id)
+            for session in sessions.values()
+            for student_id in students[session.module_id]
+            if (session.id, session.starts_at, student_id) not in already_sent
+        )
+    return len(sessions), created
+
+
+# Taille estimée des colonnes de longueur fixe d'une notification (identifiants, dates, booléens)
+NOTIFICATION_ROW_OVERHEAD = 64
+
+
+def _archived_row_size(item):
+    """Taille estimée d'une notification archivée (même estimation qu'en base)"""
+    return sum(len(item.get(field) or '') for field in ('title', 'content', 'link')) + NOTIFICATION_ROW_OVERHEAD
+
+
+def purge_read_notifications(notification_type, older_than, batch_size=1000, dry_run=False):
+    """
+    Supprimer les notifications lues d'un type créées avant older_than :
+    - dans les archives, où elles ont été déplacées par archive_old_records
+      (durée de conservation >= ARCHIVE_AFTER_DAYS, voir api.checks) ;
+    - en base, par lots bornés, celles qui n'ont pas encore été archivées
+      (index partiel sur notification_type, created_at).
+    Retourne (nombre de notifications, estimation des octets libérés).
+    """
+    archived = purge_archive(
+        NOTIFICATIONS_ARCHIVE,
+        older_than,
+        lambda item: item['notification_type'] == notification_type and item['is_read'],
+        dry_run=dry_run
+    )
+    rows = len(archived)
+    reclaimed = sum(_archived_row_size(item) for item in archived)
+
+    due = Notification.objects.filter(
+        notification_type=notification_type,
+        is_read=True,
+        created_at__lt=older_than
+    )
+    row_size = (
+        Coalesce(Length('title'), Value(0))
+        + Coalesce(Length('content'), Value(0))
+        + Coalesce(Length('link'), Value(0))
+        + Value(NOTIFICATION_ROW_OVERHEAD)
+    )
+
+    if dry_run:
+        totals = due.aggregate(bytes=Sum(row_size))
+        return rows + due.count(), reclaimed + (totals['bytes'] or 0)
+
+    while True:
+        ids = list(due.order_by('created_at', 'pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return rows, reclaimed
+        batch = Notification.objects.filter(pk__in=ids)
+        reclaimed += batch.aggregate(bytes=Sum(row_size))['bytes'] or 0
+        # Chaque lot est une transaction courte : pas de verrou long sur la table
+        rows += batch.delete()[0]
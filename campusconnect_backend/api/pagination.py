@@ -0,0 +1,82 @@
+"""
+Pagination par clé (keyset) sur (created_at, id), du plus récent au plus ancien :
+le coût d'une page est le même quelle que soit la profondeur. Les éléments des
+archives froides (voir api/archive.py) sont fusionnés avec ceux de la base.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .archive import read_archive
+
+
+class InvalidCursor(Exception):
+    """Curseur de pagination illisible"""
+
+
+def encode_cursor(created_at, pk):
+    """Curseur opaque désignant une position : base64("created_at|id")"""
+    raw = f'{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Retourner le couple (created_at, id) d'un curseur"""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor()
+    if created_at is None:
+        raise InvalidCursor()
+    return created_at, pk
+
+
+def page_size(limit, default, maximum):
+    """Taille de page demandée (?limit=), bornée par maximum"""
+    try:
+        limit = int(limit) if limit else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def keyset_page(queryset, serializer_class, limit, before=None, archive=None):
+    """
+    Page d'éléments strictement antérieurs au curseur before (s'il est fourni),
+    sérialisés avec serializer_class. archive=(kind, owner_id) ajoute les éléments des
+    archives froides : les lignes restées en base (non lues, dernier message d'une
+    conversation) peuvent être plus anciennes que des éléments archivés, les deux flux
+    sont donc fusionnés sur (created_at, id) à chaque page.
+    Retourne (éléments, curseur de la page suivante ou None).
+    """
+    position = decode_cursor(before) if before else None
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    # Un élément de plus par flux pour savoir s'il reste des éléments plus anciens
+    rows = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+    if archive is None:
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+        return serializer_class(page, many=True).data, next_cursor
+
+    entries = [((row.created_at, row.id), row) for row in rows]
+    # Un élément archivé dont la suppression a échoué est encore en base : l'ignorer
+    in_database = {key for key, _ in entries}
+    for item in read_archive(*archive, before=position, limit=limit + 1):
+        key = (parse_datetime(item['created_at']), item['id'])
+        if key not in in_database:
+            entries.append((key, item))
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    page = entries[:limit]
+
+    # Sérialiser les lignes de la base retenues, en conservant l'ordre de fusion
+    serialized = iter(serializer_class([entry for _, entry in page if not isinstance(entry, dict)], many=True).data)
+    items = [entry if isinstance(entry, dict) else next(serialized) for _, entry in page]
+    next_cursor = encode_cursor(*page[-1][0]) if len(entries) > limit else None
+    return items, next_cursor
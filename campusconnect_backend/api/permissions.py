@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .models import ModuleChannel
+
 
 class IsStudent(permissions.BasePermission):
     """
@@ -67,3 +69,14 @@ class IsModuleTeacherOrAdmin(permissions.BasePermission):
         
         return False
 
+
+class IsModuleChannelMember(permissions.BasePermission):
+    """
+    Permission pour accéder au salon d'un module : enseignant responsable,
+    étudiant inscrit (inscription active) ou admin
+    """
+    def has_object_permission(self, request, view, obj):
+        if not request.user or not request.user.is_authenticated:
+            return False
+        
+        return ModuleChannel.is_member(obj, request.user)
@@ -0,0 +1,140 @@
+"""
+Couche publish/subscribe pour la diffusion en temps réel (WebSocket, ...).
+
+Le backend est choisi par settings.PUBSUB_BACKEND (chemin pointé vers une sous-classe
+de BasePubSub). InProcessPubSub convient à un déploiement sur un seul processus ASGI :
+les publications faites depuis les vues (threads synchrones) sont remises aux
+abonnés (boucle asyncio) via call_soon_threadsafe.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def user_channel(user_id):
+    """Canal personnel d'un utilisateur"""
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """
+    Abonnement à un ou plusieurs canaux ; les messages reçus sont mis en file
+    dans la boucle asyncio de l'abonné
+    """
+
+    def __init__(self, pubsub, channels, loop, max_queue_size):
+        self.pubsub = pubsub
+        self.channels = list(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+
+    def deliver(self, message):
+        """Appelé par le backend, depuis n'importe quel thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Boucle fermée : l'abonné est parti
+            self.close()
+
+    def _put(self, message):
+        if self.queue.full():
+            # Abonné trop lent : on abandonne le plus ancien message
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Attendre le prochain message (None si le délai expire)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.pubsub.unsubscribe(self)
+
+
+class BasePubSub:
+    """Interface des backends publish/subscribe"""
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channels):
+        """Retourner une Subscription ; doit être appelé depuis une boucle asyncio"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InProcessPubSub(BasePubSub):
+    """Backend en mémoire, pour un déploiement mono-nœud"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def subscribe(self, channels):
+        subscription = Subscription(
+            self,
+            channels,
+            asyncio.get_running_loop(),
+            getattr(settings, 'PUBSUB_QUEUE_SIZE', 100)
+        )
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+def get_pubsub():
+    """Instance unique du backend configuré"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, 'PUBSUB_BACKEND', 'api.pubsub.InProcessPubSub')
+                _backend = import_string(backend_path)()
+    return _backend
+
+
+def publish_to_users(user_ids, event_type, data):
+    """Publier un événement sur le canal personnel de chaque utilisateur"""
+    pubsub = get_pubsub()
+    message = {'type': event_type, 'data': data}
+    for user_id in user_ids:
+        try:
+            pubsub.publish(user_channel(user_id), message)
+        except Exception:
+            logger.exception("Échec de la publication de l'événement %s", event_type)
@@ -0,0 +1,393 @@
+"""
+Diffusion en temps réel au-dessus d'ASGI (sans dépendance supplémentaire),
+authentifiée par les jetons d'accès SimpleJWT :
+- WebSocket /ws/messages/ ;
+- longue interrogation GET /api/updates/ (vue asynchrone) pour les clients sans WebSocket ;
+- flux Server-Sent Events GET /api/notifications/stream/ pour les notifications.
+"""
+import asyncio
+import json
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import ChatMessage, Notification
+from .pubsub import get_pubsub, user_channel
+from .serializers import ChatMessageSerializer, NotificationSerializer
+
+User = get_user_model()
+
+WEBSOCKET_PATH = '/ws/messages/'
+
+# Codes de fermeture applicatifs (plage 4000-4999)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+def get_raw_token(scope):
+    """
+    Extraire le jeton d'accès : paramètre ?token= (navigateurs) ou en-tête
+    Authorization: Bearer <jeton> (clients natifs)
+    """
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.decode().split()
+            if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+                return parts[1]
+    return None
+
+
+@sync_to_async
+def _get_active_user_id(user_id):
+    return User.objects.filter(pk=user_id, is_active=True).values_list('pk', flat=True).first()
+
+
+def get_header_token(request):
+    """Jeton de l'en-tête Authorization: Bearer <jeton> d'une requête HTTP"""
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+        return parts[1]
+    return None
+
+
+def get_request_token(request):
+    """
+    Même extraction que get_raw_token, pour une requête HTTP. Réservé au flux SSE :
+    EventSource ne permet pas d'envoyer d'en-tête Authorization
+    """
+    if request.GET.get('token'):
+        return request.GET['token']
+    return get_header_token(request)
+
+
+def get_access_token(raw_token):
+    """Jeton d'accès validé (signature et expiration), ou None"""
+    if not raw_token:
+        return None
+    try:
+        return AccessToken(raw_token)
+    except TokenError:
+        return None
+
+
+async def authenticate_access_token(token):
+    """Identifiant de l'utilisateur actif désigné par un jeton validé (ou None)"""
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None:
+        return None
+    return await _get_active_user_id(user_id)
+
+
+async def authenticate_token(raw_token):
+    """Valider un jeton d'accès et retourner l'identifiant de l'utilisateur actif (ou None)"""
+    token = get_access_token(raw_token)
+    if token is None:
+        return None
+    return await authenticate_access_token(token)
+
+
+async def _receive_events(receive, send):
+    """Lire les événements du client jusqu'à sa déconnexion (ping -> pong)"""
+    while True:
+        event = await receive()
+        if event['type'] == 'websocket.disconnect':
+            return
+        if event.get('text') == 'ping':
+            await send({'type': 'websocket.send', 'text': 'pong'})
+
+
+async def _forward_events(subscription, send):
+    """Pousser vers le client chaque événement publié sur ses canaux"""
+    async for message in subscription:
+        await send({'type': 'websocket.send', 'text': json.dumps(message, default=str)})
+
+
+async def websocket_application(scope, receive, send):
+    """
+    Application ASGI pour les connexions WebSocket.
+    Une connexion inactive ne coûte qu'une tâche asyncio et une file d'attente.
+    La connexion est fermée (code 4401) à l'expiration du jeton d'accès : le client
+    se reconnecte avec un jeton rafraîchi.
+    """
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    token = get_access_token(get_raw_token(scope))
+    user_id = await authenticate_access_token(token) if token is not None else None
+    if user_id is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = get_pubsub().subscribe([user_channel(user_id)])
+    forwarder = asyncio.ensure_future(_forward_events(subscription, send))
+    try:
+        await asyncio.wait_for(_receive_events(receive, send), timeout=max(token['exp'] - time.time(), 0))
+    except asyncio.TimeoutError:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED, 'reason': 'Jeton expiré'})
+    finally:
+        forwarder.cancel()
+        subscription.close()
+
+
+# ==================== LONGUE INTERROGATION ====================
+
+# Origine des positions de notification (date de dernière modification en microsecondes)
+CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _notification_position(created_at, notification_id):
+    """Position d'une notification : (date en microsecondes, identifiant)"""
+    return (created_at - CURSOR_EPOCH) // timedelta(microseconds=1), notification_id
+
+
+def _parse_updates_cursor(cursor):
+    """
+    Curseur "<dernier message>:<date de la dernière notification>:<dernière notification>".
+    Les notifications regroupées (Notification.notify_message) gardent leur identifiant
+    mais avancent leur date : la position des notifications est la paire (date, id).
+    """
+    message_id, changed_at, notification_id = cursor.split(':')
+    return int(message_id), (int(changed_at), int(notification_id))
+
+
+def _format_updates_cursor(cursor):
+    message_id, (changed_at, notification_id) = cursor
+    return f'{message_id}:{changed_at}:{notification_id}'
+
+
+@sync_to_async
+def _fetch_updates(user_id, since):
+    """
+    Nouveaux messages reçus et notifications nouvelles ou mises à jour depuis le curseur.
+    Sans curseur, retourne seulement la position actuelle (pas d'historique).
+    """
+    messages = ChatMessage.objects.filter(recipient_id=user_id)
+    notifications = Notification.objects.filter(recipient_id=user_id)
+    if since is None:
+        last_message_id = messages.order_by('-id').values_list('id', flat=True).first() or 0
+        latest = notifications.order_by('-created_at', '-id').values_list('created_at', 'id').first()
+        return [], [], (last_message_id, _notification_position(*latest) if latest else (0, 0))
+
+    last_message_id, notification_position = since
+    changed_at = CURSOR_EPOCH + timedelta(microseconds=notification_position[0])
+    max_items = getattr(settings, 'UPDATES_MAX_ITEMS', 100)
+    new_messages = list(
+        messages
+        .filter(id__gt=last_message_id)
+        .select_related('sender', 'recipient')
+        .order_by('id')[:max_items]
+    )
+    # Pagination par clé (created_at, id) : index de l'historique des notifications
+    new_notifications = list(
+        notifications
+        .filter(Q(created_at__gt=changed_at) | Q(created_at=changed_at, id__gt=notification_position[1]))
+        .select_related('recipient', 'related_module')
+        .order_by('created_at', 'id')[:max_items]
+    )
+    if new_messages:
+        last_message_id = new_messages[-1].id
+    if new_notifications:
+        notification_position = _notification_position(new_notifications[-1].created_at, new_notifications[-1].id)
+    return (
+        ChatMessageSerializer(new_messages, many=True).data,
+        NotificationSerializer(new_notifications, many=True).data,
+        (last_message_id, notification_position),
+    )
+
+
+async def updates(request):
+    """
+    Longue interrogation des nouveaux messages et notifications
+    GET /api/updates/?since=<curseur>&timeout=<secondes>
+    Authentification par l'en-tête Authorization uniquement (un jeton dans l'URL
+    finirait dans les journaux des serveurs et des proxys).
+
+    Répond immédiatement s'il y a du nouveau, sinon garde la requête ouverte
+    (au plus LONG_POLL_TIMEOUT secondes) et se réveille sur les événements publiés
+    sur le canal de l'utilisateur, sans interroger la base en boucle.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Méthode non autorisée.'}, status=405)
+
+    user_id = await authenticate_token(get_header_token(request))
+    if user_id is None:
+        return JsonResponse({'detail': "Informations d'authentification non fournies ou invalides."}, status=401)
+
+    since = None
+    if request.GET.get('since'):
+        try:
+            since = _parse_updates_cursor(request.GET['since'])
+        except ValueError:
+            return JsonResponse({'since': 'Curseur invalide.'}, status=400)
+
+    max_timeout = getattr(settings, 'LONG_POLL_TIMEOUT', 25)
+    try:
+        timeout = float(request.GET.get('timeout', max_timeout))
+    except ValueError:
+        timeout = math.nan
+    # float() accepte aussi « nan » et « inf »
+    if not math.isfinite(timeout):
+        return JsonResponse({'timeout': 'Délai invalide (nombre de secondes attendu).'}, status=400)
+    timeout = min(max(timeout, 0), max_timeout)
+
+    # Abonnement avant la première lecture : aucun événement ne peut être manqué entre les deux
+    subscription = get_pubsub().subscribe([user_channel(user_id)])
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            messages, notifications, cursor = await _fetch_updates(user_id, since)
+            remaining = deadline - time.monotonic()
+            if messages or notifications or since is None or remaining <= 0:
+                break
+            if await subscription.get(timeout=remaining) is None:
+                continue
+            # Regrouper les événements arrivés en rafale avant de relire la base
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+    finally:
+        subscription.close()
+
+    return JsonResponse({
+        'cursor': _format_updates_cursor(cursor),
+        'messages': messages,
+        'notifications': notifications,
+    })
+
+
+# ==================== FLUX SERVER-SENT EVENTS ====================
+
+def _sse_event(event, data, event_id=None):
+    """Formater un événement SSE"""
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+@sync_to_async
+def _fetch_stream_notifications(user_id, after_id, updated_ids=()):
+    """
+    Notifications postérieures à after_id (plus les notifications regroupées mises à jour,
+    qui gardent leur identifiant), dans l'ordre de création, et nombre de non lues
+    """
+    notifications = Notification.objects.filter(recipient_id=user_id)
+    condition = Q(id__gt=after_id)
+    if updated_ids:
+        condition |= Q(id__in=updated_ids)
+    new_notifications = list(
+        notifications
+        .filter(condition)
+        .select_related('recipient', 'related_module')
+        .order_by('id')[:getattr(settings, 'UPDATES_MAX_ITEMS', 100)]
+    )
+    return (
+        NotificationSerializer(new_notifications, many=True).data,
+        notifications.filter(is_read=False).count(),
+    )
+
+
+@sync_to_async
+def _latest_notification_id(user_id):
+    return Notification.objects.filter(recipient_id=user_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+async def _notification_events(user_id, last_event_id):
+    """
+    Générateur du flux : rejoue les notifications postérieures à Last-Event-ID,
+    puis pousse les nouvelles notifications et le nombre de non lues à chaque événement
+    publié sur le canal de l'utilisateur, avec un commentaire de maintien de connexion
+    """
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT_INTERVAL', 15)
+    max_items = getattr(settings, 'UPDATES_MAX_ITEMS', 100)
+    # Abonnement avant la première lecture : aucun événement ne peut être manqué entre les deux
+    subscription = get_pubsub().subscribe([user_channel(user_id)])
+    try:
+        yield f'retry: {getattr(settings, "SSE_RETRY_MS", 5000)}\n\n'
+
+        updated_ids = ()
+        if last_event_id is None:
+            last_event_id = await _latest_notification_id(user_id)
+        while True:
+            notifications, unread_count = await _fetch_stream_notifications(user_id, last_event_id, updated_ids)
+            for notification in notifications:
+                last_event_id = max(last_event_id, notification['id'])
+                yield _sse_event('notification', notification, last_event_id)
+            if len(notifications) < max_items:
+                yield _sse_event('unread_count', {'unread_count': unread_count})
+            else:
+                # Rattrapage en cours : lire la suite sans attendre
+                updated_ids = ()
+                continue
+
+            # Attendre le prochain événement de notification
+            # (délai écoulé : envoyer un battement ; les messages de chat sont ignorés)
+            while True:
+                message = await subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': ping\n\n'
+                    continue
+                messages = [message]
+                while not subscription.queue.empty():
+                    messages.append(subscription.queue.get_nowait())
+                if any(message['type'].startswith('notification.') for message in messages):
+                    break
+
+            # Les notifications de chat regroupées sont mises à jour sans nouvel identifiant
+            updated_ids = [
+                message['data']['id'] for message in messages
+                if message['type'] == 'notification.created' and message['data']['id'] <= last_event_id
+            ]
+    finally:
+        subscription.close()
+
+
+async def notification_stream(request):
+    """
+    Flux Server-Sent Events (text/event-stream) des notifications de l'utilisateur
+    GET /api/notifications/stream/?token=<jeton>
+
+    Événements : 'notification' (identifiant = id de la notification, pour la reprise
+    via l'en-tête Last-Event-ID) et 'unread_count'. Un commentaire est envoyé toutes les
+    SSE_HEARTBEAT_INTERVAL secondes pour maintenir la connexion.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Méthode non autorisée.'}, status=405)
+
+    user_id = await authenticate_token(get_request_token(request))
+    if user_id is None:
+        return JsonResponse({'detail': "Informations d'authentification non fournies ou invalides."}, status=401)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if last_event_id is not None:
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return JsonResponse({'last_event_id': 'Identifiant invalide.'}, status=400)
+
+    response = StreamingHttpResponse(
+        _notification_events(user_id, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Désactiver la mise en tampon des proxys (nginx)
+    response['X-Accel-Buffering'] = 'no'
+    return response
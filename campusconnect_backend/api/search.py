@@ -0,0 +1,114 @@
+"""
+Recherche plein texte dans les messages de chat et les annonces.
+
+Selon le moteur de base de données :
+- SQLite : tables virtuelles FTS5 à contenu externe, tenues à jour par triggers
+  (migration 0013_search_indexes) ;
+- PostgreSQL : index GIN sur to_tsvector('french', ...) ;
+- autres moteurs (ou SQLite sans FTS5) : repli sur des filtres icontains.
+Les règles de visibilité sont appliquées sur le queryset avant la recherche.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Announcement, ChatMessage
+
+SEARCH_TERM_RE = re.compile(r'\w+')
+MAX_SEARCH_TERMS = 10
+
+# Modèle -> (table FTS5 SQLite, colonnes indexées)
+SEARCH_INDEXES = {
+    ChatMessage: ('api_chatmessage_fts', ['message']),
+    Announcement: ('api_announcement_fts', ['title', 'content']),
+}
+
+_available_fts_tables = set()
+
+
+def search_terms(query):
+    """Mots de la requête (la syntaxe FTS5 de l'utilisateur n'est jamais interprétée)"""
+    return SEARCH_TERM_RE.findall(query or '')[:MAX_SEARCH_TERMS]
+
+
+def search_limit(limit=None):
+    """Nombre de résultats demandé, borné par SEARCH_MAX_RESULTS"""
+    default = getattr(settings, 'SEARCH_RESULTS_LIMIT', 20)
+    maximum = getattr(settings, 'SEARCH_MAX_RESULTS', 100)
+    try:
+        limit = int(limit) if limit else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def _fts_table_exists(table):
+    if table not in _available_fts_tables:
+        if table not in connection.introspection.table_names():
+            return False
+        _available_fts_tables.add(table)
+    return True
+
+
+def _fts5_query(terms):
+    """Tous les mots sont requis ; le dernier est cherché comme préfixe (saisie en cours)"""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def full_text_filter(queryset, query):
+    """Restreindre un queryset (messages ou annonces) aux lignes correspondant à la requête"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    model = queryset.model
+    fts_table, columns = SEARCH_INDEXES[model]
+    db_table = model._meta.db_table
+
+    if connection.vendor == 'sqlite' and _fts_table_exists(fts_table):
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s',
+            [_fts5_query(terms)]
+        ))
+
+    if connection.vendor == 'postgresql':
+        # Même expression que l'index GIN pour qu'il soit utilisé
+        document = " || ' ' || ".join(columns)
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM {db_table} "
+            f"WHERE to_tsvector('french', {document}) @@ plainto_tsquery('french', %s)",
+            [' '.join(terms)]
+        ))
+
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for column in columns:
+            term_condition |= Q(**{f'{column}__icontains': term})
+        condition &= term_condition
+    return queryset.filter(condition)
+
+
+def search_messages(user, query, limit=None):
+    """Messages envoyés ou reçus par l'utilisateur correspondant à la requête, plus récents d'abord"""
+    queryset = ChatMessage.objects.filter(Q(sender=user) | Q(recipient=user))
+    return list(
+        full_text_filter(queryset, query)
+        .select_related('sender', 'recipient')
+        .order_by('-created_at', '-id')[:search_limit(limit)]
+    )
+
+
+def search_announcements(user, query, limit=None):
+    """Annonces visibles par l'utilisateur correspondant à la requête, plus récentes d'abord"""
+    queryset = Announcement.objects.visible_to(user)
+    return list(
+        full_text_filter(queryset, query)
+        .select_related('author', 'module')
+        .order_by('-published_date', '-id')[:search_limit(limit)]
+    )
@@ -1,6 +1,8 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from .models import User, StudentProfile, TeacherProfile, Module, Enrollment, CourseSession, CourseResource, Grade, Announcement, ChatMessage, Notification
+from .models import User, StudentProfile, TeacherProfile, Module, Enrollment, CourseSession, CourseResource, Grade, Announcement, ChatMessage, ChannelMessage, Notification, NotificationPreference
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -504,6 +506,27 @@ class GradeSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class GradeImportSerializer(serializers.Serializer):
+    """
+    Serializer pour l'import de notes depuis un fichier CSV ou XLSX
+    """
+    file = serializers.FileField(required=True)
+    module = serializers.PrimaryKeyRelatedField(queryset=Module.objects.all())
+    grade_type = serializers.ChoiceField(choices=Grade.GRADE_TYPE_CHOICES, default='exam')
+    max_grade = serializers.DecimalField(max_digits=5, decimal_places=2, default=Decimal('20.00'))
+    
+    def validate_file(self, value):
+        """Valider l'extension du fichier"""
+        if not value.name.lower().endswith(('.csv', '.xlsx')):
+            raise serializers.ValidationError('Seuls les fichiers .csv et .xlsx sont acceptés.')
+        return value
+    
+    def validate_max_grade(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('La note maximale doit être positive.')
+        return value
+
+
 class AnnouncementSerializer(serializers.ModelSerializer):
     """
     Serializer pour les annonces/messages
@@ -514,6 +537,7 @@ class AnnouncementSerializer(serializers.ModelSerializer):
     module_name = serializers.CharField(source='module.name', read_only=True, allow_null=True)
     priority_display = serializers.CharField(source='get_priority_display', read_only=True)
     target_audience_display = serializers.CharField(source='get_target_audience_display', read_only=True, allow_null=True)
+    # Calculés à partir des colonnes is_active et expired_at (aucune lecture de l'horloge)
     is_expired = serializers.BooleanField(read_only=True)
     is_visible = serializers.BooleanField(read_only=True)
     
@@ -523,21 +547,40 @@ class AnnouncementSerializer(serializers.ModelSerializer):
             'id', 'author', 'author_name', 'author_username', 'title', 'content',
             'module', 'module_code', 'module_name', 'priority', 'priority_display',
             'is_pinned', 'is_active', 'target_audience', 'target_audience_display',
-            'published_date', 'expiry_date', 'is_expired', 'is_visible',
+            'published_date', 'publish_at', 'expiry_date', 'expired_at', 'is_expired', 'is_visible',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'author', 'published_date', 'created_at', 'updated_at', 'is_expired', 'is_visible']
+        read_only_fields = [
+            'id', 'author', 'published_date', 'expired_at', 'created_at', 'updated_at', 'is_expired', 'is_visible'
+        ]
     
     def validate(self, attrs):
-        """Valider que l'expiry_date est après published_date"""
+        """Valider que l'expiry_date est après published_date (et après la publication programmée)"""
+        from django.utils import timezone
         expiry_date = attrs.get('expiry_date')
         if expiry_date:
-            from django.utils import timezone
             if expiry_date <= timezone.now():
                 raise serializers.ValidationError({
                     'expiry_date': 'La date d\'expiration doit être dans le futur.'
                 })
+        
+        publish_at = attrs.get('publish_at')
+        if publish_at:
+            if publish_at <= timezone.now():
+                raise serializers.ValidationError({
+                    'publish_at': 'La date de publication programmée doit être dans le futur.'
+                })
+            if expiry_date and expiry_date <= publish_at:
+                raise serializers.ValidationError({
+                    'expiry_date': 'La date d\'expiration doit être après la publication programmée.'
+                })
         return attrs
+    
+    def update(self, instance, validated_data):
+        """Une annonce réactivée n'est plus marquée comme expirée"""
+        if validated_data.get('is_active'):
+            validated_data['expired_at'] = None
+        return super().update(instance, validated_data)
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -573,6 +616,94 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class ChatParticipantSerializer(serializers.ModelSerializer):
+    """
+    Serializer réduit d'un participant à une conversation
+    """
+    name = serializers.CharField(source='get_full_name', read_only=True)
+    
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'name', 'email']
+
+
+class ChatThreadMessageSerializer(serializers.ModelSerializer):
+    """
+    Serializer compact d'un message dans l'historique d'un fil
+    (les participants sont décrits une seule fois dans la réponse)
+    """
+    
+    class Meta:
+        model = ChatMessage
+        fields = ['id', 'sender', 'message', 'is_read', 'read_at', 'created_at']
+        read_only_fields = fields
+
+
+class ModuleChannelSerializer(serializers.Serializer):
+    """
+    Serializer d'un salon de module, à partir d'un module annoté
+    (last_seq, last_message_at, last_read_seq, unread_count)
+    """
+    module = serializers.IntegerField(source='id', read_only=True)
+    module_code = serializers.CharField(source='code', read_only=True)
+    module_name = serializers.CharField(source='name', read_only=True)
+    last_seq = serializers.IntegerField(read_only=True)
+    last_message_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    last_read_seq = serializers.IntegerField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+
+
+class ChannelMessageSerializer(serializers.ModelSerializer):
+    """
+    Serializer pour les messages d'un salon de module
+    """
+    sender_name = serializers.CharField(source='sender.get_full_name', read_only=True)
+    sender_username = serializers.CharField(source='sender.username', read_only=True)
+    
+    class Meta:
+        model = ChannelMessage
+        fields = ['id', 'seq', 'sender', 'sender_name', 'sender_username', 'message', 'created_at']
+        read_only_fields = ['id', 'seq', 'sender', 'created_at']
+        extra_kwargs = {'message': {'max_length': 5000}}
+
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
+    """
+    Serializer pour les préférences de notification (masques exposés sous forme de listes)
+    """
+    muted_types = serializers.ListField(
+        source='muted_type_list',
+        child=serializers.ChoiceField(choices=Notification.NOTIFICATION_TYPE_CHOICES),
+        required=False
+    )
+    muted_modules = serializers.PrimaryKeyRelatedField(
+        source='muted_module_ids',
+        queryset=Module.objects.all(),
+        many=True,
+        required=False
+    )
+    
+    class Meta:
+        model = NotificationPreference
+        fields = ['muted_types', 'muted_modules', 'updated_at']
+        read_only_fields = ['updated_at']
+    
+    def to_representation(self, instance):
+        return {
+            'muted_types': instance.muted_type_list,
+            'muted_modules': instance.muted_module_ids,
+            'updated_at': instance.updated_at,
+        }
+    
+    def update(self, instance, validated_data):
+        if 'muted_type_list' in validated_data:
+            instance.muted_type_list = validated_data['muted_type_list']
+        if 'muted_module_ids' in validated_data:
+            instance.muted_module_ids = [module.id for module in validated_data['muted_module_ids']]
+        instance.save()
+        return instance
+
+
 class ChatMessageCreateSerializer(serializers.Serializer):
     """
     Serializer simplifié pour créer un message
@@ -607,7 +738,8 @@ class NotificationSerializer(serializers.ModelSerializer):
             'id', 'recipient', 'recipient_name', 'recipient_username',
             'notification_type', 'notification_type_display', 'title', 'content',
             'link', 'related_module', 'related_module_code', 'related_module_name',
-            'related_grade', 'related_announcement', 'is_read', 'read_at', 'created_at'
+            'related_grade', 'related_announcement', 'related_session', 'related_user', 'count',
+            'is_read', 'read_at', 'created_at'
         ]
-        read_only_fields = ['id', 'recipient', 'is_read', 'read_at', 'created_at']
+        read_only_fields = ['id', 'recipient', 'related_user', 'count', 'is_read', 'read_at', 'created_at']
 
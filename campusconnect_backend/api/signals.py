@@ -0,0 +1,142 @@
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .feeds import feed_scope, invalidate_feeds
+from .grading import invalidate_module_rankings
+from .models import Announcement, AnnouncementReadState, Enrollment, Grade, Module
+
+
+def _refresh_enrollment_grade(student_id, module_id):
+    """Recalculer la note finale de l'inscription (étudiant, module)"""
+    Enrollment.objects.filter(
+        student_id=student_id,
+        module_id=module_id
+    ).refresh_final_grades()
+
+
+@receiver(pre_save, sender=Grade)
+def remember_grade_enrollment(sender, instance, **kwargs):
+    """
+    Mémoriser l'étudiant et le module d'origine d'une note modifiée,
+    pour recalculer aussi l'ancienne inscription si la note a été déplacée
+    """
+    if instance.pk is None:
+        instance._previous_enrollment = None
+        return
+    instance._previous_enrollment = (
+        Grade.objects
+        .filter(pk=instance.pk)
+        .values_list('student_id', 'module_id')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Grade)
+def refresh_final_grade_on_save(sender, instance, raw=False, **kwargs):
+    """Mettre à jour Enrollment.grade après la création ou la modification d'une note"""
+    if raw:
+        return
+    _refresh_enrollment_grade(instance.student_id, instance.module_id)
+    
+    previous = getattr(instance, '_previous_enrollment', None)
+    if previous and previous != (instance.student_id, instance.module_id):
+        _refresh_enrollment_grade(*previous)
+
+
+@receiver(post_delete, sender=Grade)
+def refresh_final_grade_on_delete(sender, instance, **kwargs):
+    """Mettre à jour Enrollment.grade après la suppression d'une note"""
+    _refresh_enrollment_grade(instance.student_id, instance.module_id)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_ranking_on_enrollment_change(sender, instance, **kwargs):
+    """Une inscription modifiée (note, statut) rend le classement du module obsolète"""
+    invalidate_module_rankings([instance.module_id])
+
+
+def _adjust_audience_sizes(module_id, student, delta):
+    """
+    Répercuter l'entrée (delta=1) ou la sortie (delta=-1) d'un étudiant du public
+    des annonces déjà diffusées du module (voir Announcement.audience)
+    """
+    if not student.is_active:
+        return
+    (
+        AnnouncementReadState.objects
+        .filter(announcement__module_id=module_id, audience_size__isnull=False)
+        .filter(
+            Q(announcement__target_audience__isnull=True)
+            | Q(announcement__target_audience='')
+            | Q(announcement__target_audience=student.role)
+        )
+        .exclude(announcement__author_id=student.pk)
+        .update(audience_size=Greatest(F('audience_size') + delta, 0))
+    )
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_enrollment_membership(sender, instance, **kwargs):
+    """Mémoriser le module et le statut d'origine d'une inscription modifiée"""
+    if instance.pk is None:
+        instance._previous_membership = None
+        return
+    instance._previous_membership = (
+        Enrollment.objects
+        .filter(pk=instance.pk)
+        .values_list('module_id', 'is_active')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Enrollment)
+def update_audience_on_enrollment_save(sender, instance, raw=False, **kwargs):
+    """Tenir à jour la taille du public des annonces de module (pas de recomptage à la lecture)"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_membership', None)
+    current = (instance.module_id, instance.is_active)
+    if previous == current:
+        return
+    if previous and previous[1]:
+        _adjust_audience_sizes(previous[0], instance.student, -1)
+    if instance.is_active:
+        _adjust_audience_sizes(instance.module_id, instance.student, 1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def update_audience_on_enrollment_delete(sender, instance, **kwargs):
+    """Une inscription active supprimée sort l'étudiant du public des annonces du module"""
+    if instance.is_active:
+        _adjust_audience_sizes(instance.module_id, instance.student, -1)
+
+
+@receiver(pre_save, sender=Announcement)
+def remember_announcement_module(sender, instance, **kwargs):
+    """Mémoriser le module d'origine d'une annonce modifiée (changement de fil)"""
+    if instance.pk is None:
+        instance._previous_feed_scope = None
+        return
+    previous = Announcement.objects.filter(pk=instance.pk).values_list('module_id', flat=True)
+    instance._previous_feed_scope = feed_scope(previous[0]) if previous else None
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def invalidate_announcement_feeds(sender, instance, **kwargs):
+    """Invalider le fil de l'annonce (et l'ancien fil si elle a changé de module)"""
+    scopes = [feed_scope(instance.module_id)]
+    previous = getattr(instance, '_previous_feed_scope', None)
+    if previous is not None:
+        scopes.append(previous)
+    invalidate_feeds(scopes)
+
+
+@receiver(post_save, sender=Module)
+def invalidate_module_feed(sender, instance, created=False, **kwargs):
+    """Le fil sérialisé contient le code et le nom du module"""
+    if not created:
+        invalidate_feeds([instance.pk])
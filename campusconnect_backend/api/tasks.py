@@ -0,0 +1,223 @@
+"""
+Exécution des traitements différés (hors du thread de la requête).
+
+Deux backends, choisis par settings.BACKGROUND_TASK_BACKEND :
+- 'thread' : pool de threads du processus web (aucune infrastructure, tâches perdues
+  si le processus s'arrête) ;
+- 'database' : file d'attente stockée en base (modèle Task), exécutée par la commande
+  runworker, avec nouvelles tentatives et suivi des échecs. Aucun broker n'est nécessaire.
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+            thread_name_prefix='campusconnect-task'
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Échec de la tâche d'arrière-plan %s", func.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Exécuter func(*args, **kwargs) en arrière-plan, une fois la transaction courante
+    validée (les données créées par la requête sont alors visibles).
+    Avec le backend 'database', les arguments doivent être sérialisables en JSON.
+    """
+    if getattr(settings, 'BACKGROUND_TASK_BACKEND', 'thread') == 'database':
+        enqueue(func, *args, **kwargs)
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args, kwargs))
+
+
+# ==================== FILE D'ATTENTE EN BASE ====================
+
+def task_name(func):
+    """Chemin pointé d'une fonction de module"""
+    return func if isinstance(func, str) else f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, run_at=None, max_attempts=None, **kwargs):
+    """
+    Ajouter une tâche à la file. L'insertion fait partie de la transaction courante :
+    la tâche n'est visible des workers qu'après le commit, et disparaît avec un rollback.
+    """
+    return Task.objects.create(
+        name=task_name(func),
+        args=list(args),
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or getattr(settings, 'TASK_MAX_ATTEMPTS', 5)
+    )
+
+
+def retry_delay(attempts):
+    """Délai avant la tentative suivante : croissance exponentielle, plafonnée"""
+    base = getattr(settings, 'TASK_RETRY_BASE_DELAY', 10)
+    maximum = getattr(settings, 'TASK_RETRY_MAX_DELAY', 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), maximum))
+
+
+def claim_tasks(worker_id, limit=1, names=None):
+    """
+    Réserver jusqu'à limit tâches dues pour ce worker (limitées aux fonctions names si fourni).
+    - Avec SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL, MySQL 8, Oracle) : les workers
+      concurrents ignorent les lignes déjà verrouillées au lieu de les attendre.
+    - Sinon (SQLite) : mise à jour conditionnelle (compare-and-set) sur le statut,
+      une seule réservation réussit pour chaque tâche.
+    """
+    now = timezone.now()
+    due = Task.objects.filter(status='pending', run_at__lte=now).order_by('run_at', 'id')
+    if names is not None:
+        due = due.filter(name__in=[task_name(name) for name in names])
+    claim = {
+        'status': 'running',
+        'locked_at': now,
+        'locked_by': worker_id,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Task.objects.filter(id__in=ids).update(**claim)
+    else:
+        ids = [
+            task_id
+            for task_id in due.values_list('id', flat=True)[:limit]
+            if Task.objects.filter(id=task_id, status='pending').update(**claim)
+        ]
+    return list(Task.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def heartbeat_interval():
+    """Intervalle (secondes) de rafraîchissement de la réservation d'une tâche en cours"""
+    return getattr(settings, 'TASK_HEARTBEAT_INTERVAL', None) or getattr(settings, 'TASK_LOCK_TIMEOUT', 600) / 3
+
+
+def _refresh_lock(owned, stop, interval):
+    """
+    Rafraîchir locked_at toutes les interval secondes jusqu'à stop (thread dédié,
+    avec sa propre connexion). S'arrête si la tâche n'est plus réservée par ce worker.
+    """
+    try:
+        while not stop.wait(interval):
+            if not owned.update(locked_at=timezone.now()):
+                return
+    except Exception:
+        logger.exception("Échec du rafraîchissement de la réservation de la tâche")
+    finally:
+        connection.close()
+
+
+@contextmanager
+def heartbeat(owned):
+    """
+    Maintenir la réservation d'une tâche pendant son exécution : une tâche longue
+    n'est pas considérée comme abandonnée par release_stale_tasks
+    """
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=_refresh_lock,
+        args=(owned, stop, heartbeat_interval()),
+        name='campusconnect-task-heartbeat',
+        daemon=True
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def execute_task(task):
+    """
+    Exécuter une tâche réservée. En cas d'erreur, la tâche est reprogrammée avec un délai
+    croissant, puis marquée en échec une fois max_attempts atteint.
+    Pendant l'exécution, locked_at est rafraîchi périodiquement (voir heartbeat).
+    Les mises à jour finales ne s'appliquent que si la tâche est toujours réservée par
+    ce worker : une tâche relâchée (release_stale_tasks) puis reprise par un autre
+    worker n'est pas écrasée par un worker en retard.
+    """
+    owned = Task.objects.filter(pk=task.pk, status='running', locked_by=task.locked_by)
+    close_old_connections()
+    try:
+        func = import_string(task.name)
+        with heartbeat(owned):
+            func(*task.args, **task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if task.attempts >= task.max_attempts:
+            logger.error("Tâche %s (%s) en échec après %s tentative(s)", task.pk, task.name, task.attempts)
+            owned.update(status='failed', last_error=error, finished_at=now, updated_at=now)
+        else:
+            logger.warning("Tâche %s (%s) : tentative %s échouée", task.pk, task.name, task.attempts)
+            owned.update(
+                status='pending', last_error=error, run_at=now + retry_delay(task.attempts),
+                locked_at=None, locked_by='', updated_at=now
+            )
+        return False
+    else:
+        now = timezone.now()
+        owned.update(status='succeeded', finished_at=now, updated_at=now)
+        return True
+    finally:
+        close_old_connections()
+
+
+def release_stale_tasks():
+    """
+    Remettre en attente les tâches réservées par un worker arrêté brutalement
+    (réservation non rafraîchie depuis plus de TASK_LOCK_TIMEOUT secondes), ou les marquer en échec si
+    elles ont épuisé leurs tentatives (une tâche qui fait tomber le worker ne doit pas
+    être relancée indéfiniment). Retourne le nombre de tâches traitées.
+    """
+    timeout = timedelta(seconds=getattr(settings, 'TASK_LOCK_TIMEOUT', 600))
+    now = timezone.now()
+    stale = Task.objects.filter(status='running', locked_at__lt=now - timeout)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', last_error='Worker arrêté pendant l\'exécution (délai de réservation dépassé).',
+        locked_at=None, locked_by='', finished_at=now, updated_at=now
+    )
+    return failed + stale.update(
+        status='pending', locked_at=None, locked_by='', run_at=now, updated_at=now
+    )
+
+
+def retry_failed_tasks(queryset):
+    """Relancer des tâches en échec (compteur de tentatives remis à zéro)"""
+    now = timezone.now()
+    return queryset.filter(status='failed').update(
+        status='pending', attempts=0, run_at=now, finished_at=None, updated_at=now
+    )
@@ -0,0 +1,36 @@
+"""
+Utilitaires partagés par les tests de l'API
+"""
+from rest_framework.test import APIClient
+
+from api.models import ChatMessage, Conversation, Enrollment, Module, User
+
+
+def create_user(username, role='student', **fields):
+    return User.objects.create_user(username=username, password='motdepasse', role=role, **fields)
+
+
+def create_module(code, teacher, **fields):
+    fields.setdefault('name', f'Module {code}')
+    fields.setdefault('credits', 3)
+    fields.setdefault('semester', 'S1')
+    return Module.objects.create(code=code, teacher=teacher, **fields)
+
+
+def enroll(student, module, **fields):
+    return Enrollment.objects.create(student=student, module=module, **fields)
+
+
+def send_message(sender, recipient, message='Bonjour', **fields):
+    """Message de chat enregistré comme par l'API (conversation mise à jour)"""
+    chat_message = ChatMessage.objects.create(sender=sender, recipient=recipient, message=message, **fields)
+    Conversation.record_message(chat_message)
+    return chat_message
+
+
+def api_client(user=None):
+    """Client de l'API authentifié (sans jeton) pour user"""
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
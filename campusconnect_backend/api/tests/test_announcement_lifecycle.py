@@ -0,0 +1,156 @@
+"""
+Tests de la publication programmée et de l'expiration des annonces
+"""
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import Announcement, Notification, Task
+from api.notifications import fan_out_announcement
+from api.tasks import task_name
+
+from .helpers import api_client, create_module, create_user, enroll
+
+
+class AnnouncementExpiryTests(TestCase):
+    def setUp(self):
+        self.teacher = create_user('prof', role='teacher')
+        self.module = create_module('INF101', self.teacher)
+        now = timezone.now()
+        self.expired = self.create_announcement('Expirée', expiry_date=now - timedelta(minutes=1))
+        self.current = self.create_announcement('En cours', expiry_date=now + timedelta(days=1))
+        self.deactivated = self.create_announcement('Désactivée', is_active=False)
+    
+    def create_announcement(self, title, **fields):
+        return Announcement.objects.create(
+            author=self.teacher, module=self.module, title=title, content='Contenu', **fields
+        )
+    
+    def test_expire_due_marks_only_expired_announcements(self):
+        self.assertEqual(Announcement.objects.expire_due(), 1)
+        
+        self.expired.refresh_from_db()
+        self.current.refresh_from_db()
+        self.deactivated.refresh_from_db()
+        self.assertFalse(self.expired.is_active)
+        self.assertIsNotNone(self.expired.expired_at)
+        self.assertTrue(self.current.is_active)
+        self.assertIsNone(self.current.expired_at)
+        # Une désactivation manuelle reste distincte d'une expiration
+        self.assertIsNone(self.deactivated.expired_at)
+    
+    def test_expire_due_is_idempotent(self):
+        Announcement.objects.expire_due()
+        expired_at = Announcement.objects.get(pk=self.expired.pk).expired_at
+        
+        self.assertEqual(Announcement.objects.expire_due(), 0)
+        self.assertEqual(Announcement.objects.get(pk=self.expired.pk).expired_at, expired_at)
+    
+    def test_expire_due_in_batches(self):
+        past = timezone.now() - timedelta(minutes=1)
+        for index in range(4):
+            self.create_announcement(f'Lot {index}', expiry_date=past)
+        
+        self.assertEqual(Announcement.objects.expire_due(batch_size=2), 5)
+        self.assertEqual(Announcement.objects.filter(expired_at__isnull=False).count(), 5)
+    
+    def test_command(self):
+        output = io.StringIO()
+        call_command('expire_announcements', stdout=output)
+        
+        self.assertIn('1 annonce(s) expirée(s) désactivée(s).', output.getvalue())
+        self.assertFalse(Announcement.objects.get(pk=self.expired.pk).is_active)
+    
+    def test_reactivation_clears_expired_at(self):
+        Announcement.objects.expire_due()
+        
+        response = api_client(self.teacher).patch(
+            f'/api/announcements/{self.expired.pk}/',
+            {'is_active': True, 'expiry_date': (timezone.now() + timedelta(days=1)).isoformat()},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_active'])
+        self.assertIsNone(response.data['expired_at'])
+        self.assertFalse(response.data['is_expired'])
+        self.assertTrue(response.data['is_visible'])
+    
+    def test_serialized_flags_follow_expired_at(self):
+        client = api_client(self.teacher)
+        # Date d'expiration passée mais pas encore traitée : l'annonce reste visible
+        response = client.get(f'/api/announcements/{self.expired.pk}/')
+        self.assertFalse(response.data['is_expired'])
+        self.assertTrue(response.data['is_visible'])
+        
+        Announcement.objects.expire_due()
+        response = client.get(f'/api/announcements/{self.expired.pk}/')
+        self.assertTrue(response.data['is_expired'])
+        self.assertFalse(response.data['is_visible'])
+        
+        # Désactivation manuelle : invisible sans être expirée
+        response = client.get(f'/api/announcements/{self.deactivated.pk}/')
+        self.assertFalse(response.data['is_expired'])
+        self.assertFalse(response.data['is_visible'])
+
+
+class AnnouncementPublicationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = create_user('prof', role='teacher')
+        self.student = create_user('etudiant')
+        self.module = create_module('INF101', self.teacher)
+        enroll(self.student, self.module)
+        past = timezone.now() - timedelta(minutes=1)
+        self.scheduled = [
+            Announcement.objects.create(
+                author=self.teacher, module=self.module, title=f'Programmée {index}',
+                content='Contenu', is_active=False, publish_at=past
+            )
+            for index in range(3)
+        ]
+        self.future = Announcement.objects.create(
+            author=self.teacher, module=self.module, title='Plus tard', content='Contenu',
+            is_active=False, publish_at=timezone.now() + timedelta(days=1)
+        )
+    
+    def test_publish_due_is_idempotent(self):
+        published = Announcement.objects.publish_due(batch_size=2)
+        
+        self.assertCountEqual(published, [announcement.pk for announcement in self.scheduled])
+        self.assertEqual(Announcement.objects.publish_due(), [])
+        self.assertEqual(Announcement.objects.filter(is_active=True).count(), 3)
+        self.assertFalse(Announcement.objects.get(pk=self.future.pk).is_active)
+        # Une seule diffusion en file par annonce publiée
+        self.assertEqual(Task.objects.filter(name=task_name(fan_out_announcement)).count(), 3)
+    
+    def test_feed_is_warm_at_release(self):
+        Announcement.objects.publish_due()
+        
+        feed = cache.get(f'announcements:feed:v2:{self.module.id}')
+        self.assertEqual(feed['total'], 3)
+        self.assertEqual(len(feed['entries']), 3)
+    
+    def test_failed_enqueue_rolls_back_publication(self):
+        with mock.patch('api.tasks.enqueue', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Announcement.objects.publish_due()
+        
+        self.assertFalse(Announcement.objects.filter(is_active=True).exists())
+        self.assertFalse(Task.objects.exists())
+    
+    def test_command_notifies_once(self):
+        outputs = [io.StringIO(), io.StringIO()]
+        for output in outputs:
+            call_command('publish_announcements', stdout=output)
+        
+        self.assertIn('3 annonce(s) publiée(s), 3 diffusion(s) effectuée(s), 0 en échec.', outputs[0].getvalue())
+        self.assertIn('0 annonce(s) publiée(s)', outputs[1].getvalue())
+        
+        self.assertEqual(Notification.objects.filter(recipient=self.student).count(), 3)
+        self.assertEqual(Task.objects.filter(status='succeeded').count(), 3)
@@ -0,0 +1,136 @@
+"""
+Tests de l'archivage à froid (messages de chat et notifications)
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.archive import (
+    MESSAGES_ARCHIVE, archive_chat_messages, archive_notifications, read_archive, write_archive
+)
+from api.models import ChatMessage, Conversation, Notification
+
+from .helpers import api_client, create_user, send_message
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root)
+        override = override_settings(ARCHIVE_ROOT=self.archive_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        
+        self.user = create_user('moi')
+        self.other = create_user('autre')
+        # Messages lus sur trois mois, le plus ancien d'abord
+        start = timezone.now() - timedelta(days=400)
+        self.messages = []
+        for index in range(6):
+            message = send_message(self.other, self.user, f'Message {index}', is_read=True)
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=start + timedelta(days=20 * index))
+            self.messages.append(message)
+        self.conversation = Conversation.for_users(self.user.id, self.other.id)
+        self.client = api_client(self.user)
+    
+    def archive_messages(self):
+        return archive_chat_messages(timezone.now() - timedelta(days=180), batch_size=2)
+    
+    def test_thread_round_trip(self):
+        self.assertEqual(self.archive_messages(), 5)
+        # Le dernier message de la conversation reste en base
+        self.assertEqual(list(ChatMessage.objects.values_list('pk', flat=True)), [self.messages[-1].pk])
+        
+        self.assertEqual(self.thread(2), [f'Message {index}' for index in reversed(range(6))])
+    
+    def test_inbox_keeps_last_message(self):
+        self.archive_messages()
+        
+        response = self.client.get('/api/messages/conversations/')
+        self.assertEqual(response.data[0]['last_message']['message'], 'Message 5')
+    
+    def test_archive_is_sorted_and_deduplicated(self):
+        self.archive_messages()
+        items = read_archive(MESSAGES_ARCHIVE, self.conversation.id, limit=10)
+        
+        # Lot réécrit (suppression échouée) : pas de doublon
+        write_archive(MESSAGES_ARCHIVE, {(self.conversation.id, items[0]['created_at'][:7]): [items[0]]})
+        
+        self.assertEqual(read_archive(MESSAGES_ARCHIVE, self.conversation.id, limit=10), items)
+        self.assertEqual([item['message'] for item in items], [f'Message {index}' for index in reversed(range(5))])
+    
+    def thread(self, limit):
+        """Parcourir tout le fil page par page"""
+        url = f'/api/messages/thread/{self.other.id}/'
+        received, cursor = [], None
+        while True:
+            response = self.client.get(url, {'limit': limit, **({'before': cursor} if cursor else {})})
+            received.extend(message['message'] for message in response.data['messages'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return received
+    
+    def test_thread_merges_database_rows_older_than_archive(self):
+        # m0 non lu reste en base, plus ancien que les messages archivés m1 à m4
+        ChatMessage.objects.filter(pk=self.messages[0].pk).update(is_read=False)
+        self.archive_messages()
+        
+        for limit in (1, 2, 10):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.thread(limit), [f'Message {index}' for index in reversed(range(6))])
+    
+    def test_unread_messages_stay_in_database(self):
+        ChatMessage.objects.filter(pk=self.messages[0].pk).update(is_read=False)
+        
+        self.assertEqual(self.archive_messages(), 4)
+        self.assertTrue(ChatMessage.objects.filter(pk=self.messages[0].pk).exists())
+    
+    def test_search_reports_archived_messages(self):
+        response = self.client.get('/api/search/', {'q': 'Message', 'scope': 'messages'})
+        self.assertFalse(response.data['archived_messages_excluded'])
+        
+        self.archive_messages()
+        response = self.client.get('/api/search/', {'q': 'Message', 'scope': 'messages'})
+        self.assertTrue(response.data['archived_messages_excluded'])
+        self.assertEqual([message['message'] for message in response.data['messages']], ['Message 5'])
+    
+    def test_notification_history_round_trip(self):
+        old = timezone.now() - timedelta(days=365)
+        for index in range(3):
+            notification = Notification.objects.create(
+                recipient=self.user, notification_type='other', title=f'Notification {index}',
+                content='Contenu', is_read=True
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=old + timedelta(days=index))
+        
+        self.assertEqual(archive_notifications(timezone.now() - timedelta(days=180)), 3)
+        self.assertFalse(Notification.objects.filter(recipient=self.user, title__startswith='Notification').exists())
+        
+        response = self.client.get('/api/notifications/history/', {'limit': 10})
+        titles = [notification['title'] for notification in response.data['notifications']]
+        self.assertEqual(titles[-3:], ['Notification 2', 'Notification 1', 'Notification 0'])
+    
+    def test_notification_history_keeps_unread_older_rows(self):
+        old = timezone.now() - timedelta(days=365)
+        for index in range(4):
+            notification = Notification.objects.create(
+                recipient=self.user, notification_type='other', title=f'Notification {index}',
+                content='Contenu', is_read=index != 0
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=old + timedelta(days=index))
+        archive_notifications(timezone.now() - timedelta(days=180))
+        
+        titles, cursor = [], None
+        while True:
+            response = self.client.get('/api/notifications/history/', {'limit': 2, **({'before': cursor} if cursor else {})})
+            titles.extend(notification['title'] for notification in response.data['notifications'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(
+            [title for title in titles if title.startswith('Notification')],
+            ['Notification 3', 'Notification 2', 'Notification 1', 'Notification 0']
+        )
@@ -0,0 +1,72 @@
+"""
+Tests de l'authentification à partir des claims du jeton (TokenClaimsJWTAuthentication)
+"""
+from django.test import TestCase
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import TokenClaimsJWTAuthentication, TokenClaimsUser
+from api.models import Notification, User
+from api.views import CustomTokenObtainPairSerializer
+
+from .helpers import create_user
+
+
+class TokenClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        self.student = create_user('etudiant', email='etudiant@example.com')
+        self.factory = APIRequestFactory()
+    
+    def header(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+    
+    def claims_token(self, user):
+        return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+    
+    def authenticate(self, method, token):
+        request = getattr(self.factory, method)('/api/notifications/', **self.header(token))
+        return TokenClaimsJWTAuthentication().authenticate(request)[0]
+    
+    def test_safe_methods_use_token_claims(self):
+        with self.assertNumQueries(0):
+            user = self.authenticate('get', self.claims_token(self.student))
+        
+        self.assertIsInstance(user, TokenClaimsUser)
+        self.assertEqual((user.id, user.username, user.role, user.email), (
+            self.student.id, 'etudiant', 'student', 'etudiant@example.com'
+        ))
+    
+    def test_role_helpers_are_properties(self):
+        user = self.authenticate('get', self.claims_token(self.student))
+        
+        self.assertIs(user.is_student, True)
+        self.assertIs(user.is_teacher, False)
+        self.assertIs(user.is_admin, False)
+    
+    def test_writes_load_the_user(self):
+        user = self.authenticate('post', self.claims_token(self.student))
+        
+        self.assertIsInstance(user, User)
+    
+    def test_token_without_claims_loads_the_user(self):
+        user = self.authenticate('get', str(AccessToken.for_user(self.student)))
+        
+        self.assertIsInstance(user, User)
+    
+    def test_view_filters_on_token_user(self):
+        Notification.objects.create(recipient=self.student, notification_type='other', title='A moi', content='.')
+        Notification.objects.create(
+            recipient=create_user('autre'), notification_type='other', title='Pas a moi', content='.'
+        )
+        client = APIClient()
+        
+        response = client.get('/api/notifications/', **self.header(self.claims_token(self.student)))
+        
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if 'results' in response.data else response.data
+        self.assertEqual([notification['title'] for notification in results], ['A moi'])
+    
+    def test_invalid_token(self):
+        response = APIClient().get('/api/notifications/', **self.header('jeton-invalide'))
+        
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,97 @@
+"""
+Tests des salons de discussion des modules (ModuleChannel, ChannelMembership)
+"""
+from django.test import TestCase
+
+from api.models import ChannelMembership, ChannelMessage, ModuleChannel
+
+from .helpers import api_client, create_module, create_user, enroll
+
+
+class ModuleChannelTests(TestCase):
+    def setUp(self):
+        self.teacher = create_user('prof', role='teacher')
+        self.module = create_module('INF101', self.teacher)
+        self.students = [create_user(f'etudiant{index}') for index in range(2)]
+        for student in self.students:
+            enroll(student, self.module)
+        self.url = f'/api/channels/{self.module.id}/'
+    
+    def post(self, user, text='Bonjour'):
+        return api_client(user).post(f'{self.url}messages/', {'message': text}, format='json')
+    
+    def channels(self, user):
+        return {item['module']: item for item in api_client(user).get('/api/channels/').data}
+    
+    def test_post_message(self):
+        response = self.post(self.students[0], 'Question')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['seq'], 1)
+        self.assertEqual(response.data['sender'], self.students[0].id)
+        self.assertEqual(ChannelMessage.objects.get().message, 'Question')
+        self.assertEqual(self.post(self.students[0], '').status_code, 400)
+    
+    def test_seq_and_read_position_advance(self):
+        for index in range(3):
+            self.post(self.teacher, f'Message {index}')
+        channel = ModuleChannel.objects.get(module=self.module)
+        
+        self.assertEqual(channel.last_seq, 3)
+        self.assertEqual(list(channel.messages.order_by('seq').values_list('seq', flat=True)), [1, 2, 3])
+        # L'auteur a lu ses propres messages
+        self.assertEqual(ChannelMembership.objects.get(channel=channel, user=self.teacher).last_read_seq, 3)
+        
+        client = api_client(self.students[0])
+        response = client.post(f'{self.url}read/', {'up_to': 2}, format='json')
+        self.assertEqual(response.data, {'last_read_seq': 2, 'unread_count': 1})
+        # La position ne recule jamais et ne dépasse pas le dernier message
+        self.assertEqual(client.post(f'{self.url}read/', {'up_to': 1}, format='json').data['last_read_seq'], 2)
+        self.assertEqual(client.post(f'{self.url}read/', {'up_to': 99}, format='json').data['last_read_seq'], 3)
+        self.assertEqual(client.post(f'{self.url}read/', {'up_to': 'x'}, format='json').status_code, 400)
+    
+    def test_unread_counts(self):
+        self.post(self.teacher)
+        self.post(self.students[1])
+        
+        self.assertEqual(self.channels(self.students[0])[self.module.id]['unread_count'], 2)
+        self.assertEqual(self.channels(self.students[1])[self.module.id]['unread_count'], 0)
+        self.assertEqual(self.channels(self.teacher)[self.module.id]['unread_count'], 1)
+        
+        api_client(self.students[0]).post(f'{self.url}read/')
+        self.assertEqual(self.channels(self.students[0])[self.module.id]['unread_count'], 0)
+    
+    def test_membership(self):
+        outsider = create_user('exterieur')
+        dropped = create_user('abandon')
+        enroll(dropped, self.module, is_active=False)
+        colleague = create_user('collegue', role='teacher')
+        
+        for user in (outsider, dropped, colleague):
+            self.assertEqual(self.post(user).status_code, 403)
+            self.assertEqual(api_client(user).get(f'{self.url}messages/').status_code, 403)
+            self.assertNotIn(self.module.id, self.channels(user))
+        
+        admin = create_user('admin', role='admin')
+        self.assertEqual(self.post(self.teacher).status_code, 201)
+        self.assertEqual(self.post(admin).status_code, 201)
+        self.assertIn(self.module.id, self.channels(admin))
+    
+    def test_before_pagination(self):
+        for index in range(5):
+            self.post(self.teacher, f'Message {index}')
+        client = api_client(self.students[0])
+        
+        response = client.get(f'{self.url}messages/', {'limit': 2})
+        self.assertEqual([message['seq'] for message in response.data['messages']], [5, 4])
+        self.assertEqual(response.data['next_before'], 4)
+        self.assertEqual(response.data['last_seq'], 5)
+        self.assertEqual(response.data['last_read_seq'], 0)
+        
+        response = client.get(f'{self.url}messages/', {'limit': 2, 'before': 4})
+        self.assertEqual([message['seq'] for message in response.data['messages']], [3, 2])
+        response = client.get(f'{self.url}messages/', {'limit': 2, 'before': 2})
+        self.assertEqual([message['seq'] for message in response.data['messages']], [1])
+        self.assertIsNone(response.data['next_before'])
+        
+        self.assertEqual(client.get(f'{self.url}messages/', {'before': 'x'}).status_code, 400)
@@ -0,0 +1,73 @@
+from django.test import TestCase
+
+from api.counters import (
+    MESSAGES, NOTIFICATIONS, decrement_unread, get_unread_count, increment_unread, reconcile_unread_counters
+)
+from api.models import Notification, UnreadCounter
+
+from .helpers import api_client, create_user, send_message
+
+
+class UnreadCounterTests(TestCase):
+    """Compteurs de non lus dénormalisés (UnreadCounter)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('etudiant')
+
+    def notify(self):
+        return Notification.create_for_user(self.user, 'other', 'Titre', 'Contenu')
+
+    def test_counter_follows_creations(self):
+        self.assertEqual(get_unread_count(NOTIFICATIONS, self.user.id), 0)
+        self.notify()
+        self.notify()
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).notifications, 2)
+        with self.assertNumQueries(1):
+            # Une lecture par clé primaire, aucun COUNT
+            self.assertEqual(get_unread_count(NOTIFICATIONS, self.user.id), 2)
+
+    def test_missing_counter_is_initialized_from_database(self):
+        Notification.objects.create(recipient=self.user, title='Titre', content='Contenu')
+        send_message(create_user('autre'), self.user)
+        UnreadCounter.objects.all().delete()
+
+        self.assertEqual(get_unread_count(NOTIFICATIONS, self.user.id), 1)
+        self.assertEqual(get_unread_count(MESSAGES, self.user.id), 1)
+        self.assertTrue(UnreadCounter.objects.filter(user=self.user).exists())
+
+    def test_decrement_never_goes_negative(self):
+        increment_unread(NOTIFICATIONS, [self.user.id])
+        decrement_unread(NOTIFICATIONS, self.user.id, 5)
+
+        self.assertEqual(get_unread_count(NOTIFICATIONS, self.user.id), 0)
+
+    def test_marking_read_twice_decrements_once(self):
+        notification = self.notify()
+        self.notify()
+        client = api_client(self.user)
+
+        client.post(f'/api/notifications/{notification.id}/mark_as_read/')
+        client.post(f'/api/notifications/{notification.id}/mark_as_read/')
+        self.assertEqual(get_unread_count(NOTIFICATIONS, self.user.id), 1)
+
+        client.post('/api/notifications/mark_all_as_read/')
+        self.assertEqual(get_unread_count(NOTIFICATIONS, self.user.id), 0)
+
+    def test_counters_follow_messages(self):
+        other = create_user('autre')
+        message = send_message(other, self.user)
+        send_message(other, self.user)
+        self.assertEqual(get_unread_count(MESSAGES, self.user.id), 2)
+
+        message.mark_as_read()
+        message.mark_as_read()
+        self.assertEqual(get_unread_count(MESSAGES, self.user.id), 1)
+
+    def test_reconcile(self):
+        self.notify()
+        UnreadCounter.objects.filter(user=self.user).update(notifications=7)
+
+        self.assertEqual(reconcile_unread_counters(NOTIFICATIONS, [self.user.id]), 1)
+        self.assertEqual(get_unread_count(NOTIFICATIONS, self.user.id), 1)
+        self.assertEqual(reconcile_unread_counters(NOTIFICATIONS, [self.user.id]), 0)
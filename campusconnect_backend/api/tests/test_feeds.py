@@ -0,0 +1,101 @@
+"""
+Tests du fil d'annonces des étudiants (fils en cache et repli sur la base)
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import Announcement
+
+from .helpers import api_client, create_module, create_user, enroll
+
+
+@override_settings(ANNOUNCEMENT_FEED_SIZE=2)
+class StudentFeedWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = create_user('prof', role='teacher')
+        self.student = create_user('etudiant')
+        self.module = create_module('INF101', self.teacher)
+        enroll(self.student, self.module)
+        
+        # Six annonces, du plus récent (0) au plus ancien (5), alternant module et fil général
+        now = timezone.now()
+        self.announcements = []
+        for index in range(6):
+            announcement = Announcement.objects.create(
+                author=self.teacher,
+                title=f'Annonce {index}',
+                content='Contenu',
+                module=self.module if index % 2 == 0 else None,
+                priority='high' if index == 4 else 'normal',
+            )
+            Announcement.objects.filter(pk=announcement.pk).update(
+                published_date=now - timedelta(hours=index)
+            )
+            self.announcements.append(announcement)
+        self.client = api_client(self.student)
+    
+    def titles(self, response):
+        results = response.data['results'] if 'results' in response.data else response.data
+        return [announcement['title'] for announcement in results]
+    
+    def test_full_list_beyond_cached_window(self):
+        response = self.client.get('/api/announcements/my/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response), [f'Annonce {index}' for index in range(6)])
+    
+    def test_page_inside_window_is_served_with_feed_count(self):
+        self.client.get('/api/announcements/', {'limit': 2})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/announcements/', {'limit': 2})
+        
+        self.assertEqual(self.titles(response), ['Annonce 0', 'Annonce 1'])
+        self.assertEqual(response.data['count'], 6)
+        # Total lu dans les fils en cache : ni COUNT ni lecture des annonces
+        self.assertFalse([query for query in queries if 'api_announcement' in query['sql']])
+    
+    def test_cache_and_database_agree_on_expired_announcements(self):
+        # Expirée mais pas encore désactivée par expire_announcements : visible partout
+        Announcement.objects.filter(pk=self.announcements[0].pk).update(
+            expiry_date=timezone.now() - timedelta(minutes=1)
+        )
+        cached = self.client.get('/api/announcements/', {'limit': 2})
+        database = self.client.get('/api/announcements/my/', {'limit': 2, 'offset': 4})
+        self.assertEqual(self.titles(cached), ['Annonce 0', 'Annonce 1'])
+        self.assertEqual(cached.data['count'], database.data['count'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.expire_due()
+        cached = self.client.get('/api/announcements/', {'limit': 2})
+        database = self.client.get('/api/announcements/my/', {'limit': 2, 'offset': 3})
+        self.assertEqual(self.titles(cached), ['Annonce 1', 'Annonce 2'])
+        self.assertEqual(self.titles(database), ['Annonce 4', 'Annonce 5'])
+        self.assertEqual(cached.data['count'], 5)
+        self.assertEqual(database.data['count'], 5)
+    
+    def test_page_beyond_window_is_read_from_database(self):
+        response = self.client.get('/api/announcements/my/', {'limit': 2, 'offset': 4})
+        
+        self.assertEqual(self.titles(response), ['Annonce 4', 'Annonce 5'])
+        self.assertEqual(response.data['count'], 6)
+    
+    def test_filter_matches_announcements_outside_window(self):
+        response = self.client.get('/api/announcements/my/', {'priority': 'high'})
+        
+        self.assertEqual(self.titles(response), ['Annonce 4'])
+    
+    def test_module_filter(self):
+        response = self.client.get('/api/announcements/my/', {'module': self.module.id})
+        
+        self.assertEqual(self.titles(response), ['Annonce 0', 'Annonce 2', 'Annonce 4'])
+    
+    def test_invalid_module_filter(self):
+        response = self.client.get('/api/announcements/my/', {'module': 'abc'})
+        
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from api.models import Grade
+
+from .helpers import api_client, create_module, create_user, enroll
+
+
+class GradeImportTests(TestCase):
+    """Import CSV des notes : lignes rejetées, rapport privé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = create_user('prof', role='teacher')
+        cls.other_teacher = create_user('autre', role='teacher')
+        cls.module = create_module('INF101', cls.teacher)
+        cls.students = [create_user(f'etudiant{index}') for index in range(3)]
+        for student in cls.students:
+            enroll(student, cls.module)
+
+    def setUp(self):
+        self.private_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.private_root, ignore_errors=True)
+        settings_override = override_settings(PRIVATE_MEDIA_ROOT=self.private_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def post_csv(self, content, name='notes.csv', user=None):
+        upload = SimpleUploadedFile(name, content.encode('utf-8'), content_type='text/csv')
+        return api_client(user or self.teacher).post(
+            '/api/grades/import/',
+            {'file': upload, 'module': self.module.id},
+            format='multipart'
+        )
+
+    def test_valid_rows_are_imported(self):
+        response = self.post_csv('username;grade\netudiant0;12,5\netudiant1;18\n')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'], 0)
+        self.assertIsNone(response.data['error_report_url'])
+        self.assertEqual(Grade.objects.get(student=self.students[0]).grade, Decimal('12.50'))
+
+    def test_invalid_rows_are_reported(self):
+        response = self.post_csv(
+            'username,grade,max_grade\n'
+            'inconnu,10,\n'
+            'etudiant0,abc,\n'
+            'etudiant0,NaN,\n'
+            'etudiant0,25,\n'
+            'etudiant0,-1,\n'
+            'etudiant1,12.345,\n'
+            'etudiant1,10,1000\n'
+            'etudiant2,15,\n'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], 7)
+
+        report = api_client(self.teacher).get(response.data['error_report_url'])
+        self.assertEqual(report.status_code, 200)
+        lines = b''.join(report.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'ligne,etudiant,erreur')
+        self.assertEqual([line.split(',', 1)[0] for line in lines[1:]], ['2', '3', '4', '5', '6', '7', '8'])
+        self.assertIn('après', lines[6])
+        self.assertIn('avant la virgule', lines[7])
+
+    def test_report_is_private(self):
+        response = self.post_csv('username,grade\ninconnu,10\n')
+        url = response.data['error_report_url']
+        self.assertNotIn('/media/', url)
+        self.assertEqual(api_client(self.other_teacher).get(url).status_code, 403)
+        self.assertEqual(api_client(self.students[0]).get(url).status_code, 403)
+        self.assertEqual(api_client().get(url).status_code, 401)
+
+    def test_unsupported_format_is_rejected(self):
+        response = self.post_csv('username,grade\n', name='notes.txt')
+        self.assertEqual(response.status_code, 400)
+
+    def test_teacher_cannot_import_into_another_module(self):
+        response = self.post_csv('username,grade\netudiant0,10\n', user=self.other_teacher)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Grade.objects.exists())
+
+    def test_student_cannot_import(self):
+        response = self.post_csv('username,grade\netudiant0,20\n', user=self.students[0])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Grade.objects.exists())
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from api.models import Grade
+
+from .helpers import api_client, create_module, create_user
+
+
+class GradePercentageFilterTests(TestCase):
+    """Colonne générée score_percentage et filtres ?min_percentage= / ?max_percentage="""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = create_user('prof', role='teacher')
+        cls.student = create_user('etudiant')
+        cls.module = create_module('INF101', cls.teacher)
+        for grade, max_grade in ((Decimal('8'), Decimal('20')), (Decimal('15'), Decimal('20')), (Decimal('9'), Decimal('10'))):
+            Grade.objects.create(
+                student=cls.student, module=cls.module, grade_type='exam',
+                grade=grade, max_grade=max_grade, graded_by=cls.teacher
+            )
+
+    def test_generated_percentage(self):
+        percentages = sorted(Grade.objects.values_list('score_percentage', flat=True))
+        self.assertEqual(percentages, [Decimal('40'), Decimal('75'), Decimal('90')])
+
+    def test_percentage_range_filter(self):
+        response = api_client(self.teacher).get('/api/grades/', {'min_percentage': '50', 'max_percentage': '80'})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([Decimal(str(item['grade'])) for item in results], [Decimal('15')])
+
+    def test_letter_filter(self):
+        self.assertEqual(Grade.objects.with_letter('F').count(), 1)
+        self.assertEqual(Grade.objects.with_letter('A').count(), 1)
+
+    def test_invalid_percentage_is_rejected(self):
+        client = api_client(self.teacher)
+        for value in ('abc', 'NaN', 'Infinity'):
+            response = client.get('/api/grades/', {'min_percentage': value})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('min_percentage', response.data)
@@ -0,0 +1,93 @@
+"""
+Tests de la messagerie : boîte de réception et lecture des fils
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import ChatMessage, Conversation
+
+from .helpers import api_client, create_user, send_message
+
+
+class ConversationInboxTests(TestCase):
+    def setUp(self):
+        # L'utilisateur est tantôt user_low, tantôt user_high selon l'interlocuteur
+        self.before = [create_user(f'avant{index}') for index in range(2)]
+        self.user = create_user('moi')
+        self.after = [create_user(f'apres{index}') for index in range(2)]
+        
+        now = timezone.now()
+        # Activité : apres1 (la plus récente), avant0, apres0, avant1
+        for minutes, other in [(40, self.before[1]), (30, self.after[0]), (20, self.before[0]), (10, self.after[1])]:
+            send_message(other, self.user, f'Message de {other.username}')
+            Conversation.objects.filter(
+                pk=Conversation.for_users(self.user.id, other.id).pk
+            ).update(last_activity=now - timedelta(minutes=minutes))
+        send_message(self.before[0], self.after[0], 'Autre conversation')
+        self.client = api_client(self.user)
+    
+    def usernames(self, response):
+        results = response.data['results'] if 'results' in response.data else response.data
+        return [conversation['user']['username'] for conversation in results]
+    
+    def test_most_recent_first_across_both_sides(self):
+        response = self.client.get('/api/messages/conversations/')
+        
+        self.assertEqual(self.usernames(response), ['apres1', 'avant0', 'apres0', 'avant1'])
+        self.assertEqual(response.data[0]['unread_count'], 1)
+        self.assertEqual(response.data[0]['last_message']['message'], 'Message de apres1')
+    
+    def test_pagination(self):
+        response = self.client.get('/api/messages/conversations/', {'limit': 2, 'offset': 1})
+        
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(self.usernames(response), ['avant0', 'apres0'])
+        
+        response = self.client.get('/api/messages/conversations/', {'limit': 2, 'offset': 4})
+        self.assertEqual(self.usernames(response), [])
+
+
+class ThreadReadTests(TestCase):
+    def setUp(self):
+        self.user = create_user('moi')
+        self.other = create_user('autre')
+        now = timezone.now()
+        self.messages = []
+        for index in range(4):
+            message = send_message(self.other, self.user, f'Message {index}')
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=now - timedelta(minutes=10 - index))
+            message.refresh_from_db()
+            self.messages.append(message)
+        self.client = api_client(self.user)
+        self.url = f'/api/messages/thread/{self.other.id}/read/'
+    
+    def read(self, up_to):
+        return self.client.post(self.url, {'up_to': up_to}, format='json')
+    
+    def test_read_up_to_message(self):
+        response = self.read(self.messages[1].id)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'marked': 2, 'unread_count': 2})
+        # Watermark : relire jusqu'au même message ne change rien
+        self.assertEqual(self.read(self.messages[1].id).data, {'marked': 0, 'unread_count': 2})
+        self.assertEqual(self.read(self.messages[3].id).data, {'marked': 2, 'unread_count': 0})
+    
+    def test_read_up_to_date(self):
+        response = self.read(self.messages[2].created_at.isoformat())
+        
+        self.assertEqual(response.data, {'marked': 3, 'unread_count': 1})
+        self.assertFalse(ChatMessage.objects.get(pk=self.messages[3].pk).is_read)
+    
+    def test_message_of_another_conversation(self):
+        stranger = send_message(create_user('tiers'), self.user)
+        
+        self.assertEqual(self.read(stranger.id).status_code, 400)
+    
+    def test_invalid_positions(self):
+        for up_to in ['', '٣', '²', '2024-02-30T10:00:00', 'hier', '9' * 30]:
+            with self.subTest(up_to=up_to):
+                self.assertEqual(self.read(up_to).status_code, 400)
+        self.assertEqual(Conversation.for_users(self.user.id, self.other.id).unread_for(self.user.id), 4)
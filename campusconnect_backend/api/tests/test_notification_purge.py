@@ -0,0 +1,119 @@
+"""
+Tests de la purge des notifications lues (base et archives)
+"""
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.archive import NOTIFICATIONS_ARCHIVE, archive_notifications, has_archive, read_archive
+from api.checks import check_notification_retention
+from api.models import Notification
+from api.notifications import purge_read_notifications
+
+from .helpers import create_user
+
+
+@override_settings(ARCHIVE_AFTER_DAYS=180, NOTIFICATION_RETENTION_DAYS={'message': 200, 'grade': 400})
+class NotificationPurgeTests(TestCase):
+    def setUp(self):
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root)
+        override = override_settings(ARCHIVE_ROOT=self.archive_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = create_user('etudiant')
+    
+    def notify(self, notification_type, days, is_read=True):
+        notification = Notification.objects.create(
+            recipient=self.user,
+            notification_type=notification_type,
+            title=f'{notification_type} {days}',
+            content='Contenu',
+            is_read=is_read
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=days))
+        return notification
+    
+    def purge(self, *args):
+        output = io.StringIO()
+        call_command('purge_notifications', *args, stdout=output)
+        return output.getvalue()
+    
+    def titles(self):
+        return sorted(Notification.objects.values_list('title', flat=True))
+    
+    def test_cutoff_per_type(self):
+        self.notify('message', 250)
+        self.notify('message', 150)
+        self.notify('message', 250, is_read=False)
+        self.notify('grade', 250)
+        self.notify('announcement', 1000)
+        
+        output = self.purge()
+        
+        self.assertIn('message (> 200 j) : 1 notification(s)', output)
+        self.assertIn('1 notification(s) supprimée(s)', output)
+        # Non lue, plus récente que la durée de conservation ou type sans durée : conservées
+        self.assertEqual(self.titles(), ['announcement 1000', 'grade 250', 'message 150', 'message 250'])
+    
+    def test_archived_notifications_are_purged(self):
+        self.notify('message', 250)
+        self.notify('message', 190)
+        self.notify('grade', 250)
+        self.assertEqual(archive_notifications(timezone.now() - timedelta(days=180)), 3)
+        
+        output = self.purge()
+        
+        self.assertIn('1 notification(s) supprimée(s)', output)
+        archived = read_archive(NOTIFICATIONS_ARCHIVE, self.user.id, limit=10)
+        self.assertEqual([item['title'] for item in archived], ['message 190', 'grade 250'])
+        
+        # Fichiers vidés : supprimés avec le répertoire du destinataire
+        with override_settings(NOTIFICATION_RETENTION_DAYS={'message': 180, 'grade': 200}):
+            self.purge()
+        self.assertFalse(has_archive(NOTIFICATIONS_ARCHIVE, [self.user.id]))
+    
+    def test_batches(self):
+        for days in range(201, 206):
+            self.notify('message', days)
+        
+        with CaptureQueriesContext(connection) as queries:
+            rows, reclaimed = purge_read_notifications(
+                'message', timezone.now() - timedelta(days=200), batch_size=2
+            )
+        
+        self.assertEqual(rows, 5)
+        self.assertGreater(reclaimed, 0)
+        deletes = [query for query in queries if query['sql'].startswith('DELETE FROM "api_notification"')]
+        self.assertEqual(len(deletes), 3)
+    
+    def test_dry_run(self):
+        self.notify('message', 250)
+        self.notify('grade', 500)
+        archive_notifications(timezone.now() - timedelta(days=300))
+        
+        output = self.purge('--dry-run')
+        
+        self.assertIn('2 notification(s) seraient supprimée(s)', output)
+        self.assertEqual(self.titles(), ['message 250'])
+        self.assertEqual(len(read_archive(NOTIFICATIONS_ARCHIVE, self.user.id)), 1)
+    
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            self.purge('--batch-size', '0')
+        with self.assertRaises(CommandError):
+            self.purge('--type', 'session')
+    
+    def test_retention_shorter_than_archive_age_is_rejected(self):
+        self.assertEqual(check_notification_retention(None), [])
+        with override_settings(NOTIFICATION_RETENTION_DAYS={'message': 30}):
+            errors = check_notification_retention(None)
+        self.assertEqual([error.id for error in errors], ['api.E001'])
@@ -0,0 +1,78 @@
+"""
+Tests des préférences de notification (masques de types et de modules)
+"""
+from django.test import TestCase
+
+from api.models import Notification, NotificationPreference
+from api.notifications import create_notifications_in_batches
+
+from .helpers import api_client, create_module, create_user
+
+
+class NotificationPreferenceTests(TestCase):
+    def setUp(self):
+        teacher = create_user('prof', role='teacher')
+        self.module = create_module('INF101', teacher)
+        self.other_module = create_module('INF102', teacher)
+        self.user = create_user('etudiant')
+        self.other = create_user('autre')
+        self.client = api_client(self.user)
+    
+    def notification(self, recipient, notification_type='grade', module=None):
+        return Notification(
+            recipient=recipient, notification_type=notification_type, title='Titre', content='Contenu',
+            related_module=module
+        )
+    
+    def test_update_and_read_preferences(self):
+        response = self.client.put(
+            '/api/notifications/preferences/',
+            {'muted_types': ['message', 'grade'], 'muted_modules': [self.other_module.id]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        preference = NotificationPreference.objects.get(user=self.user)
+        self.assertEqual(
+            preference.muted_types,
+            NotificationPreference.type_bit('message') | NotificationPreference.type_bit('grade')
+        )
+        response = self.client.get('/api/notifications/preferences/')
+        self.assertEqual(response.data['muted_types'], ['grade', 'message'])
+        self.assertEqual(response.data['muted_modules'], [self.other_module.id])
+        
+        # PATCH : seuls les champs fournis sont modifiés
+        self.client.patch('/api/notifications/preferences/', {'muted_types': []}, format='json')
+        response = self.client.get('/api/notifications/preferences/')
+        self.assertEqual((response.data['muted_types'], response.data['muted_modules']), ([], [self.other_module.id]))
+    
+    def test_invalid_preferences(self):
+        for data in [{'muted_types': ['inconnu']}, {'muted_modules': [999999]}]:
+            with self.subTest(data=data):
+                response = self.client.patch('/api/notifications/preferences/', data, format='json')
+                self.assertEqual(response.status_code, 400)
+    
+    def test_muted_notifications_are_not_created(self):
+        preference = NotificationPreference(user=self.user)
+        preference.muted_type_list = ['grade']
+        preference.muted_module_ids = [self.other_module.id]
+        preference.save()
+        
+        created = create_notifications_in_batches([
+            self.notification(self.user, 'grade'),
+            self.notification(self.user, 'session', self.other_module),
+            self.notification(self.user, 'session', self.module),
+            self.notification(self.user, 'other'),
+            self.notification(self.other, 'grade', self.other_module),
+        ])
+        
+        self.assertEqual(created, 3)
+        self.assertCountEqual(
+            Notification.objects.values_list('recipient__username', 'notification_type', 'related_module_id'),
+            [('etudiant', 'session', self.module.id), ('etudiant', 'other', None), ('autre', 'grade', self.other_module.id)]
+        )
+    
+    def test_empty_preferences_are_not_loaded(self):
+        NotificationPreference.objects.create(user=self.user)
+        
+        self.assertEqual(NotificationPreference.load_masks([self.user.id, self.other.id]), {})
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from api.grading import get_module_ranking
+from api.models import Enrollment, Grade
+
+from .helpers import api_client, create_module, create_user, enroll
+
+
+class ModuleRankingTests(TestCase):
+    """Classements en cache partagé et invalidation après recalcul"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = create_user('prof', role='teacher')
+        cls.module = create_module('INF101', cls.teacher)
+        cls.students = [create_user(f'etudiant{index}') for index in range(3)]
+        for student, score in zip(cls.students, ('10', '16', '13')):
+            enroll(student, cls.module)
+            Grade.objects.create(
+                student=student, module=cls.module, grade_type='exam',
+                grade=Decimal(score), max_grade=Decimal('20'), graded_by=cls.teacher
+            )
+
+    def ranks(self):
+        return {row['student_username']: row['module_rank'] for row in get_module_ranking(self.module.id)}
+
+    def test_dense_ranks(self):
+        self.assertEqual(self.ranks(), {'etudiant1': 1, 'etudiant2': 2, 'etudiant0': 3})
+
+    def test_recompute_invalidates_cached_ranking(self):
+        self.ranks()
+        Grade.objects.filter(student=self.students[0]).update(grade=Decimal('19'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api_client(self.teacher).post(f'/api/modules/{self.module.id}/recompute_grades/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ranks()['etudiant0'], 1)
+
+    def test_rankings_are_restricted_to_module_staff(self):
+        other_teacher = create_user('autre', role='teacher')
+        url = f'/api/modules/{self.module.id}/rankings/'
+        self.assertEqual(api_client(self.teacher).get(url).status_code, 200)
+        self.assertIn(api_client(other_teacher).get(url).status_code, (403, 404))
+        self.assertIn(api_client(self.students[0]).get(url).status_code, (403, 404))
+        response = api_client(self.students[0]).post(f'/api/modules/{self.module.id}/recompute_grades/')
+        self.assertIn(response.status_code, (403, 404))
+
+    def test_student_sees_own_rank(self):
+        Enrollment.objects.filter(module=self.module).refresh_final_grades()
+        response = api_client(self.students[2]).get('/api/grades/my/ranks/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['module_rank'], 2)
@@ -0,0 +1,104 @@
+"""
+Tests des accusés de lecture des annonces (bitmap AnnouncementReadState)
+"""
+from django.test import TestCase
+
+from api.models import Announcement, AnnouncementReadState, NotificationPreference
+from api.notifications import fan_out_announcement
+
+from .helpers import api_client, create_module, create_user, enroll
+
+
+class AnnouncementReadStatsTests(TestCase):
+    def setUp(self):
+        self.teacher = create_user('prof', role='teacher')
+        self.module = create_module('INF101', self.teacher)
+        other_module = create_module('INF102', self.teacher)
+        self.students = [create_user(f'etudiant{index}') for index in range(3)]
+        for student in self.students:
+            enroll(student, self.module)
+        self.dropped = create_user('abandon')
+        enroll(self.dropped, other_module)
+        enroll(self.dropped, self.module, is_active=False)
+        self.announcement = Announcement.objects.create(
+            author=self.teacher, module=self.module, title='Examen', content='Contenu'
+        )
+    
+    def read(self, user):
+        return api_client(user).post(f'/api/announcements/{self.announcement.pk}/read/')
+    
+    def stats(self, user=None):
+        return api_client(user or self.teacher).get(f'/api/announcements/{self.announcement.pk}/read_stats/')
+    
+    def test_reads_are_counted_once(self):
+        fan_out_announcement(self.announcement.pk)
+        self.assertTrue(self.read(self.students[0]).data['is_read'])
+        self.assertTrue(self.read(self.students[0]).data['is_read'])
+        self.read(self.students[1])
+        
+        response = self.stats()
+        self.assertEqual(response.data['read_count'], 2)
+        self.assertEqual(response.data['audience_size'], 3)
+        self.assertEqual(response.data['read_percentage'], 66.7)
+    
+    def test_readers_outside_audience_are_ignored(self):
+        self.read(self.teacher)
+        self.assertFalse(AnnouncementReadState.mark_read(self.announcement, self.dropped.id))
+        
+        self.assertEqual(self.stats().data['read_count'], 0)
+    
+    def test_target_audience_excludes_other_roles(self):
+        general = Announcement.objects.create(
+            author=self.teacher, title='Enseignants', content='Contenu', target_audience='teacher'
+        )
+        colleague = create_user('collegue', role='teacher')
+        
+        self.assertFalse(AnnouncementReadState.mark_read(general, self.students[0].id))
+        self.assertTrue(AnnouncementReadState.mark_read(general, colleague.id))
+        self.assertTrue(AnnouncementReadState.has_read(general, colleague.id))
+        self.assertFalse(AnnouncementReadState.has_read(general, self.students[0].id))
+    
+    def test_audience_includes_muted_recipients(self):
+        NotificationPreference.objects.create(
+            user=self.students[0], muted_types=NotificationPreference.type_bit('announcement')
+        )
+        
+        self.assertEqual(fan_out_announcement(self.announcement.pk), 2)
+        self.assertEqual(AnnouncementReadState.objects.get(pk=self.announcement.pk).audience_size, 3)
+        
+        for student in self.students:
+            self.read(student)
+        self.assertEqual(self.stats().data['read_percentage'], 100.0)
+    
+    def test_stats_read_stored_audience_size(self):
+        self.assertIsNone(self.stats().data['audience_size'])
+        self.assertFalse(AnnouncementReadState.objects.filter(pk=self.announcement.pk).exists())
+        
+        fan_out_announcement(self.announcement.pk)
+        with self.assertNumQueries(2):
+            # Annonce et suivi de lecture, sans recompter le public
+            self.assertEqual(self.stats().data['audience_size'], 3)
+    
+    def test_enrollment_changes_update_audience_size(self):
+        fan_out_announcement(self.announcement.pk)
+        teachers_only = Announcement.objects.create(
+            author=self.teacher, module=self.module, title='Jury', content='Contenu', target_audience='teacher'
+        )
+        fan_out_announcement(teachers_only.pk)
+        
+        newcomer = create_user('nouveau')
+        enrollment = enroll(newcomer, self.module)
+        reactivated = self.dropped.enrollments.get(module=self.module)
+        reactivated.is_active = True
+        reactivated.save()
+        self.assertEqual(self.stats().data['audience_size'], 5)
+        
+        enrollment.is_active = False
+        enrollment.save()
+        self.students[0].enrollments.get(module=self.module).delete()
+        self.assertEqual(self.stats().data['audience_size'], 3)
+        self.assertEqual(AnnouncementReadState.objects.get(pk=teachers_only.pk).audience_size, 0)
+    
+    def test_stats_restricted_to_author(self):
+        self.assertEqual(self.stats(self.students[0]).status_code, 403)
+        self.assertEqual(self.stats(create_user('collegue', role='teacher')).status_code, 404)
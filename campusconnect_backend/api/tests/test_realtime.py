@@ -0,0 +1,207 @@
+"""
+Tests de la connexion WebSocket (application ASGI pilotée en mémoire)
+"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import Notification
+from api.pubsub import get_pubsub, user_channel
+from api.realtime import CLOSE_UNAUTHORIZED, WEBSOCKET_PATH, websocket_application
+
+from .helpers import api_client, create_user, send_message
+
+
+class WebSocketTests(TestCase):
+    def setUp(self):
+        self.user = create_user('etudiant')
+    
+    async def connect(self, token, path=WEBSOCKET_PATH):
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        scope = {
+            'type': 'websocket',
+            'path': path,
+            'query_string': b'',
+            'headers': [(b'authorization', f'Bearer {token}'.encode())] if token else [],
+        }
+        await inbox.put({'type': 'websocket.connect'})
+        task = asyncio.ensure_future(websocket_application(scope, inbox.get, outbox.put))
+        event = await asyncio.wait_for(outbox.get(), 5)
+        return task, inbox, outbox, event
+    
+    async def token(self, lifetime=None):
+        token = await sync_to_async(AccessToken.for_user)(self.user)
+        if lifetime is not None:
+            token.set_exp(lifetime=lifetime)
+        return str(token)
+    
+    async def test_rejects_missing_token(self):
+        task, _, _, event = await self.connect(None)
+        await task
+        
+        self.assertEqual(event, {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+    
+    async def test_receives_published_events(self):
+        task, inbox, outbox, event = await self.connect(await self.token())
+        self.assertEqual(event['type'], 'websocket.accept')
+        
+        get_pubsub().publish(user_channel(self.user.pk), {'type': 'chat.message', 'data': {'id': 1}})
+        message = await asyncio.wait_for(outbox.get(), 5)
+        self.assertIn('chat.message', message['text'])
+        
+        await inbox.put({'type': 'websocket.receive', 'text': 'ping'})
+        self.assertEqual((await asyncio.wait_for(outbox.get(), 5))['text'], 'pong')
+        
+        await inbox.put({'type': 'websocket.disconnect'})
+        await asyncio.wait_for(task, 5)
+    
+    async def test_closes_when_token_expires(self):
+        task, _, outbox, event = await self.connect(await self.token(lifetime=timedelta(seconds=2)))
+        self.assertEqual(event['type'], 'websocket.accept')
+        
+        await asyncio.wait_for(task, 5)
+        event = outbox.get_nowait()
+        self.assertEqual(event['type'], 'websocket.close')
+        self.assertEqual(event['code'], CLOSE_UNAUTHORIZED)
+
+
+class LongPollTests(TestCase):
+    def setUp(self):
+        self.user = create_user('etudiant')
+        self.token = str(AccessToken.for_user(self.user))
+    
+    def get(self, **params):
+        return self.client.get('/api/updates/', params, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+    
+    def test_returns_cursor(self):
+        response = self.get(timeout='0')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cursor'], '0:0:0')
+    
+    def test_requires_authorization_header(self):
+        response = self.client.get('/api/updates/', {'token': self.token, 'timeout': '0'})
+        
+        self.assertEqual(response.status_code, 401)
+    
+    def test_rejects_invalid_timeout(self):
+        for timeout in ['nan', 'inf', '-inf', 'abc']:
+            with self.subTest(timeout=timeout):
+                self.assertEqual(self.get(since='0:0:0', timeout=timeout).status_code, 400)
+    
+    def test_rejects_invalid_cursor(self):
+        for cursor in ['0:0', 'a:b:c', '0:0:0:0']:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get(since=cursor, timeout='0').status_code, 400)
+    
+    def test_coalesced_notifications_are_returned_again(self):
+        sender = create_user('expediteur')
+        cursor = self.get(timeout='0').json()['cursor']
+        
+        Notification.notify_message(send_message(sender, self.user))
+        response = self.get(since=cursor, timeout='0').json()
+        self.assertEqual([notification['count'] for notification in response['notifications']], [1])
+        
+        # Même notification mise à jour (même identifiant) : renvoyée après le curseur
+        Notification.notify_message(send_message(sender, self.user))
+        updated = self.get(since=response['cursor'], timeout='0').json()
+        self.assertEqual(len(updated['messages']), 1)
+        self.assertEqual(
+            [(notification['id'], notification['count']) for notification in updated['notifications']],
+            [(response['notifications'][0]['id'], 2)]
+        )
+        
+        # Rien de nouveau depuis : réponse vide à l'expiration du délai
+        self.assertEqual(self.get(since=updated['cursor'], timeout='0').json()['notifications'], [])
+
+
+class MessageNotificationTests(TestCase):
+    """Regroupement des notifications de messages (Notification.notify_message)"""
+    
+    def setUp(self):
+        self.user = create_user('etudiant')
+        self.sender = create_user('expediteur')
+    
+    def notify(self):
+        return Notification.notify_message(send_message(self.sender, self.user))
+    
+    def test_messages_are_coalesced_until_read(self):
+        notifications = [self.notify() for _ in range(3)]
+        
+        self.assertEqual({notification.id for notification in notifications}, {notifications[0].id})
+        notification = Notification.objects.get()
+        self.assertEqual(notification.count, 3)
+        self.assertEqual(notification.content, 'Vous avez reçu 3 messages de expediteur')
+        
+        notification.mark_as_read()
+        fresh = self.notify()
+        self.assertNotEqual(fresh.id, notification.id)
+        self.assertEqual(fresh.count, 1)
+        self.assertEqual(Notification.objects.count(), 2)
+    
+    def test_each_sender_has_its_own_notification(self):
+        self.notify()
+        Notification.notify_message(send_message(create_user('autre'), self.user))
+        
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 2)
+
+
+class NotificationStreamTests(TestCase):
+    """Flux Server-Sent Events des notifications"""
+    
+    def setUp(self):
+        self.user = create_user('etudiant')
+        self.token = str(AccessToken.for_user(self.user))
+        self.notifications = [
+            Notification.objects.create(recipient=self.user, title=f'Notification {index}', content='Contenu')
+            for index in range(3)
+        ]
+    
+    async def open(self, **headers):
+        response = await self.async_client.get(
+            '/api/notifications/stream/', headers={'Authorization': f'Bearer {self.token}', **headers}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = response.streaming_content
+        self.assertTrue((await self.next_event(events)).startswith('retry: '))
+        return events
+    
+    async def next_event(self, events):
+        return (await asyncio.wait_for(anext(events), 5)).decode()
+    
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+        
+        response = await self.async_client.get(
+            '/api/notifications/stream/', headers={'Authorization': f'Bearer {self.token}', 'Last-Event-ID': 'abc'}
+        )
+        self.assertEqual(response.status_code, 400)
+    
+    async def test_replays_after_last_event_id(self):
+        events = await self.open(**{'Last-Event-ID': str(self.notifications[0].id)})
+        
+        for notification in self.notifications[1:]:
+            event = await self.next_event(events)
+            self.assertTrue(event.startswith(f'id: {notification.id}\nevent: notification\n'))
+            self.assertIn(notification.title, event)
+        self.assertEqual(await self.next_event(events), 'event: unread_count\ndata: {"unread_count": 3}\n\n')
+        await events.aclose()
+    
+    async def test_unread_count_after_mark_all_as_read(self):
+        events = await self.open()
+        # Sans Last-Event-ID : pas d'historique, seulement le nombre de non lues
+        self.assertEqual(await self.next_event(events), 'event: unread_count\ndata: {"unread_count": 3}\n\n')
+        
+        def mark_all_as_read():
+            with self.captureOnCommitCallbacks(execute=True):
+                response = api_client(self.user).post('/api/notifications/mark_all_as_read/')
+            self.assertEqual(response.status_code, 200)
+        
+        await sync_to_async(mark_all_as_read)()
+        self.assertEqual(await self.next_event(events), 'event: unread_count\ndata: {"unread_count": 0}\n\n')
+        await events.aclose()
+
@@ -0,0 +1,96 @@
+"""
+Tests des rappels de sessions (send_session_reminders)
+"""
+import io
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import CourseSession, Notification
+from api.notifications import send_session_reminders
+
+from .helpers import create_module, create_user, enroll
+
+NOW = datetime(2026, 3, 10, 9, 0, tzinfo=dt_timezone.utc)
+
+
+class SessionReminderTests(TestCase):
+    def setUp(self):
+        teacher = create_user('prof', role='teacher')
+        self.module = create_module('INF101', teacher)
+        self.students = [create_user(f'etudiant{index}') for index in range(2)]
+        for student in self.students:
+            enroll(student, self.module)
+        enroll(create_user('abandon'), self.module, is_active=False)
+        enroll(create_user('inactif', is_active=False), self.module)
+        
+        self.soon = self.create_session(NOW.date(), time(9, 20))
+        self.later = self.create_session(NOW.date(), time(11, 0))
+    
+    def create_session(self, date, start_time):
+        return CourseSession.objects.create(
+            module=self.module, date=date, start_time=start_time, end_time=time(23, 59), location='B12'
+        )
+    
+    def reminders(self):
+        return Notification.objects.filter(notification_type='session')
+    
+    def test_reminds_active_students_once(self):
+        self.assertEqual(send_session_reminders(30, now=NOW), (1, 2))
+        self.assertEqual(send_session_reminders(30, now=NOW), (0, 0))
+        
+        self.assertCountEqual(
+            self.reminders().values_list('recipient_id', flat=True),
+            [student.id for student in self.students]
+        )
+        self.assertEqual(set(self.reminders().values_list('related_session_id', flat=True)), {self.soon.id})
+        self.assertEqual(self.reminders().first().title, 'Rappel : INF101 à 09:20')
+    
+    def test_reset_claim_does_not_duplicate(self):
+        send_session_reminders(30, now=NOW)
+        CourseSession.objects.filter(pk=self.soon.pk).update(reminder_sent_at=None)
+        
+        self.assertEqual(send_session_reminders(30, now=NOW), (1, 0))
+        self.assertEqual(self.reminders().count(), 2)
+    
+    def test_rescheduled_session_is_reminded_again(self):
+        send_session_reminders(30, now=NOW)
+        
+        self.soon.start_time = time(9, 25)
+        self.soon.save()
+        self.soon.refresh_from_db()
+        self.assertIsNone(self.soon.reminder_sent_at)
+        
+        self.assertEqual(send_session_reminders(30, now=NOW), (1, 2))
+        self.assertEqual(
+            sorted(self.reminders().values_list('title', flat=True)),
+            ['Rappel : INF101 à 09:20'] * 2 + ['Rappel : INF101 à 09:25'] * 2
+        )
+    
+    def test_other_changes_keep_the_claim(self):
+        send_session_reminders(30, now=NOW)
+        
+        self.soon.location = 'C01'
+        self.soon.save()
+        
+        self.assertEqual(send_session_reminders(30, now=NOW), (0, 0))
+    
+    def test_window_across_midnight(self):
+        tomorrow = self.create_session(datetime(2026, 3, 11).date(), time(0, 10))
+        
+        send_session_reminders(30, now=datetime(2026, 3, 10, 23, 50, tzinfo=dt_timezone.utc))
+        
+        self.assertEqual(set(self.reminders().values_list('related_session_id', flat=True)), {tomorrow.id})
+    
+    def test_command(self):
+        start = timezone.localtime(timezone.now() + timedelta(minutes=10))
+        session = self.create_session(start.date(), start.time().replace(microsecond=0))
+        
+        for expected in ('1 session(s) rappelée(s), 2 notification(s)', '0 session(s) rappelée(s), 0 notification(s)'):
+            output = io.StringIO()
+            call_command('send_session_reminders', minutes=30, stdout=output)
+            self.assertIn(expected, output.getvalue())
+        
+        self.assertEqual(self.reminders().filter(related_session=session).count(), 2)
@@ -0,0 +1,121 @@
+"""
+Tests de la recherche plein texte (messages de chat et annonces)
+"""
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import Announcement, ChatMessage
+from api.search import search_announcements, search_messages
+
+from .helpers import api_client, create_module, create_user, enroll, send_message
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = create_user('moi')
+        self.other = create_user('autre')
+        self.teacher = create_user('prof', role='teacher')
+        self.module = create_module('INF101', self.teacher)
+        enroll(self.user, self.module)
+        
+        now = timezone.now()
+        self.messages = []
+        for index, text in enumerate(['Révision de l\'examen', 'Examen de réseaux demain', 'Rendez-vous à la cafétéria']):
+            message = send_message(self.other, self.user, text)
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=now - timedelta(hours=3 - index))
+            self.messages.append(message)
+        # Conversation entre d'autres utilisateurs : jamais visible
+        send_message(self.other, self.teacher, 'Examen confidentiel')
+    
+    def message_texts(self, query, **kwargs):
+        return [message.message for message in search_messages(self.user, query, **kwargs)]
+    
+    def test_all_terms_required_most_recent_first(self):
+        self.assertEqual(self.message_texts('examen'), ['Examen de réseaux demain', 'Révision de l\'examen'])
+        self.assertEqual(self.message_texts('examen réseaux'), ['Examen de réseaux demain'])
+        self.assertEqual(self.message_texts('examen cafétéria'), [])
+    
+    def test_prefix_and_diacritics(self):
+        # Dernier mot cherché comme préfixe, accents ignorés
+        self.assertEqual(self.message_texts('cafe'), ['Rendez-vous à la cafétéria'])
+        self.assertEqual(self.message_texts('revis'), ['Révision de l\'examen'])
+        self.assertEqual(self.message_texts('rev examen'), [])
+    
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.message_texts('examen OR cafétéria'), [])
+        self.assertEqual(self.message_texts('"examen* ('), ['Examen de réseaux demain', 'Révision de l\'examen'])
+        # Opérateurs traités comme des mots : aucune erreur de syntaxe
+        self.assertEqual(self.message_texts('examen NEAR( *'), [])
+    
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_limit(self):
+        self.assertEqual(self.message_texts('examen', limit=50), ['Examen de réseaux demain'])
+    
+    def test_announcements_follow_visibility(self):
+        Announcement.objects.create(author=self.teacher, module=self.module, title='Examen final', content='Salle B12')
+        Announcement.objects.create(author=self.teacher, title='Fermeture', content='Examen reporté')
+        Announcement.objects.create(
+            author=self.teacher, module=self.module, title='Examen annulé', content='Contenu', is_active=False
+        )
+        other_module = create_module('INF102', self.teacher)
+        Announcement.objects.create(author=self.teacher, module=other_module, title='Examen', content='Autre module')
+        
+        titles = {announcement.title for announcement in search_announcements(self.user, 'examen')}
+        self.assertEqual(titles, {'Examen final', 'Fermeture'})
+        # Titre et contenu sont indexés
+        self.assertEqual([announcement.title for announcement in search_announcements(self.user, 'salle')], ['Examen final'])
+    
+    def test_index_follows_updates_and_deletes(self):
+        message = self.messages[2]
+        message.message = 'Réunion annulée'
+        message.save()
+        self.assertEqual(self.message_texts('cafétéria'), [])
+        self.assertEqual(self.message_texts('reunion'), ['Réunion annulée'])
+        
+        announcement = Announcement.objects.create(author=self.teacher, module=self.module, title='Projet', content='Rendu')
+        Announcement.objects.filter(pk=announcement.pk).update(title='Soutenance')
+        self.assertEqual(search_announcements(self.user, 'projet'), [])
+        self.assertEqual([a.pk for a in search_announcements(self.user, 'soutenance')], [announcement.pk])
+        
+        message.delete()
+        announcement.delete()
+        self.assertEqual(self.message_texts('reunion'), [])
+        self.assertEqual(search_announcements(self.user, 'soutenance'), [])
+    
+    @skipUnless(connection.vendor == 'sqlite', 'Index FTS5 propre à SQLite')
+    def test_fts_tables_are_maintained_by_triggers(self):
+        def indexed(table, term):
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [term])
+                return [row[0] for row in cursor.fetchall()]
+        
+        message = self.messages[2]
+        self.assertEqual(indexed('api_chatmessage_fts', 'cafeteria'), [message.pk])
+        
+        ChatMessage.objects.filter(pk=message.pk).update(message='Bibliothèque')
+        self.assertEqual(indexed('api_chatmessage_fts', 'cafeteria'), [])
+        self.assertEqual(indexed('api_chatmessage_fts', 'bibliotheque'), [message.pk])
+        
+        message.delete()
+        self.assertEqual(indexed('api_chatmessage_fts', 'bibliotheque'), [])
+        
+        announcement = Announcement.objects.create(author=self.teacher, title='Stage', content='Offre')
+        self.assertEqual(indexed('api_announcement_fts', 'offre'), [announcement.pk])
+        announcement.delete()
+        self.assertEqual(indexed('api_announcement_fts', 'offre'), [])
+    
+    def test_endpoint(self):
+        client = api_client(self.user)
+        
+        response = client.get('/api/search/', {'q': 'examen', 'scope': 'messages'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['messages']), 2)
+        self.assertFalse(response.data['archived_messages_excluded'])
+        self.assertNotIn('announcements', response.data)
+        
+        self.assertEqual(client.get('/api/search/', {'q': '  ?! '}).status_code, 400)
+        self.assertEqual(client.get('/api/search/', {'q': 'examen', 'scope': 'tout'}).status_code, 400)
@@ -0,0 +1,134 @@
+"""
+Tests de la file d'attente en base (api.tasks)
+"""
+import time
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api.models import Task
+from api.tasks import claim_tasks, enqueue, execute_task, release_stale_tasks, retry_failed_tasks
+
+CALLS = []
+
+
+def record(value):
+    CALLS.append(value)
+
+
+def fail():
+    raise RuntimeError('échec attendu')
+
+
+def slow(seconds):
+    """Tâche longue : relâche les tâches abandonnées à mi-parcours"""
+    time.sleep(seconds / 2)
+    CALLS.append(release_stale_tasks())
+    time.sleep(seconds / 2)
+
+
+@override_settings(TASK_MAX_ATTEMPTS=2, TASK_RETRY_BASE_DELAY=10, TASK_LOCK_TIMEOUT=600)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+    
+    def claim_one(self, worker_id='worker-1'):
+        tasks = claim_tasks(worker_id)
+        self.assertEqual(len(tasks), 1)
+        return tasks[0]
+    
+    def make_due(self, task):
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+    
+    def test_success(self):
+        enqueue(record, 'a')
+        task = self.claim_one()
+        
+        self.assertEqual(task.status, 'running')
+        self.assertEqual(claim_tasks('worker-2'), [])
+        self.assertTrue(execute_task(task))
+        self.assertEqual(CALLS, ['a'])
+        self.assertEqual(Task.objects.get(pk=task.pk).status, 'succeeded')
+    
+    def test_retry_then_failure(self):
+        task = enqueue(fail)
+        
+        with self.assertLogs('api.tasks', level='WARNING'):
+            self.assertFalse(execute_task(self.claim_one()))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.locked_by), ('pending', 1, ''))
+        self.assertIn('échec attendu', task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=5))
+        # Pas encore due : délai avant nouvelle tentative
+        self.assertEqual(claim_tasks('worker-1'), [])
+        
+        self.make_due(task)
+        with self.assertLogs('api.tasks', level='ERROR'):
+            self.assertFalse(execute_task(self.claim_one()))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('failed', 2))
+        self.assertIsNotNone(task.finished_at)
+        
+        self.assertEqual(retry_failed_tasks(Task.objects.all()), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('pending', 0))
+    
+    def test_release_stale_tasks(self):
+        retried = enqueue(record, 'relâchée')
+        exhausted = enqueue(record, 'épuisée')
+        claim_tasks('worker-1', limit=2)
+        Task.objects.filter(pk=exhausted.pk).update(attempts=2)
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        
+        self.assertEqual(release_stale_tasks(), 2)
+        retried.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual((retried.status, retried.locked_by), ('pending', ''))
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertIn('délai de réservation', exhausted.last_error)
+    
+    def test_late_worker_does_not_overwrite_new_owner(self):
+        enqueue(record, 'a')
+        stale = self.claim_one('worker-1')
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        release_stale_tasks()
+        current = self.claim_one('worker-2')
+        
+        # Le premier worker termine après la reprise : son résultat est ignoré
+        execute_task(stale)
+        self.assertEqual(Task.objects.get(pk=current.pk).status, 'running')
+        
+        execute_task(current)
+        self.assertEqual(Task.objects.get(pk=current.pk).status, 'succeeded')
+
+
+@override_settings(TASK_LOCK_TIMEOUT=0.3, TASK_HEARTBEAT_INTERVAL=0.05)
+class TaskHeartbeatTests(TransactionTestCase):
+    """Rafraîchissement de la réservation par un thread dédié (connexion séparée)"""
+    
+    def setUp(self):
+        CALLS.clear()
+    
+    def test_long_task_keeps_its_lock(self):
+        enqueue(slow, 1)
+        task = claim_tasks('worker-1')[0]
+        
+        self.assertTrue(execute_task(task))
+        # Exécution plus longue que TASK_LOCK_TIMEOUT : rien n'a été relâché
+        self.assertEqual(CALLS, [0])
+        finished = Task.objects.get(pk=task.pk)
+        self.assertEqual(finished.status, 'succeeded')
+        self.assertGreater(finished.locked_at, task.locked_at)
+    
+    def test_heartbeat_stops_when_lock_is_lost(self):
+        enqueue(slow, 1)
+        task = claim_tasks('worker-1')[0]
+        Task.objects.filter(pk=task.pk).update(locked_by='worker-2')
+        
+        execute_task(task)
+        
+        # Réservation d'un autre worker : pas rafraîchie, donc relâchée comme abandonnée
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(Task.objects.get(pk=task.pk).status, 'pending')
+
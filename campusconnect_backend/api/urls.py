@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 
+from .realtime import notification_stream, updates
 from .views import (
     CustomTokenObtainPairView,
     RegisterView,
@@ -23,11 +24,14 @@ from .views import (
     GradeViewSet,
     AnnouncementViewSet,
     my_grades,
+    my_ranks,
     my_announcements,
     ChatMessageViewSet,
+    ModuleChannelViewSet,
     NotificationViewSet,
     my_messages,
     my_unread_notifications,
+    search,
 )
 
 app_name = 'api'
@@ -42,6 +46,7 @@ router.register(r'resources', CourseResourceViewSet, basename='resource')
 router.register(r'grades', GradeViewSet, basename='grade')
 router.register(r'announcements', AnnouncementViewSet, basename='announcement')
 router.register(r'messages', ChatMessageViewSet, basename='message')
+router.register(r'channels', ModuleChannelViewSet, basename='channel')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
@@ -68,6 +73,7 @@ urlpatterns = [
     
     # Routes personnalisées pour les notes
     path('grades/my/', my_grades, name='my_grades'),
+    path('grades/my/ranks/', my_ranks, name='my_ranks'),
     
     # Routes personnalisées pour les annonces
     path('announcements/my/', my_announcements, name='my_announcements'),
@@ -77,6 +83,13 @@ urlpatterns = [
     
     # Routes personnalisées pour les notifications
     path('notifications/unread/', my_unread_notifications, name='my_unread_notifications'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
+    
+    # Longue interrogation des nouveaux messages et notifications (vue asynchrone)
+    path('updates/', updates, name='updates'),
+    
+    # Recherche plein texte (messages et annonces)
+    path('search/', search, name='search'),
     
     # Routes pour les modules et inscriptions (router en dernier)
     path('', include(router.urls)),
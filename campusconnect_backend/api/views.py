@@ -1,14 +1,23 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import generics, status, viewsets
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, action
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Avg, Count, F, Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from .serializers import (
     RegisterSerializer,
@@ -24,13 +33,29 @@ from .serializers import (
     CourseResourceSerializer,
     CourseResourceUploadSerializer,
     GradeSerializer,
+    GradeImportSerializer,
     AnnouncementSerializer,
     ChatMessageSerializer,
     ChatMessageCreateSerializer,
-    NotificationSerializer
+    ChatParticipantSerializer,
+    ModuleChannelSerializer,
+    ChannelMessageSerializer,
+    NotificationSerializer,
+    NotificationPreferenceSerializer
 )
-from .permissions import IsStudent, IsTeacher, IsAdmin, IsTeacherOrAdmin, IsModuleTeacherOrAdmin
-from .models import Module, Enrollment, CourseSession, CourseResource, Grade, Announcement, ChatMessage, Notification
+from .authentication import TokenClaimsJWTAuthentication
+from .permissions import IsStudent, IsTeacher, IsAdmin, IsTeacherOrAdmin, IsModuleTeacherOrAdmin, IsModuleChannelMember
+from .models import Module, Enrollment, CourseSession, CourseResource, Grade, Announcement, AnnouncementReadState, ChatMessage, Conversation, ModuleChannel, ChannelMessage, ChannelMembership, Notification, NotificationPreference
+from .feeds import student_feed
+from .grading import GradeImportError, get_module_ranking, get_module_rankings, import_grades, report_path, report_storage
+from .messaging import ConversationInbox, mark_thread_read, thread_page
+from .pagination import InvalidCursor, keyset_page, page_size
+from .archive import MESSAGES_ARCHIVE, NOTIFICATIONS_ARCHIVE, has_archive
+from .counters import MESSAGES, NOTIFICATIONS, decrement_unread, get_unread_count
+from .notifications import fan_out_announcement, publish_notifications_read
+from .pubsub import publish_to_users
+from .search import search_announcements, search_messages, search_terms
+from .tasks import run_in_background
 
 User = get_user_model()
 
@@ -256,7 +281,8 @@ class ModuleViewSet(viewsets.ModelViewSet):
             return [IsTeacherOrAdmin()]
         elif self.action in ['update', 'partial_update', 'destroy']:
             return [IsModuleTeacherOrAdmin()]
-        return [IsAuthenticated()]
+        # Actions personnalisées : permissions déclarées sur l'action
+        return super().get_permissions()
     
     def get_queryset(self):
         """
@@ -312,6 +338,39 @@ class ModuleViewSet(viewsets.ModelViewSet):
         serializer = EnrollmentSerializer(enrollments, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'], permission_classes=[IsModuleTeacherOrAdmin])
+    def recompute_grades(self, request, pk=None):
+        """
+        Recalculer les notes finales de toutes les inscriptions du module
+        POST /api/modules/{id}/recompute_grades/
+        """
+        module = self.get_object()
+        updated = Enrollment.objects.filter(module=module).refresh_final_grades()
+        return Response({
+            'message': f'{updated} note(s) finale(s) recalculée(s).',
+            'updated': updated
+        })
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsModuleTeacherOrAdmin])
+    def rankings(self, request, pk=None):
+        """
+        Classement des étudiants du module (rang dense et percentile, dans le module
+        et par promotion), filtrable par ?major= et ?year=
+        GET /api/modules/{id}/rankings/
+        """
+        module = self.get_object()
+        ranking = get_module_ranking(module.id)
+        
+        major = request.query_params.get('major', None)
+        if major:
+            ranking = [row for row in ranking if row['major'] == major]
+        
+        year = request.query_params.get('year', None)
+        if year:
+            ranking = [row for row in ranking if str(row['year']) == year]
+        
+        return Response(ranking)
+    
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def my_enrollment(self, request, pk=None):
         """
@@ -792,6 +851,55 @@ def my_schedule(request):
 
 # ==================== VUES POUR LES NOTES ====================
 
+# Tris autorisés sur les notes (paramètre ?ordering=)
+GRADE_ORDERING_FIELDS = {
+    'percentage': 'score_percentage',
+    'graded_date': 'graded_date',
+    'grade': 'grade',
+}
+
+
+def _percentage_param(query_params, name):
+    """Pourcentage passé en paramètre de requête (None s'il est absent)"""
+    value = query_params.get(name, None)
+    if not value:
+        return None
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        value = None
+    if value is None or not value.is_finite():
+        raise ValidationError({name: 'Pourcentage invalide.'})
+    return value
+
+
+def _filter_grades_by_score(queryset, query_params):
+    """
+    Appliquer les filtres et le tri sur le pourcentage calculé en base
+    (?letter=F, ?min_percentage=, ?max_percentage=, ?ordering=-percentage)
+    """
+    letter = query_params.get('letter', None)
+    if letter:
+        queryset = queryset.with_letter(letter)
+    
+    min_percentage = _percentage_param(query_params, 'min_percentage')
+    if min_percentage is not None:
+        queryset = queryset.filter(score_percentage__gte=min_percentage)
+    
+    max_percentage = _percentage_param(query_params, 'max_percentage')
+    if max_percentage is not None:
+        queryset = queryset.filter(score_percentage__lte=max_percentage)
+    
+    ordering = query_params.get('ordering', '-graded_date')
+    field = GRADE_ORDERING_FIELDS.get(ordering.lstrip('-'))
+    if field is None:
+        raise ValidationError({
+            'ordering': f"Tri invalide. Valeurs possibles : {', '.join(GRADE_ORDERING_FIELDS)}."
+        })
+    prefix = '-' if ordering.startswith('-') else ''
+    return queryset.order_by(f'{prefix}{field}', '-id')
+
+
 class GradeViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour gérer les notes des étudiants
@@ -833,7 +941,11 @@ class GradeViewSet(viewsets.ModelViewSet):
         if grade_type:
             queryset = queryset.filter(grade_type=grade_type)
         
-        return queryset.order_by('-graded_date')
+        module_code = self.request.query_params.get('module_code', None)
+        if module_code:
+            queryset = queryset.filter(module__code=module_code.upper())
+        
+        return _filter_grades_by_score(queryset, self.request.query_params)
     
     def get_permissions(self):
         """
@@ -844,7 +956,8 @@ class GradeViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsTeacherOrAdmin()]
-        return [IsAuthenticated()]
+        # Actions personnalisées : permissions déclarées sur l'action
+        return super().get_permissions()
     
     def perform_create(self, serializer):
         """
@@ -867,6 +980,98 @@ class GradeViewSet(viewsets.ModelViewSet):
             serializer.save()
         else:
             raise PermissionError("Vous n'avez pas la permission de modifier cette note.")
+    
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        permission_classes=[IsTeacherOrAdmin],
+        parser_classes=[MultiPartParser, FormParser]
+    )
+    def import_grades(self, request):
+        """
+        Importer des notes depuis un fichier CSV ou XLSX
+        POST /api/grades/import/ (multipart : file, module, grade_type, max_grade)
+        """
+        serializer = GradeImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        module = serializer.validated_data['module']
+        
+        # Les enseignants ne peuvent importer que dans leurs modules
+        if request.user.role == 'teacher' and module.teacher != request.user:
+            return Response({
+                'error': 'Vous ne pouvez importer des notes que pour vos modules.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            result = import_grades(
+                serializer.validated_data['file'],
+                module=module,
+                graded_by=request.user,
+                grade_type=serializer.validated_data['grade_type'],
+                max_grade=serializer.validated_data['max_grade']
+            )
+        except GradeImportError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        report_id = result.pop('error_report')
+        result['error_report_url'] = request.build_absolute_uri(
+            f'/api/grades/import-reports/{module.id}/{report_id}/'
+        ) if report_id else None
+        result['message'] = f"{result['created']} note(s) importée(s), {result['errors']} ligne(s) rejetée(s)."
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+    
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path=r'import-reports/(?P<module_id>\d+)/(?P<report_id>[0-9a-f]{32})',
+        permission_classes=[IsTeacherOrAdmin]
+    )
+    def import_report(self, request, module_id=None, report_id=None):
+        """
+        Télécharger le rapport des lignes rejetées d'un import (stockage privé)
+        GET /api/grades/import-reports/{module_id}/{report_id}/
+        """
+        module = get_object_or_404(Module, id=module_id)
+        if request.user.role == 'teacher' and module.teacher_id != request.user.id:
+            return Response({
+                'error': 'Vous ne pouvez consulter que les rapports de vos modules.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        storage = report_storage()
+        path = report_path(module.id, report_id)
+        if not storage.exists(path):
+            raise Http404
+        return FileResponse(
+            storage.open(path, 'rb'),
+            as_attachment=True,
+            filename=f'import_{module.code}_{report_id}.csv',
+            content_type='text/csv'
+        )
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def stats(self, request):
+        """
+        Statistiques agrégées en base sur les notes filtrées
+        (mêmes filtres que la liste, ex : ?module_code=INF101&letter=F)
+        GET /api/grades/stats/
+        """
+        queryset = self.get_queryset().order_by()
+        summary = queryset.aggregate(
+            count=Count('id'),
+            average_percentage=Avg('score_percentage'),
+            min_percentage=Min('score_percentage'),
+            max_percentage=Max('score_percentage'),
+        )
+        by_letter = {
+            row['letter']: row['count']
+            for row in queryset.with_letter_grade().values('letter').annotate(count=Count('id'))
+        }
+        summary['by_letter'] = {
+            letter: by_letter.get(letter, 0)
+            for letter in [item[0] for item in Grade.LETTER_GRADE_THRESHOLDS] + [Grade.FAILING_LETTER]
+        }
+        return Response(summary)
 
 
 @api_view(['GET'])
@@ -887,12 +1092,112 @@ def my_grades(request):
     if grade_type:
         grades = grades.filter(grade_type=grade_type)
     
-    serializer = GradeSerializer(grades.order_by('-graded_date'), many=True)
+    grades = _filter_grades_by_score(grades, request.query_params)
+    
+    serializer = GradeSerializer(grades, many=True)
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([IsStudent])
+def my_ranks(request):
+    """
+    Endpoint pour qu'un étudiant voie son rang et son percentile dans chacun de ses modules
+    GET /api/grades/my/ranks/
+    """
+    enrollments = Enrollment.objects.filter(
+        student=request.user,
+        is_active=True
+    ).select_related('module')
+    modules = {enrollment.module_id: enrollment.module for enrollment in enrollments}
+    rankings = get_module_rankings(modules.keys())
+    
+    ranks = []
+    for module_id, module in modules.items():
+        entry = next((row for row in rankings[module_id] if row['student'] == request.user.id), None)
+        ranks.append({
+            'module': module_id,
+            'module_code': module.code,
+            'module_name': module.name,
+            'grade': entry['grade'] if entry else None,
+            'module_rank': entry['module_rank'] if entry else None,
+            'module_percentile': entry['module_percentile'] if entry else None,
+            'module_size': entry['module_size'] if entry else None,
+            'cohort_rank': entry['cohort_rank'] if entry else None,
+            'cohort_percentile': entry['cohort_percentile'] if entry else None,
+            'cohort_size': entry['cohort_size'] if entry else None,
+        })
+    
+    return Response(ranks)
+
+
 # ==================== VUES POUR LES ANNONCES ====================
 
+def _paginated_response(request, items, count=None):
+    """
+    Paginer une liste déjà construite si ?limit= est fourni (?offset= optionnel),
+    sinon retourner la liste complète comme auparavant.
+    count : nombre total d'éléments, si items n'en contient qu'une partie
+    """
+    paginator = LimitOffsetPagination()
+    page = paginator.paginate_queryset(items, request)
+    if page is None:
+        return Response(items)
+    if count is not None:
+        paginator.count = count
+    return paginator.get_paginated_response(page)
+
+
+def _filter_announcements(queryset, query_params):
+    """Filtres optionnels des annonces (module, author, priority, is_pinned)"""
+    module_id = query_params.get('module', None)
+    if module_id:
+        try:
+            queryset = queryset.filter(module_id=int(module_id))
+        except ValueError:
+            raise ValidationError({'module': 'Identifiant de module invalide.'})
+    
+    author_id = query_params.get('author', None)
+    if author_id:
+        queryset = queryset.filter(author_id=author_id)
+    
+    priority = query_params.get('priority', None)
+    if priority:
+        queryset = queryset.filter(priority=priority)
+    
+    is_pinned = query_params.get('is_pinned', None)
+    if is_pinned is not None:
+        queryset = queryset.filter(is_pinned=is_pinned.lower() == 'true')
+    
+    return queryset.select_related('author', 'module').order_by('-is_pinned', '-published_date', '-id')
+
+
+def _student_announcements(request):
+    """
+    Annonces d'un étudiant (ses modules et annonces générales), paginées via ?limit=&offset=.
+    Le fil fusionné depuis le cache (voir api.feeds) est utilisé tant qu'il permet une
+    réponse exacte ; avec les filtres priority / is_pinned / author, ou pour une page
+    au-delà des annonces en cache, la liste est lue en base.
+    """
+    params = request.query_params
+    queryset = _filter_announcements(Announcement.objects.visible_to(request.user), params)
+    
+    if not any(params.get(name) is not None for name in ('author', 'priority', 'is_pinned')):
+        module_id = int(params['module']) if params.get('module') else None
+        announcements, total = student_feed(request.user.id, module_id=module_id)
+        if len(announcements) == total:
+            return _paginated_response(request, announcements)
+        
+        # Fil tronqué : seules les pages entièrement dans la fenêtre en cache sont servies,
+        # le total étant celui enregistré avec les fils
+        paginator = LimitOffsetPagination()
+        limit = paginator.get_limit(request)
+        if limit is not None and paginator.get_offset(request) + limit <= len(announcements):
+            return _paginated_response(request, announcements, count=total)
+    
+    return _paginated_response(request, AnnouncementSerializer(queryset, many=True).data)
+
+
 class AnnouncementViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour gérer les annonces/messages
@@ -902,55 +1207,25 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
     queryset = Announcement.objects.all()
     serializer_class = AnnouncementSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LimitOffsetPagination
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Les étudiants reçoivent leur fil fusionné depuis le cache (voir api.feeds)
+        """
+        if request.user.role == 'student':
+            return _student_announcements(request)
+        return super().list(request, *args, **kwargs)
     
     def get_queryset(self):
         """
         Filtrer les annonces selon le rôle de l'utilisateur
         """
-        user = self.request.user
-        
-        if user.role == 'student':
-            # Les étudiants voient les annonces des modules où ils sont inscrits ou les annonces générales
-            enrolled_modules = Module.objects.filter(
-                enrollments__student=user,
-                enrollments__is_active=True
-            )
-            queryset = Announcement.objects.filter(
-                Q(module__in=enrolled_modules) | Q(module__isnull=True),
-                is_active=True
-            )
-            # Filtrer par date d'expiration
-            from django.utils import timezone
-            queryset = queryset.filter(
-                Q(expiry_date__isnull=True) | Q(expiry_date__gt=timezone.now())
-            )
-        elif user.role == 'teacher':
-            # Les enseignants voient les annonces de leurs modules
-            queryset = Announcement.objects.filter(module__teacher=user)
-        elif user.role == 'admin':
-            # Les admins voient toutes les annonces
-            queryset = Announcement.objects.all()
-        else:
-            queryset = Announcement.objects.none()
+        # Étudiants : leurs modules et annonces générales ; enseignants : leurs modules ; admins : tout
+        queryset = Announcement.objects.visible_to(self.request.user)
         
         # Filtres optionnels
-        module_id = self.request.query_params.get('module', None)
-        if module_id:
-            queryset = queryset.filter(module_id=module_id)
-        
-        author_id = self.request.query_params.get('author', None)
-        if author_id:
-            queryset = queryset.filter(author_id=author_id)
-        
-        priority = self.request.query_params.get('priority', None)
-        if priority:
-            queryset = queryset.filter(priority=priority)
-        
-        is_pinned = self.request.query_params.get('is_pinned', None)
-        if is_pinned is not None:
-            queryset = queryset.filter(is_pinned=is_pinned.lower() == 'true')
-        
-        return queryset.order_by('-is_pinned', '-published_date')
+        return _filter_announcements(queryset, self.request.query_params)
     
     def get_permissions(self):
         """
@@ -961,13 +1236,21 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsTeacherOrAdmin()]
-        return [IsAuthenticated()]
+        # Actions personnalisées : permissions déclarées sur l'action
+        return super().get_permissions()
     
     def perform_create(self, serializer):
         """
-        Enregistrer l'auteur de l'annonce
+        Enregistrer l'auteur de l'annonce et notifier les destinataires
+        (diffusion par lots en arrière-plan, après le commit).
+        Une annonce programmée (publish_at) reste inactive ; elle sera publiée
+        et diffusée par la commande publish_announcements.
         """
-        serializer.save(author=self.request.user)
+        if serializer.validated_data.get('publish_at'):
+            serializer.save(author=self.request.user, is_active=False)
+            return
+        announcement = serializer.save(author=self.request.user)
+        run_in_background(fan_out_announcement, announcement.id)
     
     def perform_update(self, serializer):
         """
@@ -984,6 +1267,45 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
             serializer.save()
         else:
             raise PermissionError("Vous n'avez pas la permission de modifier cette annonce.")
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def read(self, request, pk=None):
+        """
+        Marquer une annonce comme lue par l'utilisateur connecté
+        POST /api/announcements/{id}/read/
+        """
+        announcement = self.get_object()
+        created = AnnouncementReadState.mark_read(announcement, request.user.id)
+        return Response({
+            'announcement': announcement.id,
+            'is_read': created or AnnouncementReadState.has_read(announcement, request.user.id)
+        })
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsTeacherOrAdmin])
+    def read_stats(self, request, pk=None):
+        """
+        Statistiques de lecture d'une annonce (auteur ou admin)
+        GET /api/announcements/{id}/read_stats/
+        """
+        announcement = self.get_object()
+        if request.user.role != 'admin' and announcement.author_id != request.user.id:
+            return Response({
+                'error': 'Seul l\'auteur de l\'annonce peut consulter ses statistiques de lecture.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        # Taille du public enregistrée à la diffusion, tenue à jour lors des
+        # inscriptions et désinscriptions (signaux) : aucun recomptage ni écriture ici
+        state = (
+            AnnouncementReadState.objects.filter(pk=announcement.pk).first()
+            or AnnouncementReadState(announcement=announcement)
+        )
+        
+        return Response({
+            'announcement': announcement.id,
+            'read_count': state.read_count,
+            'audience_size': state.audience_size,
+            'read_percentage': state.read_percentage
+        })
 
 
 @api_view(['GET'])
@@ -993,34 +1315,9 @@ def my_announcements(request):
     Endpoint pour qu'un étudiant voie toutes les annonces qui le concernent
     GET /api/announcements/my/
     """
-    enrolled_modules = Module.objects.filter(
-        enrollments__student=request.user,
-        enrollments__is_active=True
-    )
-    
-    # Annonces des modules où l'étudiant est inscrit ou annonces générales
-    announcements = Announcement.objects.filter(
-        Q(module__in=enrolled_modules) | Q(module__isnull=True),
-        is_active=True
-    )
-    
-    # Filtrer par date d'expiration
-    from django.utils import timezone
-    announcements = announcements.filter(
-        Q(expiry_date__isnull=True) | Q(expiry_date__gt=timezone.now())
-    )
-    
-    # Filtres optionnels
-    module_id = request.query_params.get('module', None)
-    if module_id:
-        announcements = announcements.filter(module_id=module_id)
-    
-    priority = request.query_params.get('priority', None)
-    if priority:
-        announcements = announcements.filter(priority=priority)
-    
-    serializer = AnnouncementSerializer(announcements.order_by('-is_pinned', '-published_date'), many=True)
-    return Response(serializer.data)
+    # Annonces des modules où l'étudiant est inscrit et annonces générales,
+    # fusionnées depuis les fils précalculés (pagination optionnelle via ?limit=&offset=)
+    return _student_announcements(request)
 
 
 # ==================== VUES POUR LES MESSAGES ====================
@@ -1034,6 +1331,8 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
     queryset = ChatMessage.objects.all()
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    # Lectures authentifiées à partir du jeton, sans charger l'utilisateur
+    authentication_classes = [TokenClaimsJWTAuthentication]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -1044,11 +1343,11 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         """
         Filtrer les messages pour ne montrer que ceux de l'utilisateur connecté
         """
-        user = self.request.user
+        user_id = self.request.user.id
         
         # L'utilisateur voit les messages qu'il a envoyés et reçus
         queryset = ChatMessage.objects.filter(
-            Q(sender=user) | Q(recipient=user)
+            Q(sender_id=user_id) | Q(recipient_id=user_id)
         )
         
         # Filtres optionnels
@@ -1056,17 +1355,17 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         if other_user_id:
             # Messages avec un utilisateur spécifique
             queryset = queryset.filter(
-                Q(sender=user, recipient_id=other_user_id) |
-                Q(sender_id=other_user_id, recipient=user)
+                Q(sender_id=user_id, recipient_id=other_user_id) |
+                Q(sender_id=other_user_id, recipient_id=user_id)
             )
         
         is_read = self.request.query_params.get('is_read', None)
         if is_read is not None:
             # Filtrer par statut de lecture (seulement pour les messages reçus)
             if is_read.lower() == 'true':
-                queryset = queryset.filter(recipient=user, is_read=True)
+                queryset = queryset.filter(recipient_id=user_id, is_read=True)
             else:
-                queryset = queryset.filter(recipient=user, is_read=False)
+                queryset = queryset.filter(recipient_id=user_id, is_read=False)
         
         return queryset.order_by('-created_at')
     
@@ -1081,21 +1380,21 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         User = get_user_model()
         recipient = get_object_or_404(User, id=recipient_id)
         
-        # Créer le message
-        chat_message = ChatMessage.objects.create(
-            sender=self.request.user,
-            recipient=recipient,
-            message=message_text
-        )
+        # Créer le message et mettre à jour la conversation dans la même transaction
+        with transaction.atomic():
+            chat_message = ChatMessage.objects.create(
+                sender=self.request.user,
+                recipient=recipient,
+                message=message_text
+            )
+            Conversation.record_message(chat_message)
         
-        # Créer une notification pour le destinataire
-        Notification.create_for_user(
-            user=recipient,
-            notification_type='message',
-            title='Nouveau message',
-            content=f"Vous avez reçu un message de {self.request.user.get_full_name() or self.request.user.username}",
-            link=f"/messages/{chat_message.id}/"
-        )
+        # Pousser le message aux connexions temps réel du destinataire après le commit
+        payload = ChatMessageSerializer(chat_message).data
+        transaction.on_commit(lambda: publish_to_users([recipient.id], 'chat.message', payload))
+        
+        # Notifier le destinataire (regroupement par expéditeur tant que la notification n'est pas lue)
+        Notification.notify_message(chat_message)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_as_read(self, request, pk=None):
@@ -1115,48 +1414,250 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(message)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path=r'thread/(?P<user_id>\d+)', permission_classes=[IsAuthenticated])
+    def thread(self, request, user_id=None):
+        """
+        Historique de la conversation avec un utilisateur, du plus récent au plus ancien
+        GET /api/messages/thread/{user_id}/?before=<curseur>&limit=<n>
+        """
+        # Les deux participants en une requête (request.user peut être issu du jeton)
+        user_id = int(user_id)
+        participants = User.objects.in_bulk({request.user.id, user_id})
+        if user_id not in participants:
+            raise Http404
+        conversation = Conversation.for_users(request.user.id, user_id)
+        
+        messages, next_cursor = [], None
+        if conversation is not None:
+            try:
+                messages, next_cursor = thread_page(
+                    conversation.id,
+                    before=request.query_params.get('before'),
+                    limit=request.query_params.get('limit')
+                )
+            except InvalidCursor:
+                raise ValidationError({'before': 'Curseur de pagination invalide.'})
+        
+        return Response({
+            'participants': ChatParticipantSerializer(
+                [participants[request.user.id], participants[user_id]],
+                many=True
+            ).data,
+            'messages': messages,
+            'next_cursor': next_cursor,
+        })
+    
+    @action(detail=False, methods=['post'], url_path=r'thread/(?P<user_id>\d+)/read', permission_classes=[IsAuthenticated])
+    def read_thread(self, request, user_id=None):
+        """
+        Marquer comme lus tous les messages reçus d'un utilisateur jusqu'à un point donné
+        POST /api/messages/thread/{user_id}/read/
+        Corps : {"up_to": <id du message> | <date ISO 8601>}
+        """
+        other_user = get_object_or_404(User, id=user_id)
+        conversation = Conversation.for_users(request.user.id, other_user.id)
+        if conversation is None:
+            return Response({'marked': 0, 'unread_count': 0})
+        
+        up_to = str(request.data.get('up_to', '')).strip()
+        if not up_to:
+            raise ValidationError({'up_to': 'Ce champ est obligatoire (id de message ou date).'})
+        
+        # isdigit() seul accepte les chiffres Unicode (« ٣ », « ² »...) : chiffres ASCII uniquement
+        if up_to.isascii() and up_to.isdigit():
+            # Position exacte du message dans le fil (au-delà d'un entier 64 bits : aucun message)
+            up_to_id = int(up_to)
+            position = None
+            if up_to_id < 2 ** 63:
+                position = (
+                    ChatMessage.objects
+                    .filter(conversation=conversation, id=up_to_id)
+                    .values_list('created_at', 'id')
+                    .first()
+                )
+            if position is None:
+                raise ValidationError({'up_to': 'Ce message ne fait pas partie de la conversation.'})
+            up_to_created_at, up_to_id = position
+        else:
+            # parse_datetime lève ValueError pour une date bien formée mais invalide (2024-02-30)
+            try:
+                up_to_created_at, up_to_id = parse_datetime(up_to), None
+            except ValueError:
+                up_to_created_at = None
+            if up_to_created_at is None:
+                raise ValidationError({'up_to': 'Identifiant de message ou date ISO 8601 invalide.'})
+            if timezone.is_naive(up_to_created_at):
+                up_to_created_at = timezone.make_aware(up_to_created_at)
+        
+        marked = mark_thread_read(conversation, request.user.id, up_to_created_at, up_to_id)
+        conversation.refresh_from_db(fields=['unread_low', 'unread_high'])
+        return Response({
+            'marked': marked,
+            'unread_count': conversation.unread_for(request.user.id)
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def unread_count(self, request):
+        """
+        Récupérer le nombre de messages non lus (compteur en cache)
+        GET /api/messages/unread_count/
+        """
+        return Response({
+            'unread_count': get_unread_count(MESSAGES, request.user.id)
+        })
+    
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def conversations(self, request):
         """
-        Récupérer la liste des conversations (utilisateurs avec qui on a échangé)
+        Récupérer la liste des conversations (utilisateurs avec qui on a échangé),
+        la plus récente d'abord ; pagination optionnelle avec ?limit= et ?offset=
         GET /api/messages/conversations/
         """
         user = request.user
         
-        # Récupérer les IDs des utilisateurs avec qui on a échangé
-        sent_to = ChatMessage.objects.filter(sender=user).values_list('recipient_id', flat=True).distinct()
-        received_from = ChatMessage.objects.filter(recipient=user).values_list('sender_id', flat=True).distinct()
+        # Dernier message et compteurs de non lus sont maintenus dans Conversation ;
+        # fusion des deux côtés de la paire, chacun lu dans l'ordre de son index
+        queryset = ConversationInbox(user.id)
+        
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        conversations = [
+            {
+                'user': UserSerializer(conversation.other_user(user.id)).data,
+                'last_message': ChatMessageSerializer(conversation.last_message).data if conversation.last_message else None,
+                'unread_count': conversation.unread_for(user.id)
+            }
+            for conversation in (page if page is not None else queryset)
+        ]
         
-        # Combiner et obtenir les utilisateurs uniques
-        user_ids = set(list(sent_to) + list(received_from))
+        if page is None:
+            return Response(conversations)
+        return paginator.get_paginated_response(conversations)
+
+
+# ==================== VUES POUR LES SALONS DE MODULE ====================
+
+class ModuleChannelViewSet(viewsets.GenericViewSet):
+    """
+    ViewSet pour les salons de discussion des modules
+    - Membres : enseignant responsable et étudiants inscrits (les admins ont accès à tous les salons)
+    - Les non lus sont calculés à partir de la position de lecture de chaque membre
+    """
+    queryset = Module.objects.all()
+    serializer_class = ModuleChannelSerializer
+    permission_classes = [IsAuthenticated, IsModuleChannelMember]
+    lookup_url_kwarg = 'module_id'
+    
+    def get_queryset(self):
+        """
+        Modules dont l'utilisateur est membre, annotés avec l'état de leur salon
+        et la position de lecture de l'utilisateur (une seule requête).
+        Actions sur un salon : tous les modules, l'appartenance étant vérifiée
+        par IsModuleChannelMember (403 pour un non-membre)
+        """
+        user = self.request.user
+        if self.action != 'list':
+            return Module.objects.all()
         
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        users = User.objects.filter(id__in=user_ids)
-        
-        # Pour chaque utilisateur, récupérer le dernier message
-        conversations = []
-        for other_user in users:
-            last_message = ChatMessage.objects.filter(
-                Q(sender=user, recipient=other_user) | Q(sender=other_user, recipient=user)
-            ).order_by('-created_at').first()
-            
-            unread_count = ChatMessage.objects.filter(
-                sender=other_user,
-                recipient=user,
-                is_read=False
-            ).count()
-            
-            conversations.append({
-                'user': UserSerializer(other_user).data,
-                'last_message': ChatMessageSerializer(last_message).data if last_message else None,
-                'unread_count': unread_count
-            })
+        if user.role == 'admin':
+            queryset = Module.objects.all()
+        elif user.role == 'teacher':
+            queryset = Module.objects.filter(teacher=user)
+        elif user.role == 'student':
+            queryset = Module.objects.filter(enrollments__student=user, enrollments__is_active=True)
+        else:
+            queryset = Module.objects.none()
+        
+        last_read_seq = ChannelMembership.objects.filter(
+            channel__module=OuterRef('pk'),
+            user=user
+        ).values('last_read_seq')[:1]
+        return (
+            queryset
+            .annotate(
+                last_seq=Coalesce(F('channel__last_seq'), 0),
+                last_message_at=F('channel__last_message_at'),
+                last_read_seq=Coalesce(Subquery(last_read_seq), 0),
+            )
+            .annotate(unread_count=F('last_seq') - F('last_read_seq'))
+            .order_by(F('last_message_at').desc(nulls_last=True), 'code')
+        )
+    
+    def list(self, request):
+        """
+        Salons de l'utilisateur avec leur nombre de messages non lus
+        GET /api/channels/
+        """
+        return Response(self.get_serializer(self.get_queryset(), many=True).data)
+    
+    @action(detail=True, methods=['get', 'post'])
+    def messages(self, request, module_id=None):
+        """
+        Messages du salon d'un module
+        GET /api/channels/{module_id}/messages/?before=<seq>&limit=<n> (du plus récent au plus ancien)
+        POST /api/channels/{module_id}/messages/ {"message": "..."}
+        """
+        channel = ModuleChannel.for_module(self.get_object())
         
-        # Trier par date du dernier message
-        conversations.sort(key=lambda x: x['last_message']['created_at'] if x['last_message'] else '', reverse=True)
+        if request.method == 'POST':
+            serializer = ChannelMessageSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            message = channel.post(request.user, serializer.validated_data['message'])
+            return Response(ChannelMessageSerializer(message).data, status=status.HTTP_201_CREATED)
         
-        return Response(conversations)
+        limit = page_size(
+            request.query_params.get('limit'),
+            getattr(settings, 'CHAT_THREAD_PAGE_SIZE', 50),
+            getattr(settings, 'CHAT_THREAD_MAX_PAGE_SIZE', 200)
+        )
+        queryset = ChannelMessage.objects.filter(channel=channel)
+        before = request.query_params.get('before')
+        if before:
+            try:
+                queryset = queryset.filter(seq__lt=int(before))
+            except ValueError:
+                raise ValidationError({'before': 'Numéro de séquence invalide.'})
+        
+        messages = list(queryset.select_related('sender').order_by('-seq')[:limit + 1])
+        next_before = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_before = messages[-1].seq
+        
+        last_read_seq = ChannelMembership.objects.filter(
+            channel=channel,
+            user=request.user
+        ).values_list('last_read_seq', flat=True).first() or 0
+        return Response({
+            'messages': ChannelMessageSerializer(messages, many=True).data,
+            'next_before': next_before,
+            'last_seq': channel.last_seq,
+            'last_read_seq': last_read_seq,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def read(self, request, module_id=None):
+        """
+        Avancer la position de lecture de l'utilisateur dans le salon
+        POST /api/channels/{module_id}/read/ {"up_to": <seq>} (par défaut : dernier message)
+        """
+        channel = ModuleChannel.for_module(self.get_object())
+        
+        up_to = request.data.get('up_to', channel.last_seq)
+        try:
+            up_to = int(up_to)
+        except (TypeError, ValueError):
+            raise ValidationError({'up_to': 'Numéro de séquence invalide.'})
+        
+        ChannelMembership.advance(channel, request.user.id, up_to)
+        last_read_seq = ChannelMembership.objects.filter(
+            channel=channel,
+            user=request.user
+        ).values_list('last_read_seq', flat=True).first()
+        return Response({
+            'last_read_seq': last_read_seq,
+            'unread_count': channel.last_seq - last_read_seq,
+        })
 
 
 # ==================== VUES POUR LES NOTIFICATIONS ====================
@@ -1170,14 +1671,14 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    # Lectures authentifiées à partir du jeton, sans charger l'utilisateur
+    authentication_classes = [TokenClaimsJWTAuthentication]
     
     def get_queryset(self):
         """
         Filtrer les notifications pour ne montrer que celles de l'utilisateur connecté
         """
-        user = self.request.user
-        
-        queryset = Notification.objects.filter(recipient=user)
+        queryset = Notification.objects.filter(recipient_id=self.request.user.id)
         
         # Filtres optionnels
         notification_type = self.request.query_params.get('type', None)
@@ -1204,10 +1705,43 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
                 'error': 'Vous ne pouvez marquer comme lu que vos propres notifications.'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        notification.mark_as_read()
+        # Mise à jour conditionnelle : deux lectures simultanées ne décrémentent qu'une fois
+        with transaction.atomic():
+            marked = Notification.objects.filter(pk=notification.pk, is_read=False).update(
+                is_read=True,
+                read_at=timezone.now()
+            )
+            decrement_unread(NOTIFICATIONS, request.user.id, marked)
+        if marked:
+            publish_notifications_read(request.user.id)
+            notification.refresh_from_db(fields=['is_read', 'read_at'])
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def history(self, request):
+        """
+        Historique des notifications, du plus récent au plus ancien, y compris les
+        notifications archivées (pagination par curseur)
+        GET /api/notifications/history/?before=<curseur>&limit=<n>
+        """
+        limit = page_size(
+            request.query_params.get('limit'),
+            getattr(settings, 'NOTIFICATION_HISTORY_PAGE_SIZE', 50),
+            getattr(settings, 'NOTIFICATION_HISTORY_MAX_PAGE_SIZE', 200)
+        )
+        try:
+            notifications, next_cursor = keyset_page(
+                Notification.objects.filter(recipient_id=request.user.id).select_related('recipient', 'related_module'),
+                NotificationSerializer,
+                limit,
+                before=request.query_params.get('before'),
+                archive=(NOTIFICATIONS_ARCHIVE, request.user.id)
+            )
+        except InvalidCursor:
+            raise ValidationError({'before': 'Curseur de pagination invalide.'})
+        return Response({'notifications': notifications, 'next_cursor': next_cursor})
+    
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_all_as_read(self, request):
         """
@@ -1215,64 +1749,119 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         POST /api/notifications/mark_all_as_read/
         """
         user = request.user
-        updated = Notification.objects.filter(
-            recipient=user,
-            is_read=False
-        ).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        with transaction.atomic():
+            updated = Notification.objects.filter(
+                recipient=user,
+                is_read=False
+            ).update(
+                is_read=True,
+                read_at=timezone.now()
+            )
+            decrement_unread(NOTIFICATIONS, user.id, updated)
+        if updated:
+            publish_notifications_read(user.id)
         
         return Response({
             'message': f'{updated} notification(s) marquée(s) comme lue(s).'
         })
     
+    @action(detail=False, methods=['get', 'put', 'patch'], permission_classes=[IsAuthenticated])
+    def preferences(self, request):
+        """
+        Préférences de notification : types et modules masqués
+        GET /api/notifications/preferences/
+        PUT/PATCH /api/notifications/preferences/ {"muted_types": ["message"], "muted_modules": [3]}
+        """
+        if request.method == 'GET':
+            preference = NotificationPreference.objects.filter(user_id=request.user.id).first()
+            preference = preference or NotificationPreference(user_id=request.user.id)
+            return Response(NotificationPreferenceSerializer(preference).data)
+        
+        preference, _ = NotificationPreference.objects.get_or_create(user=request.user)
+        serializer = NotificationPreferenceSerializer(
+            preference,
+            data=request.data,
+            partial=request.method == 'PATCH'
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+    
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def unread_count(self, request):
         """
         Récupérer le nombre de notifications non lues
         GET /api/notifications/unread_count/
         """
-        user = request.user
-        count = Notification.objects.filter(
-            recipient=user,
-            is_read=False
-        ).count()
-        
+        # Compteur en cache (la base n'est lue qu'en cas d'absence)
         return Response({
-            'unread_count': count
+            'unread_count': get_unread_count(NOTIFICATIONS, request.user.id)
         })
 
 
 @api_view(['GET'])
+@authentication_classes([TokenClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def my_messages(request):
     """
     Endpoint pour récupérer les messages récents de l'utilisateur
     GET /api/messages/my/
     """
-    user = request.user
+    user_id = request.user.id
     
     # Récupérer les messages récents (envoyés et reçus)
     messages = ChatMessage.objects.filter(
-        Q(sender=user) | Q(recipient=user)
+        Q(sender_id=user_id) | Q(recipient_id=user_id)
     ).order_by('-created_at')[:50]  # Limiter à 50 messages récents
     
     serializer = ChatMessageSerializer(messages, many=True)
     return Response(serializer.data)
 
 
+# ==================== RECHERCHE ====================
+
+SEARCH_SCOPES = ('all', 'messages', 'announcements')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """
+    Recherche plein texte dans les messages de l'utilisateur et les annonces qu'il peut voir
+    GET /api/search/?q=<texte>&scope=all|messages|announcements&limit=<n>
+    Les messages archivés ne sont pas recherchés : archived_messages_excluded le signale.
+    """
+    query = request.query_params.get('q', '')
+    if not search_terms(query):
+        raise ValidationError({'q': 'Veuillez saisir au moins un mot à rechercher.'})
+    
+    scope = request.query_params.get('scope', 'all')
+    if scope not in SEARCH_SCOPES:
+        raise ValidationError({'scope': f"Valeur invalide. Valeurs possibles : {', '.join(SEARCH_SCOPES)}."})
+    
+    limit = request.query_params.get('limit')
+    results = {}
+    if scope in ('all', 'messages'):
+        results['messages'] = ChatMessageSerializer(search_messages(request.user, query, limit), many=True).data
+        conversation_ids = Conversation.objects.filter(
+            Q(user_low_id=request.user.id) | Q(user_high_id=request.user.id)
+        ).values_list('id', flat=True)
+        results['archived_messages_excluded'] = has_archive(MESSAGES_ARCHIVE, conversation_ids)
+    if scope in ('all', 'announcements'):
+        results['announcements'] = AnnouncementSerializer(search_announcements(request.user, query, limit), many=True).data
+    return Response(results)
+
+
 @api_view(['GET'])
+@authentication_classes([TokenClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def my_unread_notifications(request):
     """
     Endpoint pour récupérer les notifications non lues
     GET /api/notifications/unread/
     """
-    user = request.user
-    
     notifications = Notification.objects.filter(
-        recipient=user,
+        recipient_id=request.user.id,
         is_read=False
     ).order_by('-created_at')
     
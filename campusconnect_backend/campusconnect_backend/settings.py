@@ -44,6 +44,100 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Pondération des types de note pour le calcul de la note finale (Enrollment.grade)
+# Les types absents du dictionnaire ont un poids de 1
+GRADE_TYPE_WEIGHTS = {
+    'final': 3,
+    'exam': 2,
+    'midterm': 2,
+    'project': 2,
+    'assignment': 1,
+    'quiz': 1,
+    'participation': 1,
+    'other': 1,
+}
+
+# Taille des lots d'insertion lors de l'import de notes (CSV / XLSX)
+GRADE_IMPORT_BATCH_SIZE = 1000
+
+# Durée de vie (secondes) des instantanés de classement en cache, invalidés à chaque changement de note
+RANKING_CACHE_TIMEOUT = 3600
+
+# Taille des lots de bulk_create lors de la diffusion des notifications
+NOTIFICATION_BATCH_SIZE = 500
+
+# Nombre de threads exécutant les traitements d'arrière-plan (diffusion des notifications, ...)
+BACKGROUND_TASK_WORKERS = 2
+
+# Backend des traitements d'arrière-plan : 'thread' (pool du processus web) ou 'database'
+# (file d'attente en base exécutée par la commande runworker)
+BACKGROUND_TASK_BACKEND = 'thread'
+
+# File d'attente en base : tentatives maximum, délai de la première nouvelle tentative
+# et délai maximum (secondes, croissance exponentielle), délai avant de considérer
+# une tâche en cours comme abandonnée (secondes) et intervalle de rafraîchissement
+# de sa réservation pendant l'exécution (secondes, défaut : TASK_LOCK_TIMEOUT / 3)
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BASE_DELAY = 10
+TASK_RETRY_MAX_DELAY = 3600
+TASK_LOCK_TIMEOUT = 600
+TASK_HEARTBEAT_INTERVAL = 200
+
+# Fils d'annonces précalculés : nombre d'annonces conservées par fil et durée de vie en cache (secondes)
+ANNOUNCEMENT_FEED_SIZE = 200
+ANNOUNCEMENT_FEED_TIMEOUT = 300
+
+# Temps réel : backend publish/subscribe (InProcessPubSub pour un seul processus ASGI)
+# et taille maximale de la file d'attente d'une connexion
+PUBSUB_BACKEND = 'api.pubsub.InProcessPubSub'
+PUBSUB_QUEUE_SIZE = 100
+
+# Longue interrogation (/api/updates/) : durée maximale d'attente (secondes)
+# et nombre maximal de messages / notifications par réponse
+LONG_POLL_TIMEOUT = 25
+UPDATES_MAX_ITEMS = 100
+
+# Flux SSE des notifications : intervalle des battements (secondes)
+# et délai de reconnexion conseillé au navigateur (millisecondes)
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_RETRY_MS = 5000
+
+# Rétention des notifications lues (commande purge_notifications) : durée de conservation
+# en jours par type de notification, au moins égale à ARCHIVE_AFTER_DAYS (vérifié par
+# api.checks) : les notifications lues sont archivées, puis supprimées des archives
+# à la fin de leur durée de conservation ; les types absents sont conservés
+NOTIFICATION_RETENTION_DAYS = {
+    'message': 180,
+    'announcement': 270,
+    'session': 270,
+    'resource': 270,
+    'enrollment': 365,
+    'module': 365,
+    'grade': 730,
+    'other': 270,
+}
+
+# Rappels de sessions (commande send_session_reminders) : délai en minutes avant le début
+# de la session ; la commande doit être planifiée plus souvent que ce délai
+SESSION_REMINDER_LEAD_MINUTES = 30
+
+# Historique des conversations : taille de page par défaut et maximale
+CHAT_THREAD_PAGE_SIZE = 50
+CHAT_THREAD_MAX_PAGE_SIZE = 200
+
+# Recherche plein texte : nombre de résultats par défaut et maximal (par type de contenu)
+SEARCH_RESULTS_LIMIT = 20
+SEARCH_MAX_RESULTS = 100
+
+# Historique des notifications : taille de page par défaut et maximale
+NOTIFICATION_HISTORY_PAGE_SIZE = 50
+NOTIFICATION_HISTORY_MAX_PAGE_SIZE = 200
+
+# Archivage à froid (commande archive_old_records) : répertoire des archives
+# et âge (en jours) au-delà duquel les messages et notifications lus sont archivés
+ARCHIVE_ROOT = BASE_DIR / "archive"
+ARCHIVE_AFTER_DAYS = 180
+
 # Configuration de JWT
 from datetime import timedelta
 
@@ -102,6 +196,19 @@ DATABASES = {
     }
 }
 
+# Cache partagé par tous les processus (serveurs web, runworker, commandes planifiées) :
+# classements, fils d'annonces. Créer la table au déploiement avec
+# « python manage.py createcachetable » (le lanceur de tests la crée lui-même).
+# Les compteurs de non lus sont en base (modèle UnreadCounter). En production, préférer Redis :
+# CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+#                       "LOCATION": "redis://127.0.0.1:6379/1"}}
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "campusconnect_cache",
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,6 +251,10 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Fichiers privés (rapports d'import de notes) : jamais servis directement,
+# uniquement via l'API après contrôle des droits
+PRIVATE_MEDIA_ROOT = BASE_DIR / "private"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 